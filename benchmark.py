@@ -0,0 +1,1243 @@
+"""
+PM Tool - Performance Benchmarks
+Each benchmark runs against a throw-away database in a temp directory, never pm_tool.db.
+
+Usage (from the repository root):
+    python benchmark.py indexes --rows 1000000
+    python benchmark.py portfolio --projects 200
+    python benchmark.py parity
+    python benchmark.py import --expenditures 5000
+    python benchmark.py cache
+    python benchmark.py charts
+    python benchmark.py export --projects 40
+    python benchmark.py cpm --activities 1000 10000 50000
+    python benchmark.py burndown --projects 100
+    python benchmark.py spend --rows 500000
+    python benchmark.py snapshot --rows 1000000
+    python benchmark.py suite --scales 10 100 1000 --compare bench_results/<earlier run>.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pmt_app')
+sys.path.insert(0, APP_DIR)  # app modules import each other by bare name
+
+import migrations
+
+CATEGORIES = ['Labour', 'Material', 'Vehicle', 'Diesel', 'Other']
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_results')
+SAMPLE_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'Project_Template_Sample_v2.xlsx')
+
+
+def _time_ms(fn, repeat=5):
+    """Median wall time of `fn` in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def _print_table(title, headers, rows):
+    print("\n" + "=" * 72)
+    print(title)
+    print("=" * 72)
+    print("".join(f"{h:<24}" for h in headers))
+    for row in rows:
+        print("".join(f"{c:<24.2f}" if isinstance(c, float) else f"{str(c):<24}" for c in row))
+
+
+def _temp_db(name):
+    return os.path.join(tempfile.mkdtemp(prefix='pmt_bench_'), name)
+
+
+def _drop_temp_db(path):
+    if 'audit' in sys.modules:
+        sys.modules['audit'].flush()  # queued audit entries still point at this file
+    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+
+def _use_app_db(path, cache=False):
+    """
+    Points the app's database module at `path` and returns it. The query cache is
+    off by default so repeated timings measure the work, not cache hits.
+    """
+    import database
+    database.close_all_connections()
+    database.DB_PATH = path
+    database.query_cache.clear()
+    database.query_cache.ENABLED = cache
+    return database
+
+
+# =============================================================================
+# INDEXES: dashboard query latency before/after the index migration
+# =============================================================================
+def _fill_synthetic_log(conn, rows, projects, activities_per_project=50, seed=42):
+    rng = random.Random(seed)
+    start = date(2023, 1, 1)
+
+    conn.executemany(
+        "INSERT INTO projects (project_id, project_name, project_number, total_budget, start_date, target_end_date) VALUES (?, ?, ?, ?, ?, ?)",
+        [(p, f"Project {p}", f"BENCH-{p:05d}", 1_000_000.0, '2023-01-01', '2026-12-31') for p in range(1, projects + 1)]
+    )
+    conn.executemany(
+        "INSERT INTO baseline_schedule (project_id, activity_name, planned_start, planned_finish, budgeted_cost, status) VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            (p, f"Activity {a}",
+             (start + timedelta(days=a * 20)).isoformat(),
+             (start + timedelta(days=a * 20 + 30)).isoformat(),
+             20_000.0, rng.choice(['Not Started', 'Active', 'Complete']))
+            for p in range(1, projects + 1) for a in range(activities_per_project)
+        )
+    )
+
+    def exp_rows():
+        for _ in range(rows):
+            yield (
+                rng.randint(1, projects), rng.choice(CATEGORIES), 'bench', 'REF',
+                round(rng.uniform(100, 20_000), 2),
+                (start + timedelta(days=rng.randint(0, 1400))).isoformat(), 1
+            )
+
+    conn.executemany(
+        "INSERT INTO expenditure_log (project_id, category, description, reference_id, amount, spend_date, recorded_by) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        exp_rows()
+    )
+    conn.commit()
+
+
+DASHBOARD_QUERIES = [
+    ("total_spent", "SELECT SUM(amount) FROM expenditure_log WHERE project_id = ?"),
+    ("burndown_daily", "SELECT spend_date, SUM(amount) FROM expenditure_log WHERE project_id = ? GROUP BY spend_date ORDER BY spend_date"),
+    ("category_split", "SELECT category, SUM(amount) AS total FROM expenditure_log WHERE project_id = ? GROUP BY category ORDER BY total DESC"),
+    ("spend_first_last", "SELECT MIN(spend_date), MAX(spend_date) FROM expenditure_log WHERE project_id = ?"),
+    ("planned_value", "SELECT SUM(budgeted_cost) FROM baseline_schedule WHERE project_id = ? AND planned_finish <= '2025-01-01'"),
+    ("overdue_count", "SELECT COUNT(*) FROM baseline_schedule WHERE project_id = ? AND status != 'Complete' AND planned_finish < '2025-01-01'"),
+]
+
+
+def bench_indexes(rows=1_000_000, projects=200):
+    path = _temp_db('indexes.db')
+    conn = sqlite3.connect(path)
+    migrations.migrate(conn, target=1)  # tables only, no secondary indexes
+
+    print(f"Generating {rows:,} expenditure rows across {projects} projects...")
+    t0 = time.perf_counter()
+    _fill_synthetic_log(conn, rows, projects)
+    print(f"  done in {time.perf_counter() - t0:.1f}s")
+
+    probe_ids = random.Random(7).sample(range(1, projects + 1), k=min(10, projects))
+
+    def run(sql):
+        return lambda: [conn.execute(sql, (pid,)).fetchall() for pid in probe_ids]
+
+    before = {name: _time_ms(run(sql)) / len(probe_ids) for name, sql in DASHBOARD_QUERIES}
+
+    t0 = time.perf_counter()
+    migrations.migrate(conn)
+    migrate_s = time.perf_counter() - t0
+
+    after = {name: _time_ms(run(sql)) / len(probe_ids) for name, sql in DASHBOARD_QUERIES}
+    conn.close()
+    _drop_temp_db(path)
+
+    _print_table(
+        f"Per-project query latency, {rows:,} expenditure rows (ms, median)",
+        ["query", "before", "after", "speedup"],
+        [(name, before[name], after[name], f"{before[name] / max(after[name], 1e-6):.0f}x") for name, _ in DASHBOARD_QUERIES]
+    )
+    print(f"\nIndex migration took {migrate_s:.1f}s on the populated database.")
+    return {'before_ms': before, 'after_ms': after, 'migrate_s': migrate_s}
+
+
+# =============================================================================
+# PORTFOLIO: set-based get_portfolio_metrics vs the per-project path
+# =============================================================================
+def _fill_portfolio_edge_cases(conn, first_id):
+    """Projects that exercise the empty/NULL branches of get_project_metrics."""
+    today = date.today()
+    rows = [
+        # (project_id, name, budget, start, end); the first has no schedule and no spend
+        (first_id, "Empty", 50_000.0, '2024-01-01', '2024-12-31'),
+        (first_id + 1, "No budget", None, None, None),
+        (first_id + 2, "Overdue", 10_000.0, '2024-01-01', (today + timedelta(days=30)).isoformat()),
+    ]
+    conn.executemany(
+        "INSERT INTO projects (project_id, project_name, project_number, total_budget, start_date, target_end_date) VALUES (?, ?, ?, ?, ?, ?)",
+        [(pid, name, f"EDGE-{pid}", budget, start, end) for pid, name, budget, start, end in rows]
+    )
+    conn.executemany(
+        "INSERT INTO baseline_schedule (project_id, activity_name, planned_start, planned_finish, budgeted_cost, status) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (first_id + 1, "Unbudgeted", '2024-01-01', '2024-02-01', None, 'Complete'),
+            (first_id + 1, "No status", '2024-01-01', '2024-02-01', 500.0, None),
+            (first_id + 2, "Late", '2024-01-01', (today - timedelta(days=1)).isoformat(), 4_000.0, 'Active'),
+            (first_id + 2, "Due today", '2024-01-01', today.isoformat(), 3_000.0, 'Complete'),
+            (first_id + 2, "Future", '2024-01-01', (today + timedelta(days=9)).isoformat(), 3_000.0, 'Not Started'),
+        ]
+    )
+    conn.executemany(
+        "INSERT INTO expenditure_log (project_id, category, amount, spend_date, recorded_by) VALUES (?, ?, ?, ?, ?)",
+        [(first_id + 2, 'Labour', 12_000.0, today.isoformat(), 1), (first_id + 1, 'Other', 0.0, '2024-03-01', 1)]
+    )
+    conn.commit()
+
+
+def _portfolio_db(projects, rows):
+    path = _temp_db('portfolio.db')
+    conn = sqlite3.connect(path)
+    migrations.migrate(conn, target=2)
+    _fill_synthetic_log(conn, rows, projects, activities_per_project=30)
+    _fill_portfolio_edge_cases(conn, projects + 1)
+    migrations.migrate(conn)  # later migrations build their derived tables from the data
+    conn.close()
+    return path
+
+
+def _exercise_write_paths(database, project_ids):
+    """Runs every incremental write helper so rollups are maintained, not rebuilt."""
+    rng = random.Random(11)
+    today = date.today().isoformat()
+    for pid in project_ids:
+        database.add_expenditure({'project_id': pid, 'category': 'Labour', 'reference_id': 'P-1',
+                                  'amount': 1234.5, 'spend_date': today}, 1)
+        database.add_expenditures([
+            (pid, None, rng.choice(CATEGORIES), 'Bulk', 'P-2', round(rng.uniform(-50, 500), 2),
+             (date(2024, 1, 1) + timedelta(days=rng.randint(0, 700))).isoformat())
+            for _ in range(5)
+        ], 1)
+        database.add_baseline_activity({'project_id': pid, 'activity_name': 'Added', 'planned_start': today,
+                                        'planned_finish': today, 'budgeted_cost': 999.0})
+        acts = database.get_df("SELECT activity_id, status FROM baseline_schedule WHERE project_id = ? AND depends_on IS NULL", (pid,))
+        for act_id in rng.sample(list(acts['activity_id']), k=min(3, len(acts))):
+            database.update_activity_status(int(act_id), rng.choice(['Active', 'Complete', 'Not Started']), 1)
+        risk_id = database.add_risk({'project_id': pid, 'description': 'Parity', 'impact': 'H'}, 1)
+        if rng.random() < 0.5:
+            database.update_risk_status(risk_id, 'Resolved', 1)
+
+
+def reference_project_metrics(database, project_id):
+    """
+    The original per-project get_project_metrics: pandas over the raw tables,
+    one project at a time. The app now derives every metric from the
+    set-based portfolio query, so this loop is kept as the independent
+    reference the parity check holds both of its sources to.
+    """
+    import pandas as pd
+
+    project_df = database.get_df("SELECT * FROM projects WHERE project_id = ?", (project_id,), cache=False)
+    if project_df.empty:
+        return None
+    project = project_df.iloc[0]
+    baseline = database.get_df("SELECT * FROM baseline_schedule WHERE project_id = ?", (project_id,), cache=False)
+    expenditures = database.get_df("SELECT * FROM expenditure_log WHERE project_id = ?", (project_id,), cache=False)
+
+    total_budget = float(project["total_budget"]) if pd.notna(project["total_budget"]) else 0.0
+    total_spent = float(expenditures["amount"].sum()) if not expenditures.empty else 0.0
+
+    pct_complete = earned_value = 0.0
+    total_planned = baseline["budgeted_cost"].sum() if not baseline.empty else 0.0
+    if not baseline.empty and total_planned > 0:
+        earned_value = baseline[baseline["status"] == "Complete"]["budgeted_cost"].sum()
+        pct_complete = earned_value / total_planned * 100
+
+    forecast = total_spent + (total_budget - earned_value)
+    cpi = (earned_value / total_spent) if total_spent > 0 else 1.0
+
+    budget_health = "Green"
+    if forecast > total_budget * 1.05 and total_budget > 0:
+        budget_health = "Red"
+    elif forecast > total_budget and total_budget > 0:
+        budget_health = "Yellow"
+    elif cpi < 0.85 and total_spent > 0:
+        budget_health = "Red"
+    elif cpi < 0.95 and total_spent > 0:
+        budget_health = "Yellow"
+
+    today = pd.Timestamp.now()
+    schedule_health, planned_value = "Green", 0.0
+    if not baseline.empty:
+        finish = pd.to_datetime(baseline["planned_finish"])
+        if ((finish < today) & (baseline["status"] != "Complete")).any():
+            schedule_health = "Red"
+        planned_value = baseline[finish <= today]["budgeted_cost"].sum()
+
+    burn_rate = 0.0
+    if not expenditures.empty:
+        spend_dates = pd.to_datetime(expenditures["spend_date"])
+        burn_rate = total_spent / max((spend_dates.max() - spend_dates.min()).days, 1)
+
+    days_remaining = 0
+    if pd.notna(project["target_end_date"]):
+        days_remaining = max((pd.to_datetime(project["target_end_date"]) - today).days, 0)
+
+    return {
+        "project_id": project_id,
+        "project_name": str(project["project_name"]),
+        "project_number": str(project["project_number"]),
+        "total_budget": total_budget,
+        "total_spent": total_spent,
+        "remaining": total_budget - total_spent,
+        "pct_complete": min(pct_complete, 100.0),
+        "budget_used_pct": (total_spent / total_budget * 100) if total_budget > 0 else 0.0,
+        "forecast": forecast,
+        "budget_health": budget_health,
+        "schedule_health": schedule_health,
+        "actual_status": str(project.get("status", "Planning")),
+        "burn_rate": burn_rate,
+        "days_remaining": days_remaining,
+        "cost_variance": earned_value - total_spent,
+        "schedule_variance": earned_value - planned_value,
+        "cpi": cpi,
+        "spi": (earned_value / planned_value) if planned_value > 0 else 1.0,
+        "variance_at_completion": total_budget - forecast,
+        "estimate_to_complete": forecast - total_spent if forecast > total_spent else 0,
+        "total_activities": len(baseline),
+        "completed_activities": int((baseline["status"] == "Complete").sum()) if not baseline.empty else 0,
+        "active_activities": int((baseline["status"] == "Active").sum()) if not baseline.empty else 0,
+        "project_start_date": str(project["start_date"]) if pd.notna(project["start_date"]) else None,
+        "project_end_date": str(project["target_end_date"]) if pd.notna(project["target_end_date"]) else None,
+    }
+
+
+def _compare_frames(expected, got, label):
+    mismatches = []
+    for pid in expected.index:
+        for col in expected.columns:
+            exp_val, val = expected.at[pid, col], got.at[pid, col]
+            if _isna(exp_val) and _isna(val):
+                continue
+            if isinstance(exp_val, (float, int)) and not isinstance(exp_val, bool) and exp_val is not None:
+                same = val is not None and abs(float(exp_val) - float(val)) <= 1e-6 * max(1.0, abs(float(exp_val)))
+            else:
+                same = exp_val == val or (_isna(exp_val) and _isna(val))
+            if not same:
+                mismatches.append((label, int(pid), col, exp_val, val))
+    return mismatches
+
+
+def _isna(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def _compare_spend_sources(calculations, project_ids):
+    """spend_buckets-backed spend series vs aggregating expenditure_log directly."""
+    mismatches = []
+    series = [
+        ("monthly", lambda pid, src: calculations.get_monthly_spending_trend(pid, source=src).set_index("month")),
+        ("category", lambda pid, src: calculations.get_category_spending(pid, source=src).set_index("category").sort_index()),
+        ("burndown", lambda pid, src: calculations.get_burndown_data(pid, source=src)["actual_df"].set_index("date")),
+    ]
+    for pid in project_ids:
+        for label, fetch in series:
+            raw, buckets = fetch(int(pid), "raw"), fetch(int(pid), "buckets")
+            if list(raw.index) != list(buckets.index):
+                mismatches.append((label, int(pid), "index", len(raw), len(buckets)))
+            elif not calculations.np.allclose(raw.to_numpy(dtype=float), buckets.to_numpy(dtype=float), rtol=1e-9):
+                mismatches.append((label, int(pid), "values", raw.to_numpy().ravel()[:3], buckets.to_numpy().ravel()[:3]))
+    return mismatches
+
+
+def check_portfolio_parity(projects=25, rows=20_000):
+    """
+    Verifies the metrics paths agree on a synthetic database after the incremental
+    write helpers have run:
+      - the raw-table and rollup-backed get_portfolio_metrics vs
+        reference_project_metrics, the original per-project loop
+      - get_project_metrics vs the matching portfolio row
+      - rebuild_rollups(fix=False) reports no drift
+      - spend series from spend_buckets vs expenditure_log, and no bucket drift
+    Returns the list of mismatches.
+    """
+    path = _portfolio_db(projects, rows)
+    database = _use_app_db(path)
+    import calculations
+
+    _exercise_write_paths(database, range(1, projects + 4))
+
+    raw = calculations.get_portfolio_metrics(source='raw').set_index("project_id")
+    rolled = calculations.get_portfolio_metrics().set_index("project_id")
+    reference = calculations.pd.DataFrame(
+        [reference_project_metrics(database, int(pid)) for pid in raw.index]
+    ).set_index("project_id")
+    single = calculations.pd.DataFrame(
+        [calculations.get_project_metrics(int(pid)) for pid in raw.index]
+    ).set_index("project_id")
+
+    mismatches = _compare_frames(reference, raw, "raw")
+    mismatches += _compare_frames(reference, rolled, "rollups")
+    mismatches += _compare_frames(rolled, single, "single")
+    mismatches += [("drift",) + d for d in database.rebuild_rollups(fix=False)]
+    mismatches += _compare_spend_sources(calculations, raw.index)
+    mismatches += [("bucket drift",) + d for d in database.rebuild_spend_buckets(fix=False)]
+    _drop_temp_db(path)
+
+    print(f"Checked {len(raw)} projects x {len(raw.columns)} columns + spend series: {len(mismatches)} mismatch(es)")
+    for m in mismatches[:20]:
+        print("  ", m)
+    return mismatches
+
+
+def check_report_invalidation(projects=3, rows=2_000):
+    """
+    Verifies a cached PDF is not served after a predecessor edit: the report's
+    FLOAT column comes from the critical path. Returns the list of failures.
+    """
+    path = _portfolio_db(projects, rows)
+    database = _use_app_db(path)
+    import report_jobs
+
+    def run(project_id):
+        job_id = report_jobs.submit_report(project_id)
+        while report_jobs.get_job(job_id)['status'] in ('queued', 'running'):
+            time.sleep(0.05)
+        return report_jobs.get_job(job_id)
+
+    failures = []
+    try:
+        acts = database.get_df(
+            "SELECT activity_id FROM baseline_schedule WHERE project_id = 1 ORDER BY activity_id", cache=False
+        )['activity_id']
+        first, last = int(acts.iloc[0]), int(acts.iloc[-1])
+        for step, edit, expect_cached in [
+            ("first report", None, False),
+            ("unchanged", None, True),
+            ("predecessor replaced", lambda: database.set_activity_predecessors(last, [first], 1), False),
+            ("predecessor removed", lambda: database.set_activity_predecessors(last, [], 1), False),
+            ("unchanged again", None, True),
+        ]:
+            if edit:
+                edit()
+            job = run(1)
+            if job['status'] != 'done' or job['cached'] != expect_cached:
+                failures.append((step, job['status'], f"cached={job['cached']}", job['error']))
+    finally:
+        report_jobs.shutdown()
+        _drop_temp_db(path)
+
+    print(f"Report cache after dependency edits: {len(failures)} failure(s)")
+    for f in failures:
+        print("  ", f)
+    return failures
+
+
+def bench_portfolio(projects=200, rows=200_000):
+    path = _portfolio_db(projects, rows)
+    _use_app_db(path)
+    import calculations
+
+    def per_project():
+        ids = calculations.database.get_df("SELECT project_id FROM projects")["project_id"]
+        return [calculations.get_project_metrics(int(pid)) for pid in ids]
+
+    loop_ms = _time_ms(per_project, repeat=3)
+    set_ms = _time_ms(calculations.get_portfolio_metrics, repeat=3)
+    _drop_temp_db(path)
+
+    _print_table(
+        f"Portfolio summary, {projects} projects / {rows:,} expenditure rows (ms, median)",
+        ["path", "ms", "speedup"],
+        [("per-project loop", loop_ms, "1x"), ("get_portfolio_metrics", set_ms, f"{loop_ms / max(set_ms, 1e-6):.0f}x")]
+    )
+    return {'per_project_ms': loop_ms, 'portfolio_ms': set_ms}
+
+
+# =============================================================================
+# IMPORT: Excel import throughput on a scaled-up sample workbook
+# =============================================================================
+def scale_sample_workbook(path, activities=500, expenditures=5_000, risks=200, project_number=None):
+    """Writes a copy of the sample template with its tables repeated up to the given row counts."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(SAMPLE_TEMPLATE)
+    if project_number:
+        wb["Project_Schedule"]["C6"] = project_number
+
+    def grow(ws, header_row, target, renumber=False):
+        template = [
+            [c.value for c in row]
+            for row in ws.iter_rows(min_row=header_row + 1, max_row=ws.max_row)
+            if any(v is not None for v in (c.value for c in row))
+        ]
+        ws.delete_rows(header_row + 1, ws.max_row)
+        for i in range(target):
+            values = list(template[i % len(template)])
+            if renumber:
+                values[0] = i + 1                        # Activity ID
+                values[5] = i if i else '-'              # Depends On: previous activity
+            ws.append(values)
+
+    grow(wb["Project_Schedule"], 11, activities, renumber=True)
+    grow(wb["Expenditure_Log"], 4, expenditures)
+    grow(wb["Risk_Register"], 3, risks)
+    wb.save(path)
+    return path
+
+
+def bench_import(activities=500, expenditures=5_000, risks=200, repeat=3):
+    path = _temp_db('import.db')
+    database = _use_app_db(path)
+    database.execute_query(
+        "INSERT INTO users (username, password_hash, role, full_name) VALUES ('bench', '-', 'admin', 'Bench')", commit=True
+    )
+    import importer
+
+    books = [
+        scale_sample_workbook(os.path.join(os.path.dirname(path), f"book_{i}.xlsx"),
+                              activities, expenditures, risks, project_number=f"BENCH-IMPORT-{i}")
+        for i in range(repeat)
+    ]
+    total_rows = activities + expenditures + risks
+    samples = []
+    for book in books:
+        t0 = time.perf_counter()
+        importer.import_project(book, 1)
+        samples.append(time.perf_counter() - t0)
+    _drop_temp_db(path)
+
+    best = min(samples)
+    _print_table(
+        f"import_project: {activities} activities / {expenditures:,} expenditures / {risks} risks",
+        ["run", "seconds", "rows/sec"],
+        [(i + 1, t, f"{total_rows / t:,.0f}") for i, t in enumerate(samples)]
+    )
+    return {'seconds': samples, 'rows_per_sec': total_rows / best}
+
+
+# =============================================================================
+# CACHE: PM Dashboard rerun with and without the query cache
+# =============================================================================
+def _pm_dashboard_rerun(database, calculations, project_id):
+    """The reads 2_PM_Dashboard.py issues on every widget interaction."""
+    calculations.get_project_metrics(project_id)
+    calculations.get_burndown_data(project_id)
+    calculations.get_category_spending(project_id)
+    database.get_df("SELECT * FROM baseline_schedule WHERE project_id = ? ORDER BY planned_start", (project_id,))
+    database.get_project_risks(project_id)
+
+
+def bench_cache(projects=50, rows=200_000, reruns=20):
+    path = _portfolio_db(projects, rows)
+    database = _use_app_db(path, cache=True)
+    import calculations
+    cache = database.query_cache
+    project_id = 1
+
+    def cold():
+        cache.clear()
+        _pm_dashboard_rerun(database, calculations, project_id)
+
+    cold_ms = _time_ms(cold, repeat=5)
+    cache.reset_stats()
+    warm_ms = _time_ms(lambda: _pm_dashboard_rerun(database, calculations, project_id), repeat=reruns)
+
+    # A write to one table evicts only the entries that read it
+    before = cache.get_stats()['entries']
+    database.add_expenditure({'project_id': project_id, 'category': 'Labour', 'reference_id': 'B-1',
+                              'amount': 10.0, 'spend_date': date.today().isoformat()}, 1)
+    after = cache.get_stats()['entries']
+    write_ms = _time_ms(lambda: _pm_dashboard_rerun(database, calculations, project_id), repeat=1)
+    stats = cache.get_stats()
+    _use_app_db(path)
+    _drop_temp_db(path)
+
+    _print_table(
+        f"PM Dashboard rerun, project of {rows // projects:,} expenditure rows (ms, median)",
+        ["rerun", "ms", "speedup"],
+        [("cold (no cache)", cold_ms, "1x"),
+         ("warm", warm_ms, f"{cold_ms / max(warm_ms, 1e-6):.0f}x"),
+         ("after add_expenditure", write_ms, f"{cold_ms / max(write_ms, 1e-6):.1f}x")]
+    )
+    print(f"entries {before} -> {after} after the write; "
+          f"hits {stats['hits']}, misses {stats['misses']}, hit rate {stats['hit_rate']:.0%}")
+    return {'cold_ms': cold_ms, 'warm_ms': warm_ms, 'after_write_ms': write_ms, 'stats': stats}
+
+
+# =============================================================================
+# CHARTS: report generation time and size, raster vs vector charts
+# =============================================================================
+def bench_charts(projects=20, rows=20_000):
+    path = _portfolio_db(projects, rows)
+    database = _use_app_db(path)
+    import charts
+    import pdf_generator
+
+    ids = [int(pid) for pid in database.get_df("SELECT project_id FROM projects")["project_id"]]
+    pdf_generator.PDFReportGenerator(ids[0]).generate()  # matplotlib/font start-up is not what we measure
+
+    def run_all():
+        sizes = []
+        for pid in ids:
+            sizes.append(len(pdf_generator.PDFReportGenerator(pid).generate().getvalue()))
+        return sizes
+
+    def clear_memo():
+        for fn in (charts.financial_chart, charts.cost_breakdown_chart, charts.progress_chart):
+            fn.cache_clear()
+
+    results = []
+    for fmt in ('png', 'pdf'):
+        pdf_generator.CHART_FORMAT = fmt
+        clear_memo()
+        t0 = time.perf_counter()
+        sizes = run_all()
+        cold_ms = (time.perf_counter() - t0) * 1000 / len(ids)
+        t0 = time.perf_counter()
+        run_all()
+        memo_ms = (time.perf_counter() - t0) * 1000 / len(ids)
+        results.append((fmt, cold_ms, memo_ms, f"{sum(sizes) / len(sizes) / 1024:.0f}"))
+    pdf_generator.CHART_FORMAT = 'pdf'
+    _drop_temp_db(path)
+
+    _print_table(
+        f"PDF report per project, {len(ids)} projects (ms, mean)",
+        ["charts", "ms", "ms (memoized)", "KB"], results
+    )
+    return results
+
+
+# =============================================================================
+# EXPORT: portfolio PDF export throughput and parent memory
+# =============================================================================
+def bench_export(projects=40, rows=40_000, workers=None):
+    import resource
+    path = _portfolio_db(projects, rows)
+    _use_app_db(path)
+    import portfolio_export
+
+    results = []
+    out_dir = tempfile.mkdtemp(prefix='pmt_bench_export_')
+    for fmt in portfolio_export.FORMATS:
+        out = os.path.join(out_dir, f"portfolio.{fmt}")
+        summary = portfolio_export.export_portfolio(out, fmt=fmt, workers=workers)
+        results.append((fmt, summary['written'], summary['seconds'] * 1000,
+                        f"{summary['written'] / summary['seconds']:.1f}", f"{os.path.getsize(out) / 1e6:.1f}"))
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    shutil.rmtree(out_dir, ignore_errors=True)
+    _drop_temp_db(path)
+
+    _print_table(
+        f"Portfolio export, {projects} projects, {workers or portfolio_export.EXPORT_WORKERS} workers",
+        ["format", "reports", "ms", "reports/s", "MB"], results
+    )
+    print(f"parent peak RSS {peak_mb:.0f} MB")
+    return results
+
+
+# =============================================================================
+# CPM: critical path on synthetic schedules
+# =============================================================================
+def _synthetic_schedule(activities, max_preds=3, window=50, seed=42):
+    """Random DAG: each activity depends on up to `max_preds` of the `window` before it."""
+    rng = random.Random(seed)
+    ids = list(range(1, activities + 1))
+    durations = [rng.randint(1, 30) for _ in ids]
+    not_before = [rng.randint(0, activities // 10) if rng.random() < 0.05 else None for _ in ids]
+    predecessors = {}
+    for i in range(1, activities):
+        k = rng.randint(0, max_preds)
+        if k:
+            predecessors[ids[i]] = rng.sample(ids[max(0, i - window):i], min(k, i, window))
+    return ids, durations, not_before, predecessors
+
+
+def _check_cpm(result, predecessors):
+    """Every edge respects early/late times and the critical path has zero float."""
+    pos = {a: i for i, a in enumerate(result['activity_id'])}
+    for act, preds in predecessors.items():
+        i = pos[act]
+        for p in preds:
+            j = pos[p]
+            assert result['early_start'][i] >= result['early_finish'][j]
+            assert result['late_finish'][j] <= result['late_start'][i]
+    assert all(f >= 0 for f in result['total_float'])
+    assert all(result['total_float'][pos[a]] == 0 for a in result['path'])
+    assert max(result['early_finish']) == max(result['early_finish'][pos[a]] for a in result['path'])
+
+
+def bench_cpm(sizes=(1_000, 10_000, 50_000)):
+    import critical_path
+
+    results = []
+    for n in sizes:
+        ids, durations, not_before, predecessors = _synthetic_schedule(n)
+        edges = sum(len(p) for p in predecessors.values())
+        result = critical_path.compute(ids, durations, not_before, predecessors)
+        _check_cpm(result, predecessors)
+        ms = _time_ms(lambda: critical_path.compute(ids, durations, not_before, predecessors))
+        results.append((n, edges, len(result['path']), ms, f"{ms * 1000 / (n + edges):.2f}"))
+    _print_table("CPM compute() on synthetic DAGs", ["activities", "edges", "critical", "ms", "us/(V+E)"], results)
+
+    # End to end for one project: graph query + CPM, then the cached lookup
+    n = sizes[-1] if sizes[-1] <= 20_000 else 10_000
+    ids, durations, not_before, predecessors = _synthetic_schedule(n)
+    path = _temp_db('cpm')
+    conn = sqlite3.connect(path)
+    migrations.migrate(conn)
+    conn.execute("INSERT INTO projects (project_id, project_name, project_number, total_budget) VALUES (1, 'CPM', 'CPM-1', 0)")
+    start = date(2024, 1, 1)
+    conn.executemany(
+        "INSERT INTO baseline_schedule (activity_id, project_id, activity_name, planned_start, planned_finish, budgeted_cost) "
+        "VALUES (?, 1, ?, ?, ?, 0)",
+        [(a, f"Activity {a}", (start + timedelta(days=nb or 0)).isoformat(),
+          (start + timedelta(days=(nb or 0) + d)).isoformat()) for a, d, nb in zip(ids, durations, not_before)]
+    )
+    conn.executemany("INSERT INTO activity_dependencies (activity_id, predecessor_id) VALUES (?, ?)",
+                     [(a, p) for a, preds in predecessors.items() for p in preds])
+    conn.commit()
+    conn.close()
+    database = _use_app_db(path, cache=True)
+    import critical_path
+
+    def cold():
+        database.query_cache.clear()
+        critical_path.get_critical_path(1)
+
+    cold_ms = _time_ms(cold)
+    warm_ms = _time_ms(lambda: critical_path.get_critical_path(1), repeat=20)
+    _drop_temp_db(path)
+    _print_table(f"get_critical_path, one project with {n} activities",
+                 ["run", "ms"], [("cold (query + CPM)", cold_ms), ("cached", warm_ms)])
+    return results
+
+
+# =============================================================================
+# BURNDOWN: per-project builder vs batch, full resolution vs downsampled
+# =============================================================================
+def bench_burndown(projects=100, rows=200_000, years=5):
+    path = _portfolio_db(projects, rows)
+    conn = sqlite3.connect(path)
+    # Multi-year projects make the daily ideal/forecast lines long
+    conn.execute("UPDATE projects SET start_date = '2022-01-01', target_end_date = ?",
+                 (date(2022 + years, 1, 1).isoformat(),))
+    conn.commit()
+    conn.close()
+    database = _use_app_db(path)
+    import calculations
+
+    ids = [r['project_id'] for r in database.execute_query("SELECT project_id FROM projects")]
+    points = calculations.BURNDOWN_MAX_POINTS
+    full = calculations.get_burndown_data(ids[0])
+    small = calculations.get_burndown_data(ids[0], points)
+    assert full['status'] == small['status']
+    batch = calculations.get_burndown_batch(ids)
+    mismatched = [p for p in ids if batch[p]['status'] != calculations.get_burndown_data(p)['status']]
+
+    results = [
+        ("per project, full", _time_ms(lambda: [calculations.get_burndown_data(p) for p in ids], repeat=3)),
+        (f"per project, {points} pts", _time_ms(lambda: [calculations.get_burndown_data(p, points) for p in ids], repeat=3)),
+        ("batch, full", _time_ms(lambda: calculations.get_burndown_batch(ids), repeat=3)),
+        (f"batch, {points} pts", _time_ms(lambda: calculations.get_burndown_batch(ids, points), repeat=3)),
+    ]
+    rows_per_series = [(k, len(full[k]), len(small[k])) for k in ('ideal_df', 'actual_df', 'forecast_df')]
+    _drop_temp_db(path)
+
+    _print_table(f"Burndown series, {len(ids)} projects over {years} years", ["variant", "ms"], results)
+    _print_table("Points per series (one project)", ["series", "full", "downsampled"], rows_per_series)
+    print(f"batch vs per-project status mismatches: {len(mismatched)}")
+    return results
+
+
+# =============================================================================
+# SPEND: spend_buckets vs re-aggregating expenditure_log
+# =============================================================================
+def bench_spend(projects=50, rows=500_000):
+    path = _portfolio_db(projects, rows)
+    database = _use_app_db(path)
+    import calculations
+
+    pid = 1
+    results = []
+    for label, fn in [
+        ("monthly trend", lambda src: calculations.get_monthly_spending_trend(pid, source=src)),
+        ("category split", lambda src: calculations.get_category_spending(pid, source=src)),
+        ("burndown", lambda src: calculations.get_burndown_data(pid, source=src)),
+        ("burndown batch", lambda src: calculations.get_burndown_batch(source=src)),
+    ]:
+        raw_ms = _time_ms(lambda: fn("raw"))
+        bucket_ms = _time_ms(lambda: fn("buckets"))
+        results.append((label, raw_ms, bucket_ms, f"{raw_ms / bucket_ms:.1f}x"))
+    buckets = database.execute_query("SELECT COUNT(*) AS n FROM spend_buckets")[0]['n']
+    check_ms = _time_ms(lambda: database.rebuild_spend_buckets(fix=False), repeat=1)
+    _drop_temp_db(path)
+
+    _print_table(f"Spend aggregates, {rows} expenditure rows, {projects} projects ({rows // projects} rows/project)",
+                 ["query", "raw ms", "buckets ms", "speedup"], results)
+    print(f"{buckets} bucket rows; full consistency check {check_ms:.0f} ms")
+    return results
+
+
+# =============================================================================
+# SNAPSHOT: portfolio questions over Arrow snapshots vs SQLite scans
+# =============================================================================
+def bench_snapshot(projects=200, rows=1_000_000):
+    path = _portfolio_db(projects, rows)
+    database = _use_app_db(path)
+    import snapshots
+
+    snap_dir = os.path.join(os.path.dirname(path), 'snapshots')
+    t0 = time.perf_counter()
+    manifest = snapshots.export_snapshot('bench', snap_dir)
+    export_ms = (time.perf_counter() - t0) * 1000
+    snapshots.SNAPSHOT_DIR = snap_dir
+
+    questions = [
+        ("spend by category",
+         lambda: database.get_df("SELECT category, SUM(amount) AS amount FROM expenditure_log GROUP BY category"),
+         lambda: snapshots.category_spend('bench')),
+        ("monthly spend",
+         lambda: database.get_df("SELECT strftime('%Y-%m', spend_date) AS month, SUM(amount) AS amount "
+                                 "FROM expenditure_log GROUP BY month ORDER BY month"),
+         lambda: snapshots.monthly_spend('bench')),
+        ("CPI per project",
+         lambda: database.get_df("""
+             SELECT p.project_id, e.ev / a.ac AS cpi FROM projects p
+             LEFT JOIN (SELECT project_id, SUM(budgeted_cost) AS ev FROM baseline_schedule
+                        WHERE status = 'Complete' GROUP BY project_id) e ON e.project_id = p.project_id
+             LEFT JOIN (SELECT project_id, SUM(amount) AS ac FROM expenditure_log GROUP BY project_id) a
+                    ON a.project_id = p.project_id"""),
+         lambda: snapshots.cpi_distribution('bench')),
+        ("load 2 columns",
+         lambda: database.get_df("SELECT project_id, amount FROM expenditure_log"),
+         lambda: snapshots.load('expenditure_log', ['project_id', 'amount'], 'bench')),
+    ]
+    results = [(label, _time_ms(sql, repeat=3), _time_ms(snap, repeat=3)) for label, sql, snap in questions]
+    size_mb = sum(os.path.getsize(os.path.join(snap_dir, 'bench', f)) for f in os.listdir(os.path.join(snap_dir, 'bench'))) / 1e6
+    _drop_temp_db(path)
+
+    _print_table(f"Portfolio questions, {rows} expenditure rows", ["question", "SQLite ms", "snapshot ms"],
+                 [(label, sql_ms, snap_ms) for label, sql_ms, snap_ms in results])
+    print(f"export {export_ms:.0f} ms, {size_mb:.1f} MB, rows {manifest['tables']}")
+    return results
+
+
+# =============================================================================
+# PAGES: keyset pagination of the log views vs LIMIT/OFFSET
+# =============================================================================
+def bench_pages(projects=50, rows=500_000, audit_rows=500_000, page_size=50):
+    path = _portfolio_db(projects, rows)
+    conn = sqlite3.connect(path)
+    rng = random.Random(17)
+    start = datetime(2023, 1, 1)
+    conn.executemany(
+        "INSERT INTO audit_log (table_name, record_id, action, old_value, new_value, changed_by, changed_at) "
+        "VALUES (?, ?, 'UPDATE', 'old', 'new', 1, ?)",
+        ((rng.choice(['projects', 'risks', 'baseline_schedule']), i,
+          (start + timedelta(seconds=i * 60 // 3)).strftime('%Y-%m-%d %H:%M:%S')) for i in range(audit_rows)),
+    )
+    conn.commit()
+    conn.close()
+    database = _use_app_db(path)
+    import query_cache
+    query_cache.ENABLED = False  # time the queries, not cache hits
+
+    pid = int(database.execute_query(
+        "SELECT project_id FROM expenditure_log GROUP BY project_id ORDER BY COUNT(*) DESC LIMIT 1")[0][0])
+    views = [
+        ("audit, all", 'audit_log', {}),
+        ("audit, one table", 'audit_log', {'table': 'risks'}),
+        ("expenditure, project", 'expenditure_log', {'project': pid}),
+        ("activity log, project", 'activity_log', {'project': pid}),
+    ]
+    results = []
+    for label, view, filters in views:
+        spec = database.PAGED_VIEWS[view]
+        clauses, params = database._page_filters(spec, filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        order = ', '.join(f"{col} DESC" for col in spec['key'])
+        offset_sql = f"{spec['sql']} {where} ORDER BY {order} LIMIT ? OFFSET ?"
+
+        total, _ = database.estimate_count(view, filters)
+        for depth in (1, 10, 100, 1000):
+            if (depth - 1) * page_size >= total:
+                continue
+            # walk to the page once to get its cursor, as a user clicking "Older" would
+            cursor = None
+            for _ in range(depth - 1):
+                _, cursor = database.get_page(view, filters, cursor, page_size)
+            offset_ms = _time_ms(lambda: database.get_df(offset_sql, (*params, page_size, (depth - 1) * page_size), cache=False))
+            keyset_ms = _time_ms(lambda: database.get_page(view, filters, cursor, page_size))
+            results.append((label, depth, offset_ms, keyset_ms))
+        count_ms = _time_ms(lambda: database.estimate_count(view, filters))
+        results.append((label, "count", _time_ms(lambda: database.execute_query(
+            f"SELECT COUNT(*) FROM {spec['count_from']} {where}", params)), count_ms))
+    _drop_temp_db(path)
+
+    _print_table(f"Log pages of {page_size}, {rows} expenditure rows, {audit_rows} audit rows",
+                 ["view", "page", "OFFSET / COUNT ms", "keyset / estimate ms"], results)
+    return results
+
+
+# =============================================================================
+# AUDIT: per-entry commits vs the queued background writer
+# =============================================================================
+def bench_audit(entries=20_000):
+    path = _temp_db('audit.db')
+    database = _use_app_db(path)
+    import audit
+
+    changes = [('risks', i, 'UPDATE', {'status': 'Open'}, {'status': 'Closed'}, 1) for i in range(entries)]
+
+    t0 = time.perf_counter()
+    for table, rid, action, old, new, uid in changes:
+        database.execute_query(
+            "INSERT INTO audit_log (table_name, record_id, action, old_value, new_value, changed_by) VALUES (?, ?, ?, ?, ?, ?)",
+            (table, rid, action, str(old), str(new), uid), commit=True)
+    sync_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for change in changes:
+        database.log_change(*change)
+    record_s = time.perf_counter() - t0
+    audit.flush(timeout=60)
+    queued_s = time.perf_counter() - t0
+
+    sizes = database.execute_query('''
+        SELECT new_value LIKE '{"%' AS is_json, AVG(LENGTH(old_value) + LENGTH(new_value)) AS size
+        FROM audit_log GROUP BY is_json ORDER BY is_json''')
+    stats = audit.get_stats()
+    _drop_temp_db(path)
+
+    _print_table(f"Audit log, {entries} entries", ["path", "caller s", "until on disk s", "entries/sec"], [
+        ("commit per entry (repr)", sync_s, sync_s, f"{entries / sync_s:,.0f}"),
+        ("queued JSON diffs", record_s, queued_s, f"{entries / queued_s:,.0f}"),
+    ])
+    print(f"{stats['batches']} writer batches; bytes/entry repr {sizes[0]['size']:.0f}, JSON {sizes[1]['size']:.0f}")
+
+
+# =============================================================================
+# LOGIN: concurrent login throughput through login_service
+# =============================================================================
+def bench_login(users=20, clients=16, attempts=200):
+    from concurrent.futures import ThreadPoolExecutor
+    from werkzeug.security import check_password_hash
+
+    path = _temp_db('login.db')
+    database = _use_app_db(path)
+    import login_service
+
+    passwords = {f'user{i:03d}': f'pw-{i}' for i in range(users)}
+    for username, password in passwords.items():
+        database.create_user({'username': username, 'password_hash': login_service.hash_password(password),
+                              'role': 'pm', 'full_name': username})
+    creds = list(passwords.items())
+
+    def run(label, attempt, jobs):
+        latencies = []
+
+        def timed(job):
+            t0 = time.perf_counter()
+            result = attempt(*job)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            return result
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            results = list(pool.map(timed, jobs))
+        elapsed = time.perf_counter() - t0
+        latencies.sort()
+        return (label, len(jobs), f"{len(jobs) / elapsed:,.1f}", latencies[len(latencies) // 2],
+                latencies[int(len(latencies) * 0.95) - 1], sum(1 for r in results if r))
+
+    def direct(username, password, ip):
+        user = database.get_user_by_username(username)
+        return user is not None and check_password_hash(user['password_hash'], password)
+
+    def service(username, password, ip):
+        return login_service.authenticate(username, password, ip)[0] is not None
+
+    shift_start = [(u, p, f'10.0.0.{i}') for i, (u, p) in enumerate(creds)]
+    brute_force = [(creds[0][0], f'guess-{i}', '10.9.9.9') for i in range(attempts)]
+    spray = [(u, f'guess-{i}', '10.9.9.9') for i in range(attempts // len(creds) + 1) for u, _ in creds][:attempts]
+
+    results = [run("direct: shift start", direct, shift_start)]
+    login_service.reset()
+    results.append(run("service: shift start", service, shift_start))
+    results.append(run("service: reconnects", service, shift_start))
+    results.append(run("direct: brute force", direct, brute_force))
+    login_service.reset()
+    results.append(run("service: brute force", service, brute_force))
+    brute_hashes = login_service.get_stats()['hash_checks']
+    login_service.reset()
+    results.append(run("service: spray 1 IP", service, spray))
+    spray_hashes = login_service.get_stats()['hash_checks']
+    _drop_temp_db(path)
+
+    _print_table(f"Logins, {users} users, {clients} concurrent clients, {login_service.LOGIN_WORKERS} hash workers "
+                 f"({login_service.PASSWORD_METHOD})",
+                 ["scenario", "attempts", "per sec", "p50 ms", "p95 ms", "accepted"], results)
+    print(f"hash checks: brute force {brute_hashes}/{attempts}, password spray {spray_hashes}/{len(spray)} "
+          f"(direct path: one per attempt)")
+    return results
+
+
+# =============================================================================
+# SUITE: hot paths on synthetic portfolios of increasing size, saved as JSON
+# =============================================================================
+SUITE_FUNCTIONS = ['get_project_metrics', 'get_all_projects_summary', 'get_burndown_data',
+                   'import_project', 'PDF report']
+
+
+def _call_stats(samples):
+    samples = sorted(samples)
+    return {
+        'calls': len(samples),
+        'median_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        'min_ms': round(samples[0], 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+    }
+
+
+def _timed_calls(fn, args, repeat):
+    """Wall time in ms of every fn(arg), `repeat` passes over `args`."""
+    samples = []
+    for _ in range(repeat):
+        for arg in args:
+            t0 = time.perf_counter()
+            fn(arg)
+            samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+
+def _git_state():
+    root = os.path.dirname(os.path.abspath(__file__))
+
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=root, capture_output=True, text=True, timeout=30).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ''
+
+    return {'commit': git('rev-parse', 'HEAD') or None, 'branch': git('rev-parse', '--abbrev-ref', 'HEAD') or None,
+            'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))}
+
+
+def _suite_scale(projects, repeat, sample, workbook_size):
+    """Generates one synthetic portfolio and times the hot paths on it."""
+    import synthetic_data
+
+    path = _temp_db(f'suite_{projects}.db')
+    t0 = time.perf_counter()
+    counts = synthetic_data.generate_database(path, projects)
+    generate_s = time.perf_counter() - t0
+    database = _use_app_db(path)
+    import calculations
+    import charts
+    import importer
+    import pdf_generator
+
+    step = max(1, projects // sample)
+    ids = list(range(1, projects + 1, step))[:sample]
+    activities, expenditures, risks = workbook_size
+    books = [
+        synthetic_data.generate_workbook(os.path.join(os.path.dirname(path), f"book_{i}.xlsx"),
+                                         activities, expenditures, risks, project_number=900_000 + i)
+        for i in range(repeat)
+    ]
+    pdf_generator.PDFReportGenerator(ids[0]).generate()  # matplotlib/font start-up is not what we measure
+
+    def report(pid):
+        for fn in (charts.financial_chart, charts.cost_breakdown_chart, charts.progress_chart):
+            fn.cache_clear()  # each report draws its charts, as a cold request would
+        pdf_generator.PDFReportGenerator(pid).generate()
+
+    samples = {
+        'get_project_metrics': _timed_calls(calculations.get_project_metrics, ids, repeat),
+        'get_all_projects_summary': _timed_calls(lambda _: calculations.get_all_projects_summary(), [None], repeat),
+        'get_burndown_data': _timed_calls(calculations.get_burndown_data, ids, repeat),
+        'PDF report': _timed_calls(report, ids[:3], repeat),
+        # last, so the imported projects do not change what the reads above see
+        'import_project': _timed_calls(lambda book: importer.import_project(book, 1), books, 1),
+    }
+    _drop_temp_db(path)
+
+    results = []
+    for name in SUITE_FUNCTIONS:
+        result = {'projects': projects, 'function': name, **_call_stats(samples[name])}
+        if name == 'import_project':
+            rows = activities + expenditures + risks
+            result['rows'] = rows
+            result['rows_per_sec'] = round(rows / (result['median_ms'] / 1000))
+        results.append(result)
+    return {'projects': projects, 'generate_s': round(generate_s, 2), 'rows': counts}, results
+
+
+def _compare_suite(baseline, results):
+    """Prints the median of each (scale, function) against a saved run."""
+    before = {(r['projects'], r['function']): r['median_ms'] for r in baseline['results']}
+    rows = []
+    for r in results:
+        old = before.get((r['projects'], r['function']))
+        change = f"{(r['median_ms'] - old) / old * 100:+.1f}%" if old else "n/a"
+        rows.append((r['function'], r['projects'], old if old is not None else "-", r['median_ms'], change))
+    commit = (baseline.get('git') or {}).get('commit') or 'unknown'
+    _print_table(f"Compared with {commit[:10]} ({baseline.get('created_at', '?')})",
+                 ["function", "projects", "before ms", "after ms", "change"], rows)
+
+
+def bench_suite(scales=(10, 100, 1_000), repeat=5, sample=10, workbook_size=(200, 2_000, 50),
+                output=None, compare=None):
+    """
+    Times the hot paths at each portfolio size and writes the results, with the
+    git commit and environment they came from, to `output` (default: a new file
+    under bench_results/). `compare` is an earlier results file to diff against.
+    """
+    datasets, results = [], []
+    for projects in scales:
+        dataset, timings = _suite_scale(projects, repeat, sample, workbook_size)
+        datasets.append(dataset)
+        results.extend(timings)
+        print(f"{projects} projects: generated in {dataset['generate_s']} s")
+
+    git = _git_state()
+    run = {
+        'suite': 'hot-paths',
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git': git,
+        'environment': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'params': {'scales': list(scales), 'repeat': repeat, 'sample': sample,
+                   'workbook': dict(zip(('activities', 'expenditures', 'risks'), workbook_size))},
+        'datasets': datasets,
+        'results': results,
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"suite-{stamp}-{(git['commit'] or 'nogit')[:10]}.json")
+    with open(output, 'w') as f:
+        json.dump(run, f, indent=2)
+
+    _print_table("Hot paths on synthetic portfolios (ms per call)",
+                 ["function", "projects", "calls", "median", "p95"],
+                 [(r['function'], r['projects'], r['calls'], r['median_ms'], r['p95_ms']) for r in results])
+    print(f"results written to {output}")
+    if compare:
+        with open(compare) as f:
+            _compare_suite(json.load(f), results)
+    return run
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PM Tool performance benchmarks")
+    sub = parser.add_subparsers(dest='benchmark', required=True)
+
+    p_idx = sub.add_parser('indexes', help="Dashboard query latency before/after the index migration")
+    p_idx.add_argument('--rows', type=int, default=1_000_000)
+    p_idx.add_argument('--projects', type=int, default=200)
+
+    p_port = sub.add_parser('portfolio', help="Set-based portfolio metrics vs the per-project loop")
+    p_port.add_argument('--projects', type=int, default=200)
+    p_port.add_argument('--rows', type=int, default=200_000)
+
+    sub.add_parser('parity', help="Check get_portfolio_metrics against get_project_metrics, and report cache invalidation")
+
+    p_imp = sub.add_parser('import', help="Excel import throughput on a scaled sample workbook")
+    p_imp.add_argument('--activities', type=int, default=500)
+    p_imp.add_argument('--expenditures', type=int, default=5_000)
+    p_imp.add_argument('--risks', type=int, default=200)
+
+    p_cache = sub.add_parser('cache', help="PM Dashboard rerun with and without the query cache")
+    p_cache.add_argument('--projects', type=int, default=50)
+    p_cache.add_argument('--rows', type=int, default=200_000)
+
+    p_chart = sub.add_parser('charts', help="Report generation time and size, raster vs vector charts")
+    p_chart.add_argument('--projects', type=int, default=20)
+
+    p_exp = sub.add_parser('export', help="Portfolio PDF export throughput (ZIP and merged PDF)")
+    p_exp.add_argument('--projects', type=int, default=40)
+    p_exp.add_argument('--workers', type=int)
+
+    p_cpm = sub.add_parser('cpm', help="Critical path engine on synthetic schedules")
+    p_cpm.add_argument('--activities', type=int, nargs='+', default=[1_000, 10_000, 50_000])
+
+    p_bd = sub.add_parser('burndown', help="Burndown series per project vs batch, with downsampling")
+    p_bd.add_argument('--projects', type=int, default=100)
+    p_bd.add_argument('--rows', type=int, default=200_000)
+
+    p_spend = sub.add_parser('spend', help="Spend series from spend_buckets vs the raw expenditure log")
+    p_spend.add_argument('--projects', type=int, default=50)
+    p_spend.add_argument('--rows', type=int, default=500_000)
+
+    p_snap = sub.add_parser('snapshot', help="Portfolio questions over Arrow snapshots vs SQLite")
+    p_snap.add_argument('--projects', type=int, default=200)
+    p_snap.add_argument('--rows', type=int, default=1_000_000)
+
+    p_pages = sub.add_parser('pages', help="Keyset pagination of the log views vs LIMIT/OFFSET")
+    p_pages.add_argument('--projects', type=int, default=50)
+    p_pages.add_argument('--rows', type=int, default=500_000)
+    p_pages.add_argument('--audit-rows', type=int, default=500_000)
+
+    p_audit = sub.add_parser('audit', help="Audit entries committed one by one vs the queued writer")
+    p_audit.add_argument('--entries', type=int, default=20_000)
+
+    p_login = sub.add_parser('login', help="Concurrent login throughput, rate limiting and credential cache")
+    p_login.add_argument('--users', type=int, default=20)
+    p_login.add_argument('--clients', type=int, default=16)
+    p_login.add_argument('--attempts', type=int, default=200)
+
+    p_suite = sub.add_parser('suite', help="Hot paths at several portfolio sizes, saved as JSON for comparison")
+    p_suite.add_argument('--scales', type=int, nargs='+', default=[10, 100, 1_000], help="projects per run")
+    p_suite.add_argument('--repeat', type=int, default=5)
+    p_suite.add_argument('--output', help="Results file (default: bench_results/suite-<time>-<commit>.json)")
+    p_suite.add_argument('--compare', help="Earlier results file to compare against")
+
+    args = parser.parse_args(argv)
+    if args.benchmark == 'indexes':
+        bench_indexes(rows=args.rows, projects=args.projects)
+    elif args.benchmark == 'portfolio':
+        bench_portfolio(projects=args.projects, rows=args.rows)
+    elif args.benchmark == 'import':
+        bench_import(activities=args.activities, expenditures=args.expenditures, risks=args.risks)
+    elif args.benchmark == 'cache':
+        bench_cache(projects=args.projects, rows=args.rows)
+    elif args.benchmark == 'charts':
+        bench_charts(projects=args.projects)
+    elif args.benchmark == 'export':
+        bench_export(projects=args.projects, workers=args.workers)
+    elif args.benchmark == 'cpm':
+        bench_cpm(sizes=args.activities)
+    elif args.benchmark == 'burndown':
+        bench_burndown(projects=args.projects, rows=args.rows)
+    elif args.benchmark == 'spend':
+        bench_spend(projects=args.projects, rows=args.rows)
+    elif args.benchmark == 'snapshot':
+        bench_snapshot(projects=args.projects, rows=args.rows)
+    elif args.benchmark == 'pages':
+        bench_pages(projects=args.projects, rows=args.rows, audit_rows=args.audit_rows)
+    elif args.benchmark == 'audit':
+        bench_audit(entries=args.entries)
+    elif args.benchmark == 'login':
+        bench_login(users=args.users, clients=args.clients, attempts=args.attempts)
+    elif args.benchmark == 'suite':
+        bench_suite(scales=args.scales, repeat=args.repeat, output=args.output, compare=args.compare)
+    elif args.benchmark == 'parity':
+        failures = check_portfolio_parity()
+        failures += check_report_invalidation()
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -28,7 +28,9 @@ def setup():
     # 2. Initialize Database
     print("\n🗄️ Step 2: Initializing Database...")
     try:
-        from pmt_app import init_db
+        # App modules import each other by bare name (as under `streamlit run`)
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pmt_app'))
+        import init_db
         init_db.init_db()
         print("  ✅ Database created and seeded with test users.")
     except Exception as e:
@@ -0,0 +1,360 @@
+"""
+Structured audit trail.
+
+The write helpers in database.py describe each change as a compact JSON diff:
+an UPDATE stores only the fields that changed ({"status":"Active"} ->
+{"status":"Complete"}), an INSERT only the new values, a DELETE only the old
+ones, and bulk helpers one summary entry per batch. Entries recorded inside a
+transaction are queued when it commits and dropped if it rolls back.
+
+Queued entries are written by one background thread with executemany once
+FLUSH_ROWS are waiting or FLUSH_INTERVAL_S has passed since the first of them,
+so a write helper never waits on an audit commit. flush() blocks until
+everything queued so far is on disk and runs at interpreter exit.
+
+compact() is the retention job: UPDATE runs on the same record by the same user
+on one day are merged once they are older than DETAIL_DAYS, and entries older
+than RETAIN_DAYS are deleted. Run it from cron, from pmt_app/:
+    python audit.py compact
+"""
+import argparse
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+
+import metrics
+import query_cache
+
+logger = logging.getLogger(__name__)
+
+FLUSH_ROWS = 500
+FLUSH_INTERVAL_S = 1.0
+MAX_WRITER_CONNECTIONS = 4    # databases the writer keeps a connection open to
+RETAIN_DAYS = int(os.environ.get('PMT_AUDIT_RETAIN_DAYS', 730))
+DETAIL_DAYS = int(os.environ.get('PMT_AUDIT_DETAIL_DAYS', 90))
+SYSTEM_USER_ID = 0            # changed_by for maintenance jobs and other unattributed writes
+REDACTED_FIELDS = frozenset({'password_hash'})
+NO_NET_CHANGE = '_no_net_change'   # new_value flag of a merged run that ended where it began
+
+_INSERT_SQL = '''
+INSERT INTO audit_log (table_name, record_id, action, old_value, new_value, changed_by, changed_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+_queue = queue.Queue()
+_writer = None
+_writer_lock = threading.Lock()
+_write_lock = threading.Lock()    # the writer thread, or flush() draining without one
+_connections = OrderedDict()      # path -> the writer's own connection
+_stats_lock = threading.Lock()
+_stats = {'queued': 0, 'written': 0, 'batches': 0, 'failed': 0}
+
+
+# =============================================================================
+# ENTRIES
+# =============================================================================
+def _plain(value):
+    """JSON-friendly value: numpy scalars, dates and the like become numbers or strings."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if hasattr(value, 'item'):
+        return value.item()
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [_plain(v) for v in value]
+    return str(value)
+
+
+def _fields(values):
+    if values is None:
+        return {}
+    values = dict(values)
+    return {k: '<redacted>' if k in REDACTED_FIELDS else _plain(v) for k, v in values.items()}
+
+
+def _dumps(values):
+    return json.dumps(values, separators=(',', ':'), sort_keys=True) if values else None
+
+
+def diff(old, new, keep=()):
+    """
+    (old_json, new_json) for a change between two mappings: only keys whose value
+    differs are kept (plus `keep`, fields that identify the row), and a side with
+    nothing to say is None.
+    """
+    old, new = _fields(old), _fields(new)
+    if old and new:
+        changed = [k for k in new.keys() | old.keys() if old.get(k) != new.get(k)]
+        if not changed:
+            return None, None
+        changed += [k for k in keep if k not in changed]
+        old = {k: old[k] for k in changed if k in old}
+        new = {k: new[k] for k in changed if k in new}
+    else:
+        old = {k: v for k, v in old.items() if v is not None}
+        new = {k: v for k, v in new.items() if v is not None}
+    return _dumps(old), _dumps(new)
+
+
+def entry(table_name, record_id, action, old=None, new=None, user_id=None, keep=()):
+    """An audit_log row for the change, or None when an UPDATE changed nothing."""
+    old_json, new_json = diff(old, new, keep)
+    if action == 'UPDATE' and old_json is None and new_json is None:
+        return None
+    changed_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')  # as CURRENT_TIMESTAMP
+    user_id = SYSTEM_USER_ID if user_id is None else int(user_id)
+    return (table_name, int(record_id or 0), action, old_json, new_json, user_id, changed_at)
+
+
+# =============================================================================
+# BACKGROUND WRITER
+# =============================================================================
+def enqueue(path, entries):
+    """Queues audit_log rows for the database at `path`."""
+    entries = [e for e in entries if e is not None]
+    if not entries:
+        return
+    _start_writer()
+    for e in entries:
+        _queue.put((path, e))
+    with _stats_lock:
+        _stats['queued'] += len(entries)
+
+
+def _start_writer():
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_run, name='audit-writer', daemon=True)
+            _writer.start()
+
+
+def _connection(path):
+    """
+    The writer's long-lived connection to `path`, kept apart from the pool so
+    audit writes never take a connection a page is waiting for. The least
+    recently used one is closed past MAX_WRITER_CONNECTIONS.
+    """
+    import database
+
+    conn = _connections.get(path)
+    if conn is None:
+        conn = _connections[path] = database._open_connection(path)
+        while len(_connections) > MAX_WRITER_CONNECTIONS:
+            database._close(_connections.popitem(last=False)[1])
+    _connections.move_to_end(path)
+    return conn
+
+
+def _close_connections():
+    import database
+
+    with _write_lock:
+        while _connections:
+            database._close(_connections.popitem()[1])
+
+
+def _write(batch):
+    """Inserts (path, row) items with one executemany and commit per database."""
+    import database
+
+    batch.sort(key=lambda item: item[0])
+    with _write_lock:
+        for path, items in groupby(batch, key=lambda item: item[0]):
+            rows = [row for _, row in items]
+            try:
+                conn = _connection(path)
+                with conn:
+                    conn.executemany(_INSERT_SQL, rows)
+            except Exception as e:
+                logger.error(f"Failed to write {len(rows)} audit entries to {path}: {e}")
+                # Start from a fresh connection next time
+                conn = _connections.pop(path, None)
+                if conn is not None:
+                    database._close(conn)
+                with _stats_lock:
+                    _stats['failed'] += len(rows)
+                continue
+            with _stats_lock:
+                _stats['written'] += len(rows)
+                _stats['batches'] += 1
+    query_cache.invalidate(('audit_log',))
+
+
+def _run():
+    batch, deadline = [], None
+    while True:
+        timeout = None if not batch else max(0.0, deadline - time.monotonic())
+        try:
+            item = _queue.get(timeout=timeout)
+        except queue.Empty:
+            item = None
+        if isinstance(item, threading.Event):
+            # flush() marker: everything queued before it is in `batch`
+            if batch:
+                _write(batch)
+                batch = []
+            item.set()
+            continue
+        if item is not None:
+            if not batch:
+                deadline = time.monotonic() + FLUSH_INTERVAL_S
+            batch.append(item)
+        if batch and (len(batch) >= FLUSH_ROWS or time.monotonic() >= deadline):
+            _write(batch)
+            batch = []
+
+
+def flush(timeout=10.0):
+    """Blocks until every entry queued so far is written; returns False on timeout."""
+    if _writer is None or not _writer.is_alive():
+        # no writer (or it died): drain in the calling thread
+        batch = []
+        while True:
+            try:
+                item = _queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+            else:
+                batch.append(item)
+        if batch:
+            _write(batch)
+        return True
+    done = threading.Event()
+    _queue.put(done)
+    return done.wait(timeout)
+
+
+def get_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['pending'] = _queue.qsize()
+    return stats
+
+
+# atexit runs in reverse order: flush first, then close the writer's connections
+atexit.register(_close_connections)
+atexit.register(flush)
+
+
+@metrics.register_collector
+def _collect_metrics():
+    stats = get_stats()
+    return [
+        ('pmt_audit_entries_total', 'counter', "Audit entries by outcome",
+         [({'outcome': k}, stats[k]) for k in ('queued', 'written', 'failed')]),
+        ('pmt_audit_pending', 'gauge', "Audit entries waiting for the writer", [({}, stats['pending'])]),
+    ]
+
+
+# =============================================================================
+# RETENTION & COMPACTION
+# =============================================================================
+def _merge_run(rows):
+    """
+    One entry for a run of UPDATE diffs on a record: the first old value and the
+    last new value of every field, dropping fields that ended where they began.
+    A run with no net change becomes its identifying fields with NO_NET_CHANGE
+    set, so who touched the row, and when, survives. Fields equal on both sides of a diff identify the row (see diff's `keep`);
+    runs mixing different rows, or with diffs that are not JSON (entries written
+    before this module), are left alone and give None.
+    """
+    old, new, ident = {}, {}, None
+    for row in rows:
+        try:
+            row_old = json.loads(row['old_value']) if row['old_value'] else {}
+            row_new = json.loads(row['new_value']) if row['new_value'] else {}
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(row_old, dict) or not isinstance(row_new, dict):
+            return None
+        row_ident = {k: v for k, v in row_old.items() if k in row_new and row_new[k] == v}
+        if ident is not None and row_ident != ident:
+            return None
+        ident = row_ident
+        for k, v in row_old.items():
+            old.setdefault(k, v)
+        new.update(row_new)
+    changed = [k for k in old.keys() | new.keys() if k not in ident and old.get(k) != new.get(k)]
+    if not changed:
+        # The run ended where it began; keep who touched the row and when
+        return _dumps(ident), _dumps({**ident, NO_NET_CHANGE: True})
+    keys = changed + list(ident)
+    return _dumps({k: old[k] for k in keys if k in old}), _dumps({k: new[k] for k in keys if k in new})
+
+
+def compact(retain_days=None, detail_days=None):
+    """
+    Deletes entries older than `retain_days` and merges same-day UPDATE runs
+    (same table, record and user) older than `detail_days` into their last
+    entry. Returns {'deleted': n, 'merged': n}.
+    """
+    import database
+
+    retain_days = RETAIN_DAYS if retain_days is None else retain_days
+    detail_days = DETAIL_DAYS if detail_days is None else detail_days
+    now = datetime.now(timezone.utc)
+    retain_cutoff = (now - timedelta(days=retain_days)).strftime('%Y-%m-%d %H:%M:%S')
+    detail_cutoff = (now - timedelta(days=detail_days)).strftime('%Y-%m-%d %H:%M:%S')
+
+    flush()
+    with database.transaction() as conn:
+        # 1. Retention
+        deleted = conn.execute("DELETE FROM audit_log WHERE changed_at < ?", (retain_cutoff,)).rowcount
+
+        # 2. Compaction of old UPDATE runs, streamed in key order
+        cursor = conn.execute('''
+            SELECT audit_id, table_name, record_id, changed_by, date(changed_at) AS day, old_value, new_value
+            FROM audit_log
+            WHERE changed_at < ? AND action = 'UPDATE'
+            ORDER BY table_name, record_id, changed_by, day, audit_id
+        ''', (detail_cutoff,))
+        updates, removed = [], []
+        for _, run in groupby(cursor, key=lambda r: (r['table_name'], r['record_id'], r['changed_by'], r['day'])):
+            run = list(run)
+            if len(run) < 2:
+                continue
+            merged = _merge_run(run)
+            if merged is None:
+                continue
+            updates.append((*merged, run[-1]['audit_id']))
+            removed.extend((r['audit_id'],) for r in run[:-1])
+        conn.executemany("UPDATE audit_log SET old_value = ?, new_value = ? WHERE audit_id = ?", updates)
+        conn.executemany("DELETE FROM audit_log WHERE audit_id = ?", removed)
+    query_cache.invalidate(('audit_log',))
+    logger.info(f"Audit compaction: {deleted} expired, {len(removed)} merged into {len(updates)} entries")
+    return {'deleted': deleted, 'merged': len(removed)}
+
+
+def main(argv=None):
+    import database
+
+    parser = argparse.ArgumentParser(description="Audit log maintenance")
+    parser.add_argument('command', choices=['compact'])
+    parser.add_argument('--retain-days', type=int, default=RETAIN_DAYS,
+                        help=f"Delete entries older than this (default: {RETAIN_DAYS})")
+    parser.add_argument('--detail-days', type=int, default=DETAIL_DAYS,
+                        help=f"Merge same-day updates older than this (default: {DETAIL_DAYS})")
+    parser.add_argument('--db', help="Database file (default: pm_tool.db)")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        database.DB_PATH = os.path.abspath(args.db)
+    result = compact(args.retain_days, args.detail_days)
+    print(f"Deleted {result['deleted']} expired entries, merged {result['merged']} updates.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
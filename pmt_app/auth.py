@@ -1,16 +1,28 @@
 import streamlit as st
-from werkzeug.security import check_password_hash, generate_password_hash
+import database
+import login_service
 from database import get_user_by_username, create_user
 
+# Roles that see every project; everyone else sees the projects they own or are assigned to
+GLOBAL_ROLES = ('admin', 'executive')
+
 def init_session():
     if 'user' not in st.session_state:
         st.session_state['user'] = None
     if 'role' not in st.session_state:
         st.session_state['role'] = None
 
+def _client_ip():
+    try:
+        ip = st.context.ip_address
+    except Exception:
+        return None
+    return ip if isinstance(ip, str) else None
+
 def login(username, password):
-    user = get_user_by_username(username)
-    if user and check_password_hash(user['password_hash'], password):
+    """Returns (True, None) or (False, message to show); see login_service.authenticate."""
+    user, error = login_service.authenticate(username, password, ip=_client_ip())
+    if user is not None:
         # We allow login even if pending/inactive, but handle visibility in main.py
         st.session_state['user'] = {
             'id': user['user_id'],
@@ -20,14 +32,15 @@ def login(username, password):
             'status': user['status']
         }
         st.session_state['role'] = user['role']
-        return True
-    return False
+        st.session_state.pop('permissions', None)
+        return True, None
+    return False, error
 
 def register(username, password, full_name, role='pm'):
     if get_user_by_username(username):
         return False, "Username already exists"
     
-    password_hash = generate_password_hash(password)
+    password_hash = login_service.hash_password(password)
     create_user({
         'username': username,
         'password_hash': password_hash,
@@ -40,13 +53,53 @@ def register(username, password, full_name, role='pm'):
 def logout():
     st.session_state['user'] = None
     st.session_state['role'] = None
+    st.session_state.pop('permissions', None)
     st.rerun()
 
 def is_logged_in():
     return st.session_state.get('user') is not None
 
+def get_permissions():
+    """
+    The logged-in user's role, status and accessible project ids, loaded once per
+    session and reloaded only when database.get_auth_version() has moved (a role,
+    status, assignment or project owner changed). Refreshes the session's user
+    and role from it; logs the session out if the account was deleted.
+    Returns None when nobody is logged in.
+    """
+    user = st.session_state.get('user')
+    if user is None:
+        return None
+    version = database.get_auth_version()
+    perms = st.session_state.get('permissions')
+    if perms is None or perms['version'] != version or perms['user_id'] != user['id']:
+        perms = database.get_user_permissions(user['id'])
+        if perms is None:
+            st.session_state['user'] = None
+            st.session_state['role'] = None
+            st.session_state.pop('permissions', None)
+            return None
+        perms['version'] = version
+        st.session_state['permissions'] = perms
+        user.update(role=perms['role'], status=perms['status'], full_name=perms['full_name'])
+        st.session_state['role'] = perms['role']
+    return perms
+
+def get_accessible_projects(global_roles=GLOBAL_ROLES):
+    """
+    Projects the user may open: all of them for `global_roles`, otherwise those
+    owned or assigned. Filters the (cached) project list without a query per user.
+    """
+    projects = database.get_projects()
+    perms = get_permissions()
+    if perms is None:
+        return projects.iloc[0:0]
+    if perms['role'] in global_roles:
+        return projects
+    return projects[projects['project_id'].isin(perms['project_ids'])]
+
 def require_role(roles):
-    if not is_logged_in():
+    if not is_logged_in() or get_permissions() is None:
         st.error("Please login to access this page")
         st.stop()
     
@@ -1,5 +1,8 @@
 import database
+import query_cache
+import tracing
 import pandas as pd
+import numpy as np
 import logging
 from datetime import datetime, timedelta
 
@@ -7,181 +10,54 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+@tracing.traced('calc')
 def get_project_metrics(project_id):
     """
     Calculates all metrics for a single project.
-    Ensures safe data access with explicit checks for empty results.
+    Reads the project's rollup row plus one date-dependent schedule aggregate,
+    so the cost does not grow with the expenditure history.
     """
-    try:
-        project_df = database.get_df(
-            "SELECT * FROM projects WHERE project_id = ?", (project_id,)
-        )
-        if project_df is None or project_df.empty:
-            logger.warning(f"Project with ID {project_id} not found.")
-            return None
+    metrics = get_portfolio_metrics([project_id])
+    if metrics is None or metrics.empty:
+        logger.warning(f"Project with ID {project_id} not found.")
+        return None
 
-        project = project_df.iloc[0]
+    # Plain Python scalars so callers can format/serialize the dict freely
+    return {
+        key: (value.item() if hasattr(value, "item") else value)
+        for key, value in metrics.iloc[0].items()
+    }
 
-        baseline = database.get_df(
-            "SELECT * FROM baseline_schedule WHERE project_id = ?", (project_id,)
-        )
-        expenditures = database.get_df(
-            "SELECT * FROM expenditure_log WHERE project_id = ?", (project_id,)
-        )
 
-        logs = database.get_df(
-            """
-            SELECT al.*, bs.activity_name, bs.budgeted_cost 
-            FROM activity_log al 
-            JOIN baseline_schedule bs ON al.activity_id = bs.activity_id 
-            WHERE bs.project_id = ?
-        """,
-            (project_id,),
-        )
+SPEND_SOURCE = "buckets"  # "raw" aggregates expenditure_log on every call
 
-        total_budget = (
-            float(project["total_budget"]) if pd.notna(project["total_budget"]) else 0.0
-        )
-        total_spent = 0.0
-        if expenditures is not None and not expenditures.empty:
-            total_spent = float(expenditures["amount"].sum())
-
-        remaining = total_budget - total_spent
-
-        pct_complete = 0.0
-        earned_value = 0.0
-        total_planned = baseline["budgeted_cost"].sum() if not baseline.empty else 0.0
-
-        if not baseline.empty and total_planned > 0:
-            completed_budget = baseline[baseline["status"] == "Complete"][
-                "budgeted_cost"
-            ].sum()
-            pct_complete = completed_budget / total_planned * 100
-            earned_value = completed_budget
-
-        forecast = total_spent + (total_budget - earned_value)
-
-        cpi = (earned_value / total_spent) if total_spent > 0 else 1.0
-
-        budget_health = "Green"
-        if forecast > total_budget * 1.05 and total_budget > 0:
-            budget_health = "Red"
-        elif forecast > total_budget and total_budget > 0:
-            budget_health = "Yellow"
-        elif cpi < 0.85 and total_spent > 0:
-            budget_health = "Red"
-        elif cpi < 0.95 and total_spent > 0:
-            budget_health = "Yellow"
-
-        schedule_health = "Green"
-        if not baseline.empty:
-            baseline["planned_finish"] = pd.to_datetime(baseline["planned_finish"])
-            today = pd.Timestamp.now()
-            overdue = baseline[
-                (baseline["planned_finish"] < today)
-                & (baseline["status"] != "Complete")
-            ]
-            if not overdue.empty:
-                schedule_health = "Red"
-
-        budget_used_pct = (
-            (total_spent / total_budget * 100) if total_budget > 0 else 0.0
-        )
 
-        # NEW METRICS
-        # 1. Burn Rate (spending per day)
-        burn_rate = 0.0
-        days_elapsed = 0
-        if expenditures is not None and not expenditures.empty:
-            expenditures["spend_date"] = pd.to_datetime(expenditures["spend_date"])
-            if not expenditures.empty:
-                first_spend = expenditures["spend_date"].min()
-                last_spend = expenditures["spend_date"].max()
-                days_elapsed = max((last_spend - first_spend).days, 1)
-                burn_rate = total_spent / days_elapsed if days_elapsed > 0 else 0.0
-
-        # 2. Days Remaining
-        days_remaining = 0
-        project_end_date = None
-        if pd.notna(project["target_end_date"]):
-            project_end_date = pd.to_datetime(project["target_end_date"])
-            days_remaining = max((project_end_date - pd.Timestamp.now()).days, 0)
-
-        # 3. Cost Variance (CV = EV - AC)
-        cost_variance = earned_value - total_spent
-
-        # 4. Schedule Variance (SV = EV - PV) - simplified
-        planned_value = 0.0
-        if not baseline.empty:
-            baseline["planned_finish"] = pd.to_datetime(baseline["planned_finish"])
-            today = pd.Timestamp.now()
-            # PV = sum of budgeted costs for activities that should be complete by now
-            planned_value = baseline[baseline["planned_finish"] <= today][
-                "budgeted_cost"
-            ].sum()
-        schedule_variance = earned_value - planned_value
-
-        # 5. SPI (Schedule Performance Index)
-        spi = (earned_value / planned_value) if planned_value > 0 else 1.0
-
-        # 6. Variance at Completion (VAC = BAC - EAC)
-        variance_at_completion = total_budget - forecast
-
-        # 7. Estimate to Complete (ETC)
-        etc = forecast - total_spent if forecast > total_spent else 0
-
-        # 8. Activity counts
-        total_activities = len(baseline) if not baseline.empty else 0
-        completed_activities = (
-            len(baseline[baseline["status"] == "Complete"]) if not baseline.empty else 0
-        )
-        active_activities = (
-            len(baseline[baseline["status"] == "Active"]) if not baseline.empty else 0
-        )
-
-        return {
-            "project_id": project_id,
-            "project_name": str(project["project_name"]),
-            "project_number": str(project["project_number"]),
-            "total_budget": total_budget,
-            "total_spent": total_spent,
-            "remaining": remaining,
-            "pct_complete": min(pct_complete, 100.0),
-            "budget_used_pct": budget_used_pct,
-            "forecast": forecast,
-            "budget_health": budget_health,
-            "schedule_health": schedule_health,
-            "actual_status": str(project.get("status", "Planning")),
-            # New metrics
-            "burn_rate": burn_rate,
-            "days_remaining": days_remaining,
-            "cost_variance": cost_variance,
-            "schedule_variance": schedule_variance,
-            "cpi": cpi,
-            "spi": spi,
-            "variance_at_completion": variance_at_completion,
-            "estimate_to_complete": etc,
-            "total_activities": total_activities,
-            "completed_activities": completed_activities,
-            "active_activities": active_activities,
-            "project_start_date": str(project["start_date"])
-            if pd.notna(project["start_date"])
-            else None,
-            "project_end_date": str(project["target_end_date"])
-            if pd.notna(project["target_end_date"])
-            else None,
-        }
-    except Exception as e:
-        logger.error(f"Error calculating metrics for project {project_id}: {e}")
-        return None
+def _spend_df(bucket_sql, raw_sql, params, source):
+    """Reads pre-aggregated spend_buckets, falling back to the raw log if that fails."""
+    if source == "buckets":
+        try:
+            return database.get_df(bucket_sql, params)
+        except Exception as e:
+            logger.warning(f"spend_buckets unavailable, aggregating expenditure_log instead: {e}")
+    return database.get_df(raw_sql, params)
 
 
-def get_monthly_spending_trend(project_id):
+@tracing.traced('calc')
+@query_cache.cached('expenditure_log', 'spend_buckets')
+def get_monthly_spending_trend(project_id, source=SPEND_SOURCE):
     """
     Returns monthly spending data for a project.
     """
     try:
-        df = database.get_df(
+        df = _spend_df(
+            """
+            SELECT substr(bucket_start, 1, 7) as month,
+                   SUM(amount) as total_spent
+            FROM spend_buckets
+            WHERE project_id = ? AND granularity = 'month'
+            GROUP BY bucket_start
+            ORDER BY month
+        """,
             """
             SELECT strftime('%Y-%m', spend_date) as month, 
                    SUM(amount) as total_spent
@@ -191,6 +67,7 @@ def get_monthly_spending_trend(project_id):
             ORDER BY month
         """,
             (project_id,),
+            source,
         )
         return (
             df
@@ -202,12 +79,21 @@ def get_monthly_spending_trend(project_id):
         return pd.DataFrame(columns=["month", "total_spent"])
 
 
-def get_category_spending(project_id):
+@tracing.traced('calc')
+@query_cache.cached('expenditure_log', 'spend_buckets')
+def get_category_spending(project_id, source=SPEND_SOURCE):
     """
     Returns spending by category for a project.
     """
     try:
-        df = database.get_df(
+        df = _spend_df(
+            """
+            SELECT category, SUM(amount) as total
+            FROM spend_buckets
+            WHERE project_id = ? AND granularity = 'month'
+            GROUP BY category
+            ORDER BY total DESC
+        """,
             """
             SELECT category, SUM(amount) as total
             FROM expenditure_log 
@@ -216,6 +102,7 @@ def get_category_spending(project_id):
             ORDER BY total DESC
         """,
             (project_id,),
+            source,
         )
         return (
             df
@@ -227,28 +114,318 @@ def get_category_spending(project_id):
         return pd.DataFrame(columns=["category", "total"])
 
 
-def get_all_projects_summary():
+PORTFOLIO_COLUMNS = [
+    "project_id", "project_name", "project_number", "total_budget", "total_spent",
+    "remaining", "pct_complete", "budget_used_pct", "forecast", "budget_health",
+    "schedule_health", "actual_status", "burn_rate", "days_remaining",
+    "cost_variance", "schedule_variance", "cpi", "spi", "variance_at_completion",
+    "estimate_to_complete", "total_activities", "completed_activities",
+    "active_activities", "project_start_date", "project_end_date",
+]
+
+
+def _id_filter(column, project_ids):
+    """Builds an optional `column IN (...)` clause and its params."""
+    if project_ids is None:
+        return "", ()
+    ids = tuple(int(pid) for pid in project_ids)
+    if not ids:
+        return f"WHERE {column} IN (NULL)", ()
+    return f"WHERE {column} IN ({','.join('?' * len(ids))})", ids
+
+
+def _compute_portfolio_metrics(projects, schedule, spend, now):
     """
-    Returns a summary dataframe for all projects.
+    Vectorized equivalent of get_project_metrics over many projects.
+    `schedule` and `spend` are per-project aggregates (one row per project_id).
+    """
+    # Empty aggregates come back with object dtypes; align the join key first
+    key = {"project_id": "int64"}
+    df = projects.astype(key).merge(schedule.astype(key), on="project_id", how="left").merge(
+        spend.astype(key), on="project_id", how="left"
+    )
+    if df.empty:
+        return pd.DataFrame(columns=PORTFOLIO_COLUMNS)
+
+    def num(col):
+        return pd.to_numeric(df[col], errors="coerce").fillna(0.0).astype(float)
+
+    total_budget = num("total_budget")
+    total_spent = num("total_spent")
+    total_planned = num("total_planned")
+    earned_value = num("earned_value").where(total_planned > 0, 0.0)
+    planned_value = num("planned_value")
+
+    pct_complete = (earned_value / total_planned.where(total_planned > 0) * 100).fillna(0.0)
+    forecast = total_spent + (total_budget - earned_value)
+    has_spend = total_spent > 0
+    has_budget = total_budget > 0
+    cpi = (earned_value / total_spent.where(has_spend)).fillna(1.0)
+    spi = (earned_value / planned_value.where(planned_value > 0)).fillna(1.0)
+
+    budget_health = pd.Series(
+        np.select(
+            [
+                (forecast > total_budget * 1.05) & has_budget,
+                (forecast > total_budget) & has_budget,
+                (cpi < 0.85) & has_spend,
+                (cpi < 0.95) & has_spend,
+            ],
+            ["Red", "Yellow", "Red", "Yellow"],
+            default="Green",
+        ),
+        index=df.index,
+    )
+    schedule_health = pd.Series(
+        np.where(num("overdue_activities") > 0, "Red", "Green"), index=df.index
+    )
+
+    # Burn rate over the span between the first and last recorded spend
+    first_spend = pd.to_datetime(df["first_spend_date"])
+    last_spend = pd.to_datetime(df["last_spend_date"])
+    days_elapsed = (last_spend - first_spend).dt.days.clip(lower=1)
+    burn_rate = (total_spent / days_elapsed).fillna(0.0)
+
+    end_dates = pd.to_datetime(df["target_end_date"])
+    days_remaining = (end_dates - now).dt.days.clip(lower=0).fillna(0).astype(int)
+
+    def date_str(col):
+        return df[col].astype(object).where(df[col].notna(), None)
+
+    return pd.DataFrame(
+        {
+            "project_id": df["project_id"],
+            "project_name": df["project_name"].map(str),
+            "project_number": df["project_number"].map(str),
+            "total_budget": total_budget,
+            "total_spent": total_spent,
+            "remaining": total_budget - total_spent,
+            "pct_complete": pct_complete.clip(upper=100.0),
+            "budget_used_pct": (total_spent / total_budget.where(has_budget) * 100).fillna(0.0),
+            "forecast": forecast,
+            "budget_health": budget_health,
+            "schedule_health": schedule_health,
+            "actual_status": df["status"].map(str),
+            "burn_rate": burn_rate,
+            "days_remaining": days_remaining,
+            "cost_variance": earned_value - total_spent,
+            "schedule_variance": earned_value - planned_value,
+            "cpi": cpi,
+            "spi": spi,
+            "variance_at_completion": total_budget - forecast,
+            "estimate_to_complete": (forecast - total_spent).clip(lower=0),
+            "total_activities": num("total_activities").astype(int),
+            "completed_activities": num("completed_activities").astype(int),
+            "active_activities": num("active_activities").astype(int),
+            "project_start_date": date_str("start_date"),
+            "project_end_date": date_str("target_end_date"),
+        },
+        columns=PORTFOLIO_COLUMNS,
+    )
+
+
+def _load_portfolio_inputs(project_ids, today, source):
+    """
+    Returns (projects, schedule, spend) frames for _compute_portfolio_metrics.
+    source='rollups' reads the maintained project_rollups table; source='raw'
+    aggregates the underlying tables (fallback and consistency reference).
+    """
+    where, ids = _id_filter("project_id", project_ids)
+
+    # PV and overdue counts depend on today's date, so they are never rolled up
+    dated = f"""
+        SUM(CASE WHEN date(planned_finish) <= ? THEN budgeted_cost ELSE 0 END) AS planned_value,
+        SUM(CASE WHEN date(planned_finish) <= ? AND COALESCE(status, '') != 'Complete'
+                 THEN 1 ELSE 0 END) AS overdue_activities
+    """
+
+    if source == "rollups":
+        p_where, _ = _id_filter("p.project_id", project_ids)
+        projects = database.get_df(
+            f"""
+            SELECT p.project_id, p.project_name, p.project_number, p.total_budget,
+                   p.start_date, p.target_end_date, p.status,
+                   r.total_spent, r.first_spend_date, r.last_spend_date,
+                   r.planned_cost AS total_planned, r.earned_value,
+                   r.activities_total AS total_activities,
+                   r.activities_complete AS completed_activities,
+                   r.activities_active AS active_activities
+            FROM projects p
+            LEFT JOIN project_rollups r ON r.project_id = p.project_id
+            {p_where}
+            ORDER BY p.project_id
+        """,
+            ids,
+        )
+        schedule = database.get_df(
+            f"SELECT project_id, {dated} FROM baseline_schedule {where} GROUP BY project_id",
+            (today, today) + ids,
+        )
+        spend = pd.DataFrame(columns=["project_id"])
+        return projects, schedule, spend
+
+    projects = database.get_df(
+        f"""
+        SELECT project_id, project_name, project_number, total_budget,
+               start_date, target_end_date, status
+        FROM projects {where}
+        ORDER BY project_id
+    """,
+        ids,
+    )
+    schedule = database.get_df(
+        f"""
+        SELECT project_id,
+               COUNT(*) AS total_activities,
+               SUM(budgeted_cost) AS total_planned,
+               SUM(CASE WHEN status = 'Complete' THEN budgeted_cost ELSE 0 END) AS earned_value,
+               SUM(CASE WHEN status = 'Complete' THEN 1 ELSE 0 END) AS completed_activities,
+               SUM(CASE WHEN status = 'Active' THEN 1 ELSE 0 END) AS active_activities,
+               {dated}
+        FROM baseline_schedule {where}
+        GROUP BY project_id
+    """,
+        (today, today) + ids,
+    )
+    spend = database.get_df(
+        f"""
+        SELECT project_id,
+               SUM(amount) AS total_spent,
+               MIN(spend_date) AS first_spend_date,
+               MAX(spend_date) AS last_spend_date
+        FROM expenditure_log {where}
+        GROUP BY project_id
+    """,
+        ids,
+    )
+    return projects, schedule, spend
+
+
+@tracing.traced('calc')
+@query_cache.cached('projects', 'project_rollups', 'baseline_schedule', 'expenditure_log')
+def get_portfolio_metrics(project_ids=None, source="rollups"):
+    """
+    Set-based version of get_project_metrics for many projects at once.
+    Runs a fixed number of aggregate queries regardless of project count and
+    returns one row per project with the same keys get_project_metrics produces.
     """
     try:
-        projects = database.get_projects()
+        now = pd.Timestamp.now()
+        projects, schedule, spend = _load_portfolio_inputs(
+            project_ids, now.strftime("%Y-%m-%d"), source
+        )
         if projects is None or projects.empty:
-            return pd.DataFrame()
+            return pd.DataFrame(columns=PORTFOLIO_COLUMNS)
+        return _compute_portfolio_metrics(projects, schedule, spend, now)
+    except Exception as e:
+        logger.error(f"Error calculating portfolio metrics: {e}")
+        return pd.DataFrame(columns=PORTFOLIO_COLUMNS)
 
-        summary = []
-        for _, p in projects.iterrows():
-            metrics = get_project_metrics(p["project_id"])
-            if metrics:
-                summary.append(metrics)
 
-        return pd.DataFrame(summary)
-    except Exception as e:
-        logger.error(f"Error generating projects summary: {e}")
-        return pd.DataFrame()
+@tracing.traced('calc')
+def get_all_projects_summary():
+    """
+    Returns a summary dataframe for all projects.
+    """
+    summary = get_portfolio_metrics()
+    return summary if not summary.empty else pd.DataFrame()
+
+
+BURNDOWN_MAX_POINTS = 400  # per series, for plotting
+_DAY = np.timedelta64(1, "D")
+
+
+def _downsample(dates, values, max_points):
+    """Evenly spaced subset of at most max_points points, always keeping both ends."""
+    if not max_points or len(dates) <= max_points:
+        return dates, values
+    idx = np.unique(np.linspace(0, len(dates) - 1, max(max_points, 2)).round().astype(np.int64))
+    return dates[idx], values[idx]
 
 
-def get_burndown_data(project_id):
+def _series_df(dates, values, max_points):
+    if len(dates) == 0:
+        return pd.DataFrame(columns=["date", "remaining"])
+    dates, values = _downsample(dates, values, max_points)
+    return pd.DataFrame({"date": dates, "remaining": values})
+
+
+def _build_burndown(total_budget, start_date, end_date, spend_dates, daily_spend, today, max_points=None):
+    """
+    Burndown series from NumPy arrays: `spend_dates` (sorted datetime64[ns]) and
+    `daily_spend` hold the project's spend per day. The ideal and forecast lines
+    are closed-form over a day offset array; see get_burndown_data for the result.
+    """
+    # ── 1. Ideal burndown (perfect straight line) ───────────────────────────
+    ideal_dates = ideal_remaining = np.empty(0)
+    if start_date and end_date and total_budget > 0:
+        duration_days = max((end_date - start_date).days, 1)
+        offsets = np.arange((end_date - start_date).days + 1)
+        ideal_dates = np.datetime64(start_date, "ns") + offsets * _DAY
+        ideal_remaining = total_budget - total_budget * (offsets / duration_days)
+
+    # ── 2. Actual cumulative spending → remaining budget ────────────────────
+    actual_dates = actual_remaining = np.empty(0)
+    if len(spend_dates):
+        # Anchor the first actual point at day-0 (full budget)
+        first = pd.Timestamp(spend_dates[0])
+        anchor_date = start_date if start_date and start_date <= first else first
+        actual_dates = np.concatenate(([np.datetime64(anchor_date, "ns")], spend_dates))
+        actual_remaining = np.concatenate(([total_budget], total_budget - np.cumsum(daily_spend)))
+
+    # ── 3. Forecast line (extend actual trend to end_date) ──────────────────
+    forecast_dates = forecast_remaining = np.empty(0)
+    if len(actual_dates) >= 2 and end_date:
+        last_date = pd.Timestamp(actual_dates[-1])
+        last_remaining = actual_remaining[-1]
+
+        # Burn rate = total spent / days elapsed
+        days_elapsed = max((last_date - pd.Timestamp(actual_dates[0])).days, 1)
+        daily_burn = (total_budget - last_remaining) / days_elapsed
+
+        if daily_burn > 0 and last_date < end_date:
+            offsets = np.arange((end_date.normalize() - last_date.normalize()).days + 1)
+            forecast_dates = np.datetime64(last_date, "ns") + offsets * _DAY
+            forecast_remaining = np.maximum(last_remaining - daily_burn * offsets, 0)
+
+    # ── 4. Status signal ────────────────────────────────────────────────────
+    status = "No Data"
+    if len(actual_dates) and len(ideal_dates):
+        # Ideal remaining at today's date: last ideal point on or before today
+        pos = np.searchsorted(ideal_dates, np.datetime64(today, "ns"), side="right") - 1
+        actual_today_val = actual_remaining[-1]
+        if pos >= 0:
+            ideal_today_val = ideal_remaining[pos]
+            diff_pct = (actual_today_val - ideal_today_val) / total_budget * 100
+            if actual_today_val < 0:
+                status = "Over Budget"
+            elif diff_pct < -10:   # actual spent more than ideal by >10% of budget
+                status = "At Risk"
+            else:
+                status = "On Track"
+
+    return {
+        "ideal_df": _series_df(ideal_dates, ideal_remaining, max_points),
+        "actual_df": _series_df(actual_dates, actual_remaining, max_points),
+        "forecast_df": _series_df(forecast_dates, forecast_remaining, max_points),
+        "total_budget": total_budget,
+        "start_date": start_date,
+        "end_date": end_date,
+        "today": today,
+        "status": status,
+    }
+
+
+def _project_dates(row):
+    total_budget = float(row["total_budget"]) if pd.notna(row["total_budget"]) else 0.0
+    start_date = pd.to_datetime(row["start_date"]) if pd.notna(row["start_date"]) else None
+    end_date = pd.to_datetime(row["target_end_date"]) if pd.notna(row["target_end_date"]) else None
+    return total_budget, start_date, end_date
+
+
+@tracing.traced('calc')
+@query_cache.cached('projects', 'expenditure_log', 'spend_buckets')
+def get_burndown_data(project_id, max_points=None, source=SPEND_SOURCE):
     """
     Builds three series for a Cost Burndown Chart:
       - ideal:  straight-line remaining budget from start_date to target_end_date
@@ -264,6 +441,9 @@ def get_burndown_data(project_id):
       'end_date'     – pd.Timestamp | None
       'today'        – pd.Timestamp
       'status'       – 'On Track' | 'At Risk' | 'Over Budget' | 'No Data'
+
+    With max_points each series is downsampled to at most that many points
+    (the status is always computed at full daily resolution).
     """
     try:
         project_df = database.get_df(
@@ -273,26 +453,14 @@ def get_burndown_data(project_id):
         if project_df is None or project_df.empty:
             return None
 
-        row = project_df.iloc[0]
-        total_budget = float(row["total_budget"]) if pd.notna(row["total_budget"]) else 0.0
-        start_date = pd.to_datetime(row["start_date"]) if pd.notna(row["start_date"]) else None
-        end_date = pd.to_datetime(row["target_end_date"]) if pd.notna(row["target_end_date"]) else None
-        today = pd.Timestamp.now().normalize()  # midnight today
-
-        # ── 1. Ideal burndown (perfect straight line) ───────────────────────────
-        if start_date and end_date and total_budget > 0:
-            duration_days = max((end_date - start_date).days, 1)
-            date_range = pd.date_range(start=start_date, end=end_date, freq="D")
-            remaining_ideal = [
-                total_budget - total_budget * (i / duration_days)
-                for i in range(len(date_range))
-            ]
-            ideal_df = pd.DataFrame({"date": date_range, "remaining": remaining_ideal})
-        else:
-            ideal_df = pd.DataFrame(columns=["date", "remaining"])
-
-        # ── 2. Actual cumulative spending → remaining budget ────────────────────
-        exp_df = database.get_df(
+        exp_df = _spend_df(
+            """
+            SELECT bucket_start as spend_date, SUM(amount) as daily_spend
+            FROM spend_buckets
+            WHERE project_id = ? AND granularity = 'day'
+            GROUP BY bucket_start
+            ORDER BY bucket_start
+            """,
             """
             SELECT spend_date, SUM(amount) as daily_spend
             FROM expenditure_log
@@ -301,70 +469,78 @@ def get_burndown_data(project_id):
             ORDER BY spend_date
             """,
             (project_id,),
+            source,
+        )
+        if exp_df is None:
+            exp_df = pd.DataFrame(columns=["spend_date", "daily_spend"])
+        exp_df["spend_date"] = pd.to_datetime(exp_df["spend_date"])
+        exp_df = exp_df.sort_values("spend_date")
+
+        return _build_burndown(
+            *_project_dates(project_df.iloc[0]),
+            exp_df["spend_date"].to_numpy(), exp_df["daily_spend"].to_numpy(dtype=float),
+            pd.Timestamp.now().normalize(),  # midnight today
+            max_points,
         )
-
-        if exp_df is not None and not exp_df.empty:
-            exp_df["spend_date"] = pd.to_datetime(exp_df["spend_date"])
-            exp_df = exp_df.sort_values("spend_date")
-            exp_df["cumulative_spend"] = exp_df["daily_spend"].cumsum()
-            exp_df["remaining"] = total_budget - exp_df["cumulative_spend"]
-
-            # Anchor the first actual point at day-0 (full budget)
-            anchor_date = start_date if start_date and start_date <= exp_df["spend_date"].iloc[0] else exp_df["spend_date"].iloc[0]
-            anchor = pd.DataFrame({"date": [anchor_date], "remaining": [total_budget]})
-            actual_df = pd.concat(
-                [anchor, exp_df[["spend_date", "remaining"]].rename(columns={"spend_date": "date"})],
-                ignore_index=True,
-            )
-        else:
-            actual_df = pd.DataFrame(columns=["date", "remaining"])
-
-        # ── 3. Forecast line (extend actual trend to end_date) ──────────────────
-        forecast_df = pd.DataFrame(columns=["date", "remaining"])
-        if not actual_df.empty and end_date and len(actual_df) >= 2:
-            last_date = actual_df["date"].iloc[-1]
-            last_remaining = actual_df["remaining"].iloc[-1]
-
-            # Burn rate = total spent / days elapsed
-            days_elapsed = max((last_date - actual_df["date"].iloc[0]).days, 1)
-            total_spent = total_budget - last_remaining
-            daily_burn = total_spent / days_elapsed
-
-            if daily_burn > 0 and last_date < end_date:
-                forecast_range = pd.date_range(start=last_date, end=end_date, freq="D")
-                forecast_remaining = [
-                    max(last_remaining - daily_burn * i, 0)
-                    for i in range(len(forecast_range))
-                ]
-                forecast_df = pd.DataFrame({"date": forecast_range, "remaining": forecast_remaining})
-
-        # ── 4. Status signal ────────────────────────────────────────────────────
-        status = "No Data"
-        if not actual_df.empty and not ideal_df.empty:
-            # Find the ideal remaining at today's date
-            ideal_today = ideal_df[ideal_df["date"] <= today]
-            actual_today_val = actual_df["remaining"].iloc[-1]
-            if not ideal_today.empty:
-                ideal_today_val = ideal_today["remaining"].iloc[-1]
-                diff_pct = (actual_today_val - ideal_today_val) / total_budget * 100
-                if actual_today_val < 0:
-                    status = "Over Budget"
-                elif diff_pct < -10:   # actual spent more than ideal by >10% of budget
-                    status = "At Risk"
-                else:
-                    status = "On Track"
-
-        return {
-            "ideal_df": ideal_df,
-            "actual_df": actual_df,
-            "forecast_df": forecast_df,
-            "total_budget": total_budget,
-            "start_date": start_date,
-            "end_date": end_date,
-            "today": today,
-            "status": status,
-        }
 
     except Exception as e:
         logger.error(f"Error building burndown data for project {project_id}: {e}")
         return None
+
+
+@tracing.traced('calc')
+@query_cache.cached('projects', 'expenditure_log', 'spend_buckets')
+def get_burndown_batch(project_ids=None, max_points=None, source=SPEND_SOURCE):
+    """
+    get_burndown_data for many projects (default: all) with two queries in
+    total; returns {project_id: burndown dict}.
+    """
+    try:
+        where, params = "", ()
+        if project_ids is not None:
+            project_ids = [int(p) for p in project_ids]
+            where = f"WHERE project_id IN ({','.join('?' * len(project_ids)) or 'NULL'})"
+            params = tuple(project_ids)
+        projects = database.get_df(
+            f"SELECT project_id, total_budget, start_date, target_end_date FROM projects {where}", params
+        )
+        bucket_where = f"{where} AND granularity = 'day'" if where else "WHERE granularity = 'day'"
+        exp_df = _spend_df(
+            f"""
+            SELECT project_id, bucket_start as spend_date, SUM(amount) as daily_spend
+            FROM spend_buckets
+            {bucket_where}
+            GROUP BY project_id, bucket_start
+            ORDER BY project_id, bucket_start
+            """,
+            f"""
+            SELECT project_id, spend_date, SUM(amount) as daily_spend
+            FROM expenditure_log
+            {where}
+            GROUP BY project_id, spend_date
+            ORDER BY project_id, spend_date
+            """,
+            params,
+            source,
+        )
+        today = pd.Timestamp.now().normalize()
+        for col in ("start_date", "target_end_date"):
+            projects[col] = pd.to_datetime(projects[col])
+
+        # Slice the per-day spend of each project out of the one sorted result
+        exp_ids = exp_df["project_id"].to_numpy(dtype=np.int64)
+        spend_dates = pd.to_datetime(exp_df["spend_date"]).to_numpy()
+        daily_spend = exp_df["daily_spend"].to_numpy(dtype=float)
+
+        result = {}
+        for row in projects.itertuples(index=False):
+            row = row._asdict()
+            lo, hi = np.searchsorted(exp_ids, [row["project_id"], row["project_id"] + 1])
+            result[row["project_id"]] = _build_burndown(
+                *_project_dates(row), spend_dates[lo:hi], daily_spend[lo:hi], today, max_points
+            )
+        return result
+
+    except Exception as e:
+        logger.error(f"Error building burndown batch: {e}")
+        return {}
@@ -0,0 +1,184 @@
+"""
+Chart rendering for the PDF report.
+
+Charts are drawn with matplotlib's object-oriented API (no pyplot global
+state) on figures that are created once per process and cleared between
+uses. Output is vector PDF by default and is embedded in the report as a form
+XObject through pdfrw, so text stays sharp and files stay small; 'png' is kept
+for comparison. Rendered bytes are memoized on the chart's input values.
+"""
+import io
+import threading
+from functools import lru_cache
+
+import matplotlib
+import matplotlib.style
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.figure import Figure
+from reportlab.platypus import Flowable, Image
+
+import tracing
+
+PRIMARY_HEX = '#2c5aa0'
+SUCCESS_HEX = '#4caf50'
+
+RASTER_DPI = 300
+STYLE = matplotlib.style.library['seaborn-v0_8-whitegrid']
+
+# seaborn's "mako" colormap, sampled at nine points (avoids importing seaborn for a palette)
+MAKO = LinearSegmentedColormap.from_list('mako', [
+    '#0b0405', '#2b1c35', '#3e356b', '#3b5698', '#357ba3',
+    '#359fab', '#4bc2ad', '#99ddb6', '#def5e5',
+])
+
+_lock = threading.Lock()
+_figures = {}
+
+
+def mako_palette(n):
+    """Same sampling as seaborn.color_palette('mako', n): evenly spaced, ends excluded."""
+    return [MAKO((i + 1) / (n + 1)) for i in range(n)]
+
+
+def _figure(name, size):
+    """A reusable figure per chart type, cleared and resized for each render."""
+    fig = _figures.get(name)
+    if fig is None:
+        with matplotlib.rc_context(STYLE):
+            fig = Figure(figsize=size)
+        FigureCanvasAgg(fig)
+        _figures[name] = fig
+    fig.clear()
+    fig.set_size_inches(size)
+    return fig
+
+
+def _save(fig, fmt):
+    buf = io.BytesIO()
+    fig.savefig(buf, format=fmt, dpi=RASTER_DPI, bbox_inches='tight', transparent=True)
+    return buf.getvalue()
+
+
+@lru_cache(maxsize=256)
+@tracing.traced('chart')
+def financial_chart(budget, forecast, spent, fmt='pdf'):
+    """Bar chart of Budget / Forecast / Actual."""
+    with _lock, matplotlib.rc_context(STYLE):
+        fig = _figure('financial', (6, 3))
+        ax = fig.add_subplot()
+
+        categories = ['Budget', 'Forecast', 'Actual']
+        values = [budget, forecast, spent]
+
+        # Clean minimalist bars
+        bars = ax.bar(categories, values, color=[PRIMARY_HEX, '#7c3aed', '#0891b2'],
+                      width=0.5, edgecolor='none')
+
+        # Remove frames
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+        ax.spines['left'].set_visible(False)
+        ax.spines['bottom'].set_color('#dddddd')
+
+        # Grid lines
+        ax.yaxis.grid(True, linestyle='--', color='#eeeeee')
+        ax.xaxis.grid(False)
+
+        # Add values on top
+        for bar in bars:
+            height = bar.get_height()
+            ax.text(bar.get_x() + bar.get_width() / 2., height + (max(values) * 0.02),
+                    f'R {height/1000:.0f}k',
+                    ha='center', va='bottom', fontsize=10, fontweight='bold', color='#444')
+
+        ax.set_title('Financial Performance', loc='left', fontsize=12, pad=20, color='#444')
+        ax.tick_params(left=False, bottom=False, labelleft=False, labelcolor='#666')
+        return _save(fig, fmt)
+
+
+@lru_cache(maxsize=256)
+@tracing.traced('chart')
+def cost_breakdown_chart(categories, totals, fmt='pdf'):
+    """Donut chart of spend per category; `categories` and `totals` are tuples."""
+    with _lock, matplotlib.rc_context(STYLE):
+        fig = _figure('cost_breakdown', (5, 3))
+        ax = fig.add_subplot()
+
+        if totals:
+            wedges, texts, autotexts = ax.pie(
+                totals, labels=categories, autopct='%1.0f%%',
+                startangle=90, pctdistance=0.85, colors=mako_palette(len(totals)),
+                wedgeprops=dict(width=0.4, edgecolor='white')
+            )
+            for t in autotexts:
+                t.set(size=9, weight="bold", color="white")
+            for t in texts:
+                t.set(size=9, color="#444")
+
+            ax.set_title('Cost Distribution', loc='center', fontsize=12, pad=10, color='#444')
+        else:
+            ax.text(0.5, 0.5, 'No Data', ha='center', va='center')
+            ax.axis('off')
+        return _save(fig, fmt)
+
+
+@lru_cache(maxsize=256)
+@tracing.traced('chart')
+def progress_chart(progress, fmt='pdf'):
+    """Horizontal progress bar; callers round `progress` to the displayed precision."""
+    with _lock, matplotlib.rc_context(STYLE):
+        fig = _figure('progress', (7, 1))
+        ax = fig.add_subplot()
+
+        # Background
+        ax.barh([0], [100], color='#f1f3f5', height=0.6, edgecolor='none', align='center')
+        # Progress
+        ax.barh([0], [progress], color=SUCCESS_HEX, height=0.6, edgecolor='none', align='center')
+
+        ax.set_xlim(0, 100)
+        ax.axis('off')
+
+        # Add text inside
+        ax.text(1, 0, f"{progress:.1f}% Complete", va='center', ha='left', fontsize=11,
+                fontweight='bold', color='white' if progress > 15 else '#444')
+        return _save(fig, fmt)
+
+
+class VectorChart(Flowable):
+    """
+    Draws the first page of a PDF (a rendered chart) as a reportlab form XObject,
+    scaled to fit width x height with its aspect ratio kept.
+    """
+
+    def __init__(self, pdf_bytes, width, height):
+        from pdfrw import PdfReader
+        from pdfrw.buildxobj import pagexobj
+
+        super().__init__()
+        self.xobj = pagexobj(PdfReader(fdata=pdf_bytes).pages[0])
+        x0, y0, x1, y1 = [float(v) for v in self.xobj.BBox]
+        self.scale = min(width / (x1 - x0), height / (y1 - y0))
+        self.origin = (x0, y0)
+        self.width = (x1 - x0) * self.scale
+        self.height = (y1 - y0) * self.scale
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        from pdfrw.toreportlab import makerl
+
+        form = makerl(self.canv, self.xobj)
+        self.canv.saveState()
+        self.canv.scale(self.scale, self.scale)
+        self.canv.translate(-self.origin[0], -self.origin[1])
+        self.canv.doForm(form)
+        self.canv.restoreState()
+
+
+def flowable(data, fmt, width, height):
+    """Report flowable for chart bytes produced by one of the functions above."""
+    if fmt == 'pdf':
+        return VectorChart(data, width, height)
+    return Image(io.BytesIO(data), width=width, height=height)
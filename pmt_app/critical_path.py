@@ -0,0 +1,129 @@
+"""
+Critical path method (CPM) over a project's baseline schedule.
+
+Durations are the planned calendar days of each activity and planned starts
+act as start-no-earlier-than constraints, so an activity with no predecessor
+still begins on its planned date. A forward pass in topological order gives
+early start/finish, a backward pass gives late start/finish; total float is
+the difference and activities with no float form the critical path. Both
+passes visit each activity and edge once, so the cost is linear in the size
+of the schedule. Results are cached until the schedule or its dependencies
+are written.
+"""
+from datetime import date
+
+import query_cache
+import schedule_graph
+import tracing
+
+COLUMNS = ['activity_id', 'duration', 'early_start', 'early_finish', 'late_start', 'late_finish',
+           'total_float', 'is_critical']
+
+
+def compute(ids, durations, not_before, predecessors):
+    """
+    CPM on plain values: `ids` activity ids, `durations` whole days, `not_before`
+    earliest start day (int, or None for the project start) and `predecessors`
+    {activity_id: iterable of predecessor ids}. Returns a dict of column lists in
+    `ids` order (day numbers relative to the earliest constraint) plus 'path', the
+    critical activity ids by early start. Raises schedule_graph.CycleError.
+    """
+    n = len(ids)
+    index = {a: i for i, a in enumerate(ids)}
+    preds = [[index[p] for p in predecessors.get(a, ()) if p in index] for a in ids]
+    succs = [[] for _ in range(n)]
+    remaining = [len(p) for p in preds]
+    for i, ps in enumerate(preds):
+        for p in ps:
+            succs[p].append(i)
+
+    # Kahn's algorithm: `order` grows while it is being walked
+    order = [i for i in range(n) if remaining[i] == 0]
+    for i in order:
+        for s in succs[i]:
+            remaining[s] -= 1
+            if remaining[s] == 0:
+                order.append(s)
+    if len(order) != n:
+        stuck = [ids[i] for i in range(n) if remaining[i] > 0]
+        raise schedule_graph.CycleError(f"Dependency cycle between activities: {stuck[:5]}.")
+
+    base = min((d for d in not_before if d is not None), default=0)
+
+    # 1. Forward pass
+    es, ef = [0] * n, [0] * n
+    for i in order:
+        start = not_before[i] - base if not_before[i] is not None else 0
+        for p in preds[i]:
+            if ef[p] > start:
+                start = ef[p]
+        es[i] = start
+        ef[i] = start + durations[i]
+    finish = max(ef, default=0)
+
+    # 2. Backward pass
+    ls, lf = [0] * n, [0] * n
+    for i in reversed(order):
+        late = finish
+        for s in succs[i]:
+            if ls[s] < late:
+                late = ls[s]
+        lf[i] = late
+        ls[i] = late - durations[i]
+
+    total_float = [ls[i] - es[i] for i in range(n)]
+    critical = [f <= 0 for f in total_float]
+    path = [ids[i] for i in sorted((i for i in order if critical[i]), key=lambda i: es[i])]
+    return {
+        'activity_id': list(ids), 'duration': list(durations),
+        'early_start': es, 'early_finish': ef, 'late_start': ls, 'late_finish': lf,
+        'total_float': total_float, 'is_critical': critical, 'path': path, 'base': base,
+    }
+
+
+def _day(value, memo):
+    """Day number of an ISO date string, None if missing or unparseable."""
+    if not value:
+        return None
+    day = memo.get(value, False)
+    if day is False:
+        try:
+            day = date.fromisoformat(str(value)[:10]).toordinal()
+        except ValueError:
+            day = None
+        memo[value] = day
+    return day
+
+
+@tracing.traced('calc')
+@query_cache.cached('baseline_schedule', 'activity_dependencies')
+def get_critical_path(project_id):
+    """
+    Per-activity CPM results for the project as a DataFrame: COLUMNS (days) plus
+    early/late *_date timestamps. Empty if the project has no activities.
+    """
+    import pandas as pd
+
+    graph = schedule_graph.load_graph(project_id)
+    ids = list(graph.activities)
+    if not ids:
+        return pd.DataFrame(columns=COLUMNS)
+
+    days = {}  # schedules reuse a small set of dates
+    starts = [_day(graph.activities[a]['planned_start'], days) for a in ids]
+    finishes = [_day(graph.activities[a]['planned_finish'], days) for a in ids]
+    durations = [max(0, f - s) if s is not None and f is not None else 0 for s, f in zip(starts, finishes)]
+    result = compute(ids, durations, starts, graph.predecessors)
+
+    df = pd.DataFrame({col: result[col] for col in COLUMNS})
+    if result['base']:
+        base = pd.Timestamp(date.fromordinal(result['base']))
+        for col in ('early_start', 'early_finish', 'late_start', 'late_finish'):
+            df[f'{col}_date'] = base + pd.to_timedelta(df[col], unit='D')
+    return df
+
+
+def critical_activity_ids(project_id):
+    """Set of activity ids on the project's critical path."""
+    df = get_critical_path(project_id)
+    return set(df.loc[df['is_critical'], 'activity_id']) if not df.empty else set()
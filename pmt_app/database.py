@@ -1,55 +1,690 @@
 import sqlite3
-import pandas as pd
 import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+import audit
+import metrics
+import migrations
+import query_cache
+import tracing
 
 DB_PATH = os.path.join(os.path.dirname(__file__), 'pm_tool.db')
 
-def get_connection():
-    conn = sqlite3.connect(DB_PATH)
+# Connection pool settings. Idle connections beyond POOL_SIZE are closed on release.
+POOL_SIZE = 8
+BUSY_TIMEOUT_MS = 5000
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",      # ~16 MB page cache per connection
+    "PRAGMA mmap_size=134217728",    # 128 MB memory-mapped I/O
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store=MEMORY",
+)
+# After busy_timeout runs out, statements that had no effect yet are retried
+BUSY_RETRIES = 3
+BUSY_BACKOFF_S = 0.05
+
+_pool = queue.LifoQueue()
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats = {'opened': 0, 'reused': 0, 'closed': 0}
+_migrated_paths = set()
+_migrate_lock = threading.Lock()
+
+_query_seconds = metrics.histogram('pmt_query_seconds', "SQLite statement latency per query name", ('query',))
+_busy_retries = metrics.counter('pmt_sqlite_busy_retries_total', "Statements retried after 'database is locked'", ('operation',))
+_busy_errors = metrics.counter('pmt_sqlite_busy_errors_total', "Statements still locked after every retry", ('operation',))
+
+def _open_connection(path):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    _ensure_schema(conn, path)
+    with _stats_lock:
+        _stats['opened'] += 1
     return conn
 
-def execute_query(query, params=(), commit=False):
+def _ensure_schema(conn, path):
+    """Upgrades the database in place the first time this process opens it."""
+    if path in _migrated_paths:
+        return
+    with _migrate_lock:
+        if path not in _migrated_paths:
+            migrations.migrate(conn)
+            _migrated_paths.add(path)
+
+def _close(conn):
+    try:
+        conn.close()
+    finally:
+        with _stats_lock:
+            _stats['closed'] += 1
+
+def _acquire():
+    """Takes an idle connection for the current DB_PATH from the pool or opens a new one."""
+    while True:
+        try:
+            path, conn = _pool.get_nowait()
+        except queue.Empty:
+            return DB_PATH, _open_connection(DB_PATH)
+        if path == DB_PATH:
+            with _stats_lock:
+                _stats['reused'] += 1
+            return path, conn
+        # DB_PATH was repointed (tests, benchmarks): drop connections to the old file
+        _close(conn)
+
+def _release(path, conn):
+    if conn.in_transaction:
+        conn.rollback()
+    if path == DB_PATH and _pool.qsize() < POOL_SIZE:
+        _pool.put((path, conn))
+    else:
+        _close(conn)
+
+@contextmanager
+def get_connection():
+    """
+    Leases a pooled connection for the duration of the block.
+    Nested calls on the same thread share the outer lease.
+    """
+    lease = getattr(_local, 'lease', None)
+    if lease is not None:
+        yield lease[1]
+        return
+
+    lease = _acquire()
+    _local.lease = lease
+    try:
+        yield lease[1]
+    finally:
+        _local.lease = None
+        _release(*lease)
+
+def in_transaction():
+    return getattr(_local, 'tx_depth', 0) > 0
+
+@contextmanager
+def transaction():
+    """
+    Unit of work: runs a group of statements on one pooled connection with a
+    single commit. The outermost block opens with BEGIN IMMEDIATE, taking the
+    write lock up front so reads inside it see a stable snapshot and no
+    SHARED -> RESERVED upgrade can fail with "database is locked" half way.
+    execute_query(..., commit=True) inside the block defers to the outer commit,
+    and any exception rolls the whole block back.
+    """
     with get_connection() as conn:
-        cursor = conn.cursor()
+        depth = getattr(_local, 'tx_depth', 0)
+        if depth == 0 and not conn.in_transaction:
+            _retry_busy('begin', conn.execute, "BEGIN IMMEDIATE")
+        _local.tx_depth = depth + 1
+        try:
+            yield conn
+            if depth == 0:
+                conn.commit()
+                _flush_written()
+                _flush_audit()
+        except BaseException:
+            if depth == 0:
+                if conn.in_transaction:
+                    conn.rollback()
+                _local.written = set()
+                _local.audit = []
+            raise
+        finally:
+            _local.tx_depth = depth
+
+def _mark_written(tables):
+    """
+    Records writes for the query cache. Inside a transaction the tables are
+    invalidated after the outer commit (and forgotten on rollback).
+    """
+    if in_transaction():
+        written = getattr(_local, 'written', None)
+        if written is None:
+            written = _local.written = set()
+        written.update(tables)
+    else:
+        query_cache.invalidate(tables)
+
+def _flush_written():
+    written = getattr(_local, 'written', None)
+    if written:
+        _local.written = set()
+        query_cache.invalidate(written)
+
+def _audit(table_name, record_id, action, old=None, new=None, user_id=None, keep=()):
+    """
+    Records a change for the audit trail (see audit.py). Inside a transaction the
+    entry is queued after the outer commit (and forgotten on rollback).
+    """
+    entry = audit.entry(table_name, record_id, action, old, new, user_id, keep)
+    if entry is None:
+        return
+    if in_transaction():
+        pending = getattr(_local, 'audit', None)
+        if pending is None:
+            pending = _local.audit = []
+        pending.append(entry)
+    else:
+        audit.enqueue(DB_PATH, [entry])
+
+def _flush_audit():
+    pending = getattr(_local, 'audit', None)
+    if pending:
+        _local.audit = []
+        audit.enqueue(DB_PATH, pending)
+
+def writes(*tables):
+    """Marks a write helper as modifying `tables` so cached reads of them are evicted."""
+    def decorator(func):
+        traced = tracing.traced('write')(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return traced(*args, **kwargs)
+            finally:
+                _mark_written(tables)
+        return wrapper
+    return decorator
+
+def close_all_connections():
+    """Closes every idle pooled connection (e.g. on shutdown or after repointing DB_PATH)."""
+    while True:
+        try:
+            _, conn = _pool.get_nowait()
+        except queue.Empty:
+            return
+        _close(conn)
+
+def get_connection_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['idle'] = _pool.qsize()
+    return stats
+
+@metrics.register_collector
+def _collect_metrics():
+    stats = get_connection_stats()
+    return [
+        ('pmt_db_connections_total', 'counter', "Pooled connection leases by outcome",
+         [({'outcome': k}, stats[k]) for k in ('opened', 'reused', 'closed')]),
+        ('pmt_db_connections_idle', 'gauge', "Idle connections in the pool", [({}, stats['idle'])]),
+    ]
+
+@lru_cache(maxsize=1024)
+def query_name(query):
+    """Low-cardinality name for metrics: verb and main table, e.g. 'select:expenditure_log'."""
+    verb = query.lstrip().split(None, 1)[0].lower() if query.strip() else 'empty'
+    table = query_cache.table_written(query)
+    if table is None:
+        tables = query_cache._TABLE_RE.findall(query)
+        table = tables[0].lower() if tables else None
+    return f"{verb}:{table}" if table else verb
+
+def _is_busy(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+def _retry_busy(operation, fn, *args, **kwargs):
+    """
+    Runs fn, retrying SQLITE_BUSY up to BUSY_RETRIES times with jittered
+    exponential backoff. Only for work that has no effect when it fails: a
+    read, a single autocommit statement or BEGIN IMMEDIATE.
+    """
+    for attempt in range(BUSY_RETRIES + 1):
+        try:
+            return fn(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if not _is_busy(e):
+                raise
+            if attempt == BUSY_RETRIES:
+                _busy_errors.inc(operation=operation)
+                raise
+            _busy_retries.inc(operation=operation)
+            time.sleep(BUSY_BACKOFF_S * 2 ** attempt * random.uniform(0.5, 1.5))
+
+def execute_many(query, rows):
+    """Runs one statement over many parameter rows in a single commit."""
+    with transaction() as conn, tracing.sql(query, many=True) as span, \
+            _query_seconds.time(query=query_name(query)):
+        count = conn.executemany(query, rows).rowcount
+        if span is not None:
+            span['attrs']['rows'] = count
+        table = query_cache.table_written(query)
+        if table:
+            _mark_written((table,))
+        return count
+
+def _execute_alone(conn, cursor, query, params):
+    try:
         cursor.execute(query, params)
+    except sqlite3.OperationalError:
+        # a failed write can leave sqlite3's implicit BEGIN open; retry from a clean slate
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+
+def execute_query(query, params=(), commit=False):
+    with get_connection() as conn, tracing.sql(query, params) as span, \
+            _query_seconds.time(query=query_name(query)):
+        cursor = conn.cursor()
+        if in_transaction():
+            cursor.execute(query, params)
+        else:
+            _retry_busy('execute', _execute_alone, conn, cursor, query, params)
         if commit:
-            conn.commit()
+            table = query_cache.table_written(query)
+            if not in_transaction():
+                conn.commit()
+            if table:
+                _mark_written((table,))
+            if span is not None:
+                span['attrs']['rows'] = cursor.rowcount
             return cursor.lastrowid
-        return cursor.fetchall()
+        rows = cursor.fetchall()
+        if span is not None:
+            span['attrs']['rows'] = len(rows)
+        return rows
 
-def get_df(query, params=()):
-    with get_connection() as conn:
-        return pd.read_sql_query(query, conn, params=params)
+def _read_df(pd, query, conn, params):
+    with _query_seconds.time(query=query_name(query)):
+        if in_transaction():
+            return pd.read_sql_query(query, conn, params=params)
+        return _retry_busy('read', pd.read_sql_query, query, conn, params=params)
+
+def get_df(query, params=(), cache=True):
+    """
+    Runs a SELECT into a DataFrame. Results are served from the query cache until
+    one of the tables it reads is written; reads inside a transaction bypass it.
+    """
+    import pandas as pd  # deferred so pages that never build a DataFrame (login) skip it
+
+    if not cache or not query_cache.ENABLED or in_transaction():
+        with get_connection() as conn, tracing.sql(query, params) as span:
+            df = _read_df(pd, query, conn, params)
+            if span is not None:
+                span['attrs']['rows'] = len(df)
+            return df
+
+    key = (DB_PATH, query, tuple(params))
+    with tracing.sql(query, params) as span:
+        hit, df = query_cache.get(key)
+        if not hit:
+            tables = query_cache.tables_read(query)
+            generation = query_cache.snapshot(tables)
+            with get_connection() as conn:
+                df = _read_df(pd, query, conn, params)
+            query_cache.put(key, df, tables, generation)
+        if span is not None:
+            span['attrs'].update(rows=len(df), cache='hit' if hit else 'miss')
+    return df
+
+# Paginated log views
+# Each view is a SELECT without WHERE/ORDER BY, its sort key (newest first; the
+# last column is unique so the key is a total order), the filters it accepts
+# as {name: predicate with one ?} and the FROM clause used to count matches.
+PAGE_SIZE = 50
+COUNT_CAP = 10000
+
+PAGED_VIEWS = {
+    'audit_log': {
+        'sql': '''
+            SELECT al.changed_at, al.audit_id, al.table_name, al.record_id, al.action,
+                   al.old_value, al.new_value, u.username
+            FROM audit_log al
+            LEFT JOIN users u ON al.changed_by = u.user_id
+        ''',
+        'key': ('al.changed_at', 'al.audit_id'),
+        'filters': {
+            'table': "al.table_name = ?",
+            'user': "al.changed_by = ?",
+            'date_from': "al.changed_at >= ?",
+            'date_to': "al.changed_at < date(?, '+1 day')",
+        },
+        'count_from': "audit_log al",
+    },
+    'expenditure_log': {
+        'sql': '''
+            SELECT el.exp_id, el.spend_date, el.category, el.amount, el.reference_id,
+                   el.description, u.full_name AS recorded_by
+            FROM expenditure_log el
+            LEFT JOIN users u ON el.recorded_by = u.user_id
+        ''',
+        'key': ('el.exp_id',),
+        'filters': {
+            'project': "el.project_id = ?",
+            'category': "el.category = ?",
+            'user': "el.recorded_by = ?",
+            'date_from': "el.spend_date >= ?",
+            'date_to': "el.spend_date <= ?",
+        },
+        'count_from': "expenditure_log el",
+    },
+    'activity_log': {
+        'sql': '''
+            SELECT al.log_id, al.event_type, al.event_date, bs.activity_name, u.full_name AS recorded_by
+            FROM activity_log al
+            JOIN baseline_schedule bs ON al.activity_id = bs.activity_id
+            LEFT JOIN users u ON al.recorded_by = u.user_id
+        ''',
+        'key': ('al.log_id',),
+        'filters': {
+            'project': "al.activity_id IN (SELECT activity_id FROM baseline_schedule WHERE project_id = ?)",
+            'user': "al.recorded_by = ?",
+            'date_from': "al.event_date >= ?",
+            'date_to': "al.event_date <= ?",
+        },
+        'count_from': "activity_log al",
+    },
+}
+
+
+def _page_filters(spec, filters):
+    """WHERE predicates and params for the filters that are set; unknown names raise ValueError."""
+    clauses, params = [], []
+    for name, value in (filters or {}).items():
+        if value is None or value == '':
+            continue
+        if name not in spec['filters']:
+            raise ValueError(f"Unknown filter '{name}'; expected one of {sorted(spec['filters'])}.")
+        clauses.append(spec['filters'][name])
+        params.append(str(value) if name.startswith('date_') else value)
+    return clauses, params
+
+
+def get_page(view, filters=None, after=None, page_size=PAGE_SIZE):
+    """
+    One page of a PAGED_VIEWS view, newest first. `after` is the cursor returned
+    for the previous page (None for the first). The page seeks past the cursor
+    on the view's key index instead of using OFFSET, so every page costs the
+    same however deep it is. Returns (DataFrame, cursor of the next page or
+    None on the last page).
+    """
+    spec = PAGED_VIEWS[view]
+    key = spec['key']
+    clauses, params = _page_filters(spec, filters)
+    if after is not None:
+        clauses.append(f"({', '.join(key)}) < ({', '.join('?' * len(key))})")
+        params.extend(after)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    order = ', '.join(f"{col} DESC" for col in key)
+    df = get_df(f"{spec['sql']} {where} ORDER BY {order} LIMIT ?", (*params, int(page_size) + 1))
+
+    if len(df) <= page_size:
+        return df, None
+    df = df.iloc[:page_size]
+    last = df.iloc[-1]
+    cursor = tuple(last[col.split('.')[-1]] for col in key)
+    return df, tuple(v.item() if hasattr(v, 'item') else v for v in cursor)
+
+
+def estimate_count(view, filters=None):
+    """
+    Cheap row count for a paged view as (count, exact). Unfiltered views use the
+    key's rowid span; expenditure filtered by project/category reads the
+    spend_buckets entry counts; anything else counts matches up to COUNT_CAP.
+    """
+    spec = PAGED_VIEWS[view]
+    active = {k: v for k, v in (filters or {}).items() if v is not None and v != ''}
+    clauses, params = _page_filters(spec, active)
+    table = spec['count_from'].split()[0]
+
+    if not clauses:
+        # ids are AUTOINCREMENT and these logs are append-only, so the span is close
+        row = execute_query(f"SELECT (SELECT MAX(rowid) FROM {table}) - (SELECT MIN(rowid) FROM {table}) + 1")
+        return int(row[0][0] or 0), False
+    if view == 'expenditure_log' and set(active) <= {'project', 'category'}:
+        where = ' AND '.join(c.replace('el.', '') for c in clauses)
+        row = execute_query(f"SELECT COALESCE(SUM(entries), 0) FROM spend_buckets WHERE granularity = 'month' AND {where}", params)
+        return int(row[0][0]), True
+    row = execute_query(
+        f"SELECT COUNT(*) FROM (SELECT 1 FROM {spec['count_from']} WHERE {' AND '.join(clauses)} LIMIT ?)",
+        (*params, COUNT_CAP + 1),
+    )
+    count = int(row[0][0])
+    return min(count, COUNT_CAP), count <= COUNT_CAP
 
 def log_change(table_name, record_id, action, old_val, new_val, user_id):
-    query = '''
-    INSERT INTO audit_log (table_name, record_id, action, old_value, new_value, changed_by)
-    VALUES (?, ?, ?, ?, ?, ?)
-    '''
-    execute_query(query, (table_name, record_id, action, str(old_val), str(new_val), user_id), commit=True)
+    """Audits a change made outside the write helpers below; old/new are dicts of column values."""
+    _audit(table_name, record_id, action, old_val, new_val, user_id)
+
+def _audit_bulk(conn, table_name, id_column, count, user_id, **summary):
+    """
+    One audit entry for a bulk insert of `count` rows: ids are allocated
+    sequentially inside the write transaction, so the batch is the id range
+    ending at the current maximum.
+    """
+    if not count:
+        return
+    last = conn.execute(f"SELECT MAX({id_column}) FROM {table_name}").fetchone()[0]
+    _audit(table_name, last - count + 1, 'BULK_INSERT', None,
+           dict(summary, rows=count, ids=[last - count + 1, last]), user_id)
+
+# Project Rollups
+def _rollup_delta(conn, project_id, spend_range=None, **deltas):
+    """
+    Applies incremental changes to a project's rollup row inside the caller's
+    transaction, e.g. _rollup_delta(conn, 3, total_spent=120.0, expenditure_count=1).
+    spend_range is the (earliest, latest) spend_date being added.
+    """
+    conn.execute("INSERT OR IGNORE INTO project_rollups (project_id) VALUES (?)", (project_id,))
+    sets = [f"{col} = {col} + ?" for col in deltas]
+    params = list(deltas.values())
+    if spend_range is not None:
+        first, last = spend_range
+        sets.append("first_spend_date = min(COALESCE(first_spend_date, ?), ?)")
+        sets.append("last_spend_date = max(COALESCE(last_spend_date, ?), ?)")
+        params += [first, first, last, last]
+    sets += ["data_version = data_version + 1", "updated_at = CURRENT_TIMESTAMP"]
+    conn.execute(f"UPDATE project_rollups SET {', '.join(sets)} WHERE project_id = ?", params + [project_id])
+
+def _bucket_delta(conn, rows):
+    """
+    Adds (project_id, category, amount, spend_date) rows to spend_buckets inside
+    the caller's transaction: one upsert per distinct day/category and granularity.
+    """
+    per_day = {}
+    for project_id, category, amount, spend_date in rows:
+        key = (project_id, category, spend_date)
+        total, count = per_day.get(key, (0.0, 0))
+        per_day[key] = (total + amount, count + 1)
+    params = [
+        {'project_id': p, 'category': c, 'spend_date': d, 'amount': total, 'entries': count}
+        for (p, c, d), (total, count) in per_day.items()
+    ]
+    for granularity in migrations.SPEND_GRANULARITIES:
+        conn.executemany(f'''
+        INSERT INTO spend_buckets (project_id, granularity, bucket_start, category, amount, entries)
+        VALUES (:project_id, '{granularity}', {migrations.spend_bucket_sql(granularity, ':spend_date')}, :category, :amount, :entries)
+        ON CONFLICT (granularity, project_id, bucket_start, category)
+        DO UPDATE SET amount = amount + excluded.amount, entries = entries + excluded.entries
+        ''', params)
+
+@writes('spend_buckets')
+def rebuild_spend_buckets(project_ids=None, fix=True):
+    """
+    Consistency checker for spend_buckets against expenditure_log. Returns a list
+    of ((project_id, granularity, bucket_start, category), stored, actual) amount
+    differences; with fix=True the affected projects' buckets are rebuilt.
+    """
+    where, params = "", ()
+    if project_ids is not None:
+        params = tuple(int(pid) for pid in project_ids)
+        where = f"WHERE project_id IN ({','.join('?' * len(params)) or 'NULL'})"
+    source = migrations.SPEND_BUCKETS_SOURCE_SQL.format(where=where)
+    columns = "project_id, granularity, bucket_start, category, amount, entries"
+
+    with transaction() as conn:
+        actual = {tuple(r[:4]): (r[4], r[5]) for r in conn.execute(source, params * len(migrations.SPEND_GRANULARITIES))}
+        stored = {tuple(r[:4]): (r[4], r[5]) for r in conn.execute(f"SELECT {columns} FROM spend_buckets {where}", params)}
+
+        diffs = []
+        for key in actual.keys() | stored.keys():
+            have, want = stored.get(key), actual.get(key)
+            if have is None or want is None or have[1] != want[1] \
+                    or abs(have[0] - want[0]) > 1e-6 * max(1.0, abs(want[0])):
+                diffs.append((key, have[0] if have else None, want[0] if want else None))
+
+        if fix and diffs:
+            stale = sorted({d[0][0] for d in diffs})
+            marks = ','.join('?' * len(stale))
+            conn.execute(f"DELETE FROM spend_buckets WHERE project_id IN ({marks})", stale)
+            conn.execute(
+                f"INSERT INTO spend_buckets ({columns}) "
+                + migrations.SPEND_BUCKETS_SOURCE_SQL.format(where=f"WHERE project_id IN ({marks})"),
+                stale * len(migrations.SPEND_GRANULARITIES)
+            )
+            for pid in stale:
+                _audit('spend_buckets', pid, 'REBUILD', None, {'buckets': sum(1 for d in diffs if d[0][0] == pid)})
+    return sorted(diffs, key=lambda d: tuple(map(str, d[0])))
+
+def get_project_rollup(project_id):
+    res = execute_query("SELECT * FROM project_rollups WHERE project_id = ?", (project_id,))
+    return res[0] if res else None
+
+def get_project_data_version(project_id):
+    """Counter bumped by every write that changes the project's figures (0 if none yet)."""
+    res = execute_query("SELECT data_version FROM project_rollups WHERE project_id = ?", (project_id,))
+    return res[0]['data_version'] if res else 0
+
+def get_dependency_fingerprint(project_id):
+    """Hash of the project's predecessor edges, for caches of critical-path output."""
+    res = execute_query('''
+    SELECT d.activity_id, d.predecessor_id
+    FROM activity_dependencies d JOIN baseline_schedule a ON a.activity_id = d.activity_id
+    WHERE a.project_id = ? ORDER BY d.activity_id, d.predecessor_id
+    ''', (project_id,))
+    return hash(tuple(tuple(r) for r in res))
+
+@writes('project_rollups')
+def rebuild_rollups(project_ids=None, fix=True):
+    """
+    Consistency checker for project_rollups. Recomputes every rollup from the raw
+    tables and returns a list of (project_id, column, stored, actual) differences.
+    With fix=True the recomputed values replace the stored ones.
+    """
+    where, params = "", ()
+    if project_ids is not None:
+        params = tuple(int(pid) for pid in project_ids)
+        where = f" WHERE p.project_id IN ({','.join('?' * len(params)) or 'NULL'})"
+    columns = migrations.ROLLUP_COLUMNS
+
+    with transaction() as conn:
+        actual = {r['project_id']: r for r in conn.execute(migrations.ROLLUP_SOURCE_SQL + where, params)}
+        stored = {r['project_id']: r for r in conn.execute("SELECT * FROM project_rollups")}
+
+        diffs = []
+        for pid, row in actual.items():
+            current = stored.get(pid)
+            for col in columns:
+                have = current[col] if current is not None else None
+                want = row[col]
+                if isinstance(want, float) or isinstance(have, float):
+                    same = have is not None and want is not None and abs(have - want) <= 1e-6 * max(1.0, abs(want))
+                else:
+                    same = have == want
+                if not same:
+                    diffs.append((pid, col, have, want))
+
+        if fix and diffs:
+            stale = sorted({d[0] for d in diffs})
+            conn.executemany(
+                f"INSERT OR REPLACE INTO project_rollups (project_id, {', '.join(columns)}, data_version) "
+                f"VALUES (?, {', '.join('?' * len(columns))}, ?)",
+                [
+                    (pid,) + tuple(actual[pid][c] for c in columns)
+                    + ((stored[pid]['data_version'] if pid in stored else 0) + 1,)
+                    for pid in stale
+                ]
+            )
+            for pid in stale:
+                _audit('project_rollups', pid, 'REBUILD', {d[1]: d[2] for d in diffs if d[0] == pid},
+                       {d[1]: d[3] for d in diffs if d[0] == pid})
+    return diffs
+
+# Permissions
+def _bump_auth_version(conn):
+    """Tells every session to reload its cached permissions (see auth.get_permissions)."""
+    conn.execute("UPDATE auth_version SET version = version + 1 WHERE id = 1")
+
+@query_cache.cached('auth_version')
+def get_auth_version():
+    res = execute_query("SELECT version FROM auth_version WHERE id = 1")
+    return res[0]['version'] if res else 0
+
+def get_user_permissions(user_id):
+    """
+    Role, status and the ids of the projects the user owns or is assigned to, as
+    a dict (None if the user no longer exists).
+    """
+    with get_connection() as conn:
+        user = conn.execute(
+            "SELECT user_id, username, full_name, role, status FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if user is None:
+            return None
+        rows = conn.execute('''
+            SELECT project_id FROM projects WHERE pm_user_id = ?
+            UNION
+            SELECT project_id FROM project_assignments WHERE user_id = ?
+        ''', (user_id, user_id)).fetchall()
+    return dict(user, project_ids=frozenset(r[0] for r in rows))
 
 # User Management
 def get_user_by_username(username):
     res = execute_query("SELECT * FROM users WHERE username = ?", (username,))
     return res[0] if res else None
 
-def create_user(data):
+@writes('users')
+def create_user(data, changed_by=None):
+    """Inserts a user; self-registrations (no changed_by) are attributed to the new user."""
     query = '''
     INSERT INTO users (username, password_hash, role, full_name, status)
     VALUES (?, ?, ?, ?, ?)
     '''
     params = (data['username'], data['password_hash'], data['role'], data['full_name'], data.get('status', 'approved'))
-    return execute_query(query, params, commit=True)
+    with transaction():
+        user_id = execute_query(query, params, commit=True)
+        _audit('users', user_id, 'INSERT', None, dict(data, status=params[4]),
+               user_id if changed_by is None else changed_by)
+    return user_id
+
+def _update_user(user_id, column, value, changed_by):
+    with transaction() as conn:
+        old = conn.execute(f"SELECT {column} FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        conn.execute(f"UPDATE users SET {column} = ? WHERE user_id = ?", (value, user_id))
+        _bump_auth_version(conn)
+        if old is not None:
+            _audit('users', user_id, 'UPDATE', {column: old[0]}, {column: value}, changed_by)
 
-def update_user_status(user_id, new_status):
-    query = "UPDATE users SET status = ? WHERE user_id = ?"
-    execute_query(query, (new_status, user_id), commit=True)
+@writes('users', 'auth_version')
+def update_user_status(user_id, new_status, changed_by=None):
+    _update_user(user_id, 'status', new_status, changed_by)
 
-def update_user_role(user_id, new_role):
-    query = "UPDATE users SET role = ? WHERE user_id = ?"
-    execute_query(query, (new_role, user_id), commit=True)
+@writes('users', 'auth_version')
+def update_user_role(user_id, new_role, changed_by=None):
+    _update_user(user_id, 'role', new_role, changed_by)
 
+@writes('users')
+def update_password_hash(user_id, new_hash, changed_by=None):
+    """Replaces a user's password hash; the audit entry records only the hash method."""
+    with transaction() as conn:
+        old = conn.execute("SELECT password_hash FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        conn.execute("UPDATE users SET password_hash = ? WHERE user_id = ?", (new_hash, user_id))
+        if old is not None:
+            _audit('users', user_id, 'UPDATE', {'password_method': old[0].split('$', 1)[0]},
+                   {'password_method': new_hash.split('$', 1)[0]}, user_id if changed_by is None else changed_by)
+
+@query_cache.cached('users')
 def get_pending_users_count():
     res = execute_query("SELECT COUNT(*) as cnt FROM users WHERE status = 'pending'")
     return res[0]['cnt'] if res else 0
@@ -57,22 +692,61 @@ def get_pending_users_count():
 def get_all_users():
     return get_df("SELECT * FROM users")
 
-def delete_user(user_id):
+@writes('users', 'project_assignments', 'auth_version')
+def delete_user(user_id, changed_by=None):
     # Cascade delete is not set in SQLite by default usually unless enabled, 
     # so we manually cleanup to be safe
-    execute_query("DELETE FROM project_assignments WHERE user_id = ?", (user_id,), commit=True)
-    execute_query("DELETE FROM users WHERE user_id = ?", (user_id,), commit=True)
+    with transaction() as conn:
+        old = conn.execute("SELECT username, role, full_name, status FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        projects = [r[0] for r in conn.execute("SELECT project_id FROM project_assignments WHERE user_id = ?", (user_id,))]
+        execute_query("DELETE FROM project_assignments WHERE user_id = ?", (user_id,), commit=True)
+        execute_query("DELETE FROM users WHERE user_id = ?", (user_id,), commit=True)
+        _bump_auth_version(conn)
+        if old is not None:
+            _audit('users', user_id, 'DELETE', dict(old, projects=projects or None), None, changed_by)
 
 # Project Assignment
+@writes('project_assignments', 'auth_version')
 def assign_user_to_project(project_id, user_id, role, assigned_by):
     query = '''
     INSERT OR REPLACE INTO project_assignments (project_id, user_id, assigned_role, assigned_by)
     VALUES (?, ?, ?, ?)
     '''
-    execute_query(query, (project_id, user_id, role, assigned_by), commit=True)
+    with transaction() as conn:
+        old = conn.execute("SELECT assigned_role FROM project_assignments WHERE project_id = ? AND user_id = ?",
+                           (project_id, user_id)).fetchone()
+        execute_query(query, (project_id, user_id, role, assigned_by), commit=True)
+        _bump_auth_version(conn)
+        if old is None:
+            _audit('project_assignments', project_id, 'INSERT', None, {'user_id': user_id, 'assigned_role': role}, assigned_by)
+        else:
+            _audit('project_assignments', project_id, 'UPDATE', {'user_id': user_id, 'assigned_role': old[0]},
+                   {'user_id': user_id, 'assigned_role': role}, assigned_by, keep=('user_id',))
+
+@writes('project_assignments', 'auth_version')
+def remove_user_from_project(project_id, user_id, changed_by=None):
+    with transaction() as conn:
+        old = conn.execute("SELECT assigned_role FROM project_assignments WHERE project_id = ? AND user_id = ?",
+                           (project_id, user_id)).fetchone()
+        execute_query("DELETE FROM project_assignments WHERE project_id = ? AND user_id = ?", (project_id, user_id), commit=True)
+        _bump_auth_version(conn)
+        if old is not None:
+            _audit('project_assignments', project_id, 'DELETE', {'user_id': user_id, 'assigned_role': old[0]}, None, changed_by)
 
-def remove_user_from_project(project_id, user_id):
-    execute_query("DELETE FROM project_assignments WHERE project_id = ? AND user_id = ?", (project_id, user_id), commit=True)
+@writes('project_assignments', 'auth_version')
+def set_project_team(project_id, user_ids, assigned_by, role='recorder'):
+    """Replaces the project's non-PM assignments with `user_ids` in one unit of work."""
+    with transaction() as conn:
+        old = conn.execute("SELECT user_id FROM project_assignments WHERE project_id = ? AND assigned_role != 'pm' ORDER BY user_id",
+                           (project_id,)).fetchall()
+        conn.execute("DELETE FROM project_assignments WHERE project_id = ? AND assigned_role != 'pm'", (project_id,))
+        execute_many('''
+        INSERT OR REPLACE INTO project_assignments (project_id, user_id, assigned_role, assigned_by)
+        VALUES (?, ?, ?, ?)
+        ''', [(project_id, uid, role, assigned_by) for uid in user_ids])
+        _bump_auth_version(conn)
+        _audit('project_assignments', project_id, 'UPDATE', {'team': [r[0] for r in old]},
+               {'team': sorted(int(u) for u in user_ids)}, assigned_by)
 
 def get_project_assignments(project_id):
     return get_df('''
@@ -83,6 +757,7 @@ def get_project_assignments(project_id):
     ''', (project_id,))
 
 # Project Management
+@writes('projects', 'project_rollups', 'auth_version')
 def create_project(data, user_id):
     query = '''
     INSERT INTO projects (project_name, project_number, client, pm_user_id, total_budget, start_date, target_end_date, created_by)
@@ -93,20 +768,29 @@ def create_project(data, user_id):
         data.get('pm_user_id'), data['total_budget'], data['start_date'],
         data['target_end_date'], user_id
     )
-    project_id = execute_query(query, params, commit=True)
-    log_change('projects', project_id, 'INSERT', None, data, user_id)
+    with transaction() as conn:
+        project_id = execute_query(query, params, commit=True)
+        conn.execute("INSERT OR IGNORE INTO project_rollups (project_id) VALUES (?)", (project_id,))
+        _bump_auth_version(conn)
+        _audit('projects', project_id, 'INSERT', None, data, user_id)
     return project_id
 
+@writes('projects', 'project_assignments', 'auth_version')
 def update_project_pm(project_id, new_pm_id, changed_by):
-    # 1. Update Project Table
-    execute_query("UPDATE projects SET pm_user_id = ? WHERE project_id = ?", (new_pm_id, project_id), commit=True)
-    
-    # 2. Update Assignments: Ensure new PM is in the assignment list as 'pm'
-    # We remove the old PM role assignment first to avoid conflicts if they stay on team? 
-    # Actually, let's just Upsert the new PM. The old PM might remain as a leftover 'pm' role in assignments unless we clear it.
-    # Logic: Delete any 'pm' role assignment for this project, then insert new one.
-    execute_query("DELETE FROM project_assignments WHERE project_id = ? AND assigned_role = 'pm'", (project_id,), commit=True)
-    assign_user_to_project(project_id, new_pm_id, 'pm', changed_by)
+    with transaction() as conn:
+        old = conn.execute("SELECT pm_user_id FROM projects WHERE project_id = ?", (project_id,)).fetchone()
+        _audit('projects', project_id, 'UPDATE', {'pm_user_id': old[0] if old else None}, {'pm_user_id': new_pm_id}, changed_by)
+        _bump_auth_version(conn)
+
+        # 1. Update Project Table
+        execute_query("UPDATE projects SET pm_user_id = ? WHERE project_id = ?", (new_pm_id, project_id), commit=True)
+
+        # 2. Update Assignments: Ensure new PM is in the assignment list as 'pm'
+        # We remove the old PM role assignment first to avoid conflicts if they stay on team? 
+        # Actually, let's just Upsert the new PM. The old PM might remain as a leftover 'pm' role in assignments unless we clear it.
+        # Logic: Delete any 'pm' role assignment for this project, then insert new one.
+        execute_query("DELETE FROM project_assignments WHERE project_id = ? AND assigned_role = 'pm'", (project_id,), commit=True)
+        assign_user_to_project(project_id, new_pm_id, 'pm', changed_by)
 
 def get_projects(pm_id=None, user_id=None):
     if user_id:
@@ -127,47 +811,80 @@ def update_activity_status(activity_id, new_status, user_id):
     """
     Updates the status of an activity in baseline_schedule.
     Checks dependencies: An activity cannot be STARTED or COMPLETED unless its 
-    predecessor is COMPLETED.
-    """
-    # 1. Check current activity and its dependency
-    current_act = execute_query("SELECT * FROM baseline_schedule WHERE activity_id = ?", (activity_id,))
-    if not current_act:
-        return False, "Activity not found."
-    
-    current_act = current_act[0]
-    dep_id = current_act['depends_on']
-    
-    # 2. Validation Logic
-    if new_status in ['Active', 'Complete'] and dep_id:
-        dep_act = execute_query("SELECT status FROM baseline_schedule WHERE activity_id = ?", (dep_id,))
-        if dep_act and dep_act[0]['status'] != 'Complete':
-            dep_name = execute_query("SELECT activity_name FROM baseline_schedule WHERE activity_id = ?", (dep_id,))[0]['activity_name']
-            return False, f"Cannot progress. Predecessor '{dep_name}' must be 'Complete' first."
-
-    # 3. Update Status
-    query = "UPDATE baseline_schedule SET status = ? WHERE activity_id = ?"
-    execute_query(query, (new_status, activity_id), commit=True)
-    
-    # 4. Log the event for history
-    event_type = "STARTED" if new_status == "Active" else ("FINISHED" if new_status == "Complete" else "RESET")
-    query_log = '''
-    INSERT INTO activity_log (activity_id, event_type, event_date, recorded_by)
-    VALUES (?, ?, date('now'), ?)
-    '''
-    execute_query(query_log, (activity_id, event_type, user_id), commit=True)
-    
-    return True, f"Status updated to {new_status}."
+    predecessors are COMPLETED.
+    """
+    return update_activity_statuses({activity_id: new_status}, user_id)
+
+@writes('baseline_schedule', 'activity_log', 'project_rollups')
+def update_activity_statuses(changes, user_id):
+    """
+    Applies {activity_id: new_status} as one unit of work, e.g. completing 20
+    activities at once. The dependency graph of the affected projects is loaded
+    with one query under the write lock and the whole request is validated in
+    one topological pass (a predecessor completed in the same request counts);
+    if any change is refused nothing is written. Returns (bool, message).
+    """
+    import schedule_graph
+
+    changes = {int(a): s for a, s in changes.items()}
+    if not changes:
+        return True, "No changes."
+    with transaction() as conn:
+        # 1. Graph of every affected project, read inside the unit of work
+        graph = schedule_graph.load_graph_for_activities(changes)
+
+        # 2. Validation Logic
+        ordered, errors = graph.validate_transitions(changes)
+        if errors:
+            return False, errors[0] if len(errors) == 1 else f"{len(errors)} changes refused: " + " ".join(errors)
+        if not ordered:
+            return True, f"Status updated to {next(iter(changes.values()))}." if len(changes) == 1 else "No changes."
+
+        # 3. Update Status
+        conn.executemany("UPDATE baseline_schedule SET status = ? WHERE activity_id = ?",
+                         [(new, act_id) for act_id, _, new in ordered])
 
+        # 4. Log the events for history, predecessors first
+        events = [(act_id, "STARTED" if new == "Active" else ("FINISHED" if new == "Complete" else "RESET"))
+                  for act_id, _, new in ordered]
+        conn.executemany('''
+        INSERT INTO activity_log (activity_id, event_type, event_date, recorded_by)
+        VALUES (?, ?, date('now'), ?)
+        ''', [(act_id, event, user_id) for act_id, event in events])
+
+        # 5. Keep the project rollups in step
+        deltas = {}
+        for act_id, old, new in ordered:
+            act = graph.activities[act_id]
+            d = deltas.setdefault(act['project_id'], {'activities_active': 0, 'activities_complete': 0, 'earned_value': 0.0})
+            d['activities_active'] += (new == 'Active') - (old == 'Active')
+            d['activities_complete'] += (new == 'Complete') - (old == 'Complete')
+            d['earned_value'] += (act['budgeted_cost'] or 0.0) * ((new == 'Complete') - (old == 'Complete'))
+        for project_id, d in deltas.items():
+            _rollup_delta(conn, project_id, **d)
+
+        for act_id, old, new in ordered:
+            _audit('baseline_schedule', act_id, 'UPDATE', {'status': old}, {'status': new}, user_id)
+
+    if len(changes) == 1:
+        return True, f"Status updated to {next(iter(changes.values()))}."
+    return True, f"Updated {len(ordered)} activities."
+
+@writes('activity_log')
 def update_activity_log(activity_id, event_type, event_date, user_id):
     # Keep for backward compatibility if needed, but we prefer update_activity_status
     query = '''
     INSERT INTO activity_log (activity_id, event_type, event_date, recorded_by)
     VALUES (?, ?, ?, ?)
     '''
-    log_id = execute_query(query, (activity_id, event_type, event_date, user_id), commit=True)
+    with transaction():
+        log_id = execute_query(query, (activity_id, event_type, event_date, user_id), commit=True)
+        _audit('activity_log', log_id, 'INSERT', None,
+               {'activity_id': activity_id, 'event_type': event_type, 'event_date': event_date}, user_id)
     return log_id
 
 # Expenditure Management
+@writes('expenditure_log', 'project_rollups', 'spend_buckets')
 def add_expenditure(data, user_id):
     query = '''
     INSERT INTO expenditure_log (project_id, activity_id, category, description, reference_id, amount, spend_date, recorded_by)
@@ -178,17 +895,149 @@ def add_expenditure(data, user_id):
         data.get('description'), data['reference_id'], data['amount'],
         data['spend_date'], user_id
     )
-    exp_id = execute_query(query, params, commit=True)
+    with transaction() as conn:
+        exp_id = execute_query(query, params, commit=True)
+        _rollup_delta(conn, data['project_id'], spend_range=(data['spend_date'], data['spend_date']),
+                      total_spent=data['amount'], expenditure_count=1)
+        _bucket_delta(conn, [(data['project_id'], data['category'], data['amount'], data['spend_date'])])
+        _audit('expenditure_log', exp_id, 'INSERT', None, data, user_id)
     return exp_id
 
+@writes('expenditure_log', 'project_rollups', 'spend_buckets')
+def add_expenditures(rows, user_id):
+    """
+    Bulk version of add_expenditure for rows of (project_id, activity_id, category,
+    description, reference_id, amount, spend_date).
+    """
+    rows = [tuple(r) + (user_id,) for r in rows]
+    with transaction() as conn:
+        conn.executemany('''
+        INSERT INTO expenditure_log (project_id, activity_id, category, description, reference_id, amount, spend_date, recorded_by)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+        totals = {}
+        for project_id, _, _, _, _, amount, spend_date, _ in rows:
+            spent, count, first, last = totals.get(project_id, (0.0, 0, spend_date, spend_date))
+            totals[project_id] = (spent + amount, count + 1, min(first, spend_date), max(last, spend_date))
+        for project_id, (spent, count, first, last) in totals.items():
+            _rollup_delta(conn, project_id, spend_range=(first, last), total_spent=spent, expenditure_count=count)
+        _bucket_delta(conn, [(r[0], r[2], r[5], r[6]) for r in rows])
+        _audit_bulk(conn, 'expenditure_log', 'exp_id', len(rows), user_id,
+                    projects=sorted(totals), amount=round(sum(t[0] for t in totals.values()), 2))
+
 # Baseline Schedule
-def add_baseline_activity(data):
+@writes('baseline_schedule', 'project_rollups')
+def add_baseline_activity(data, changed_by=None):
     query = '''
     INSERT INTO baseline_schedule (project_id, activity_name, planned_start, planned_finish, budgeted_cost)
     VALUES (?, ?, ?, ?, ?)
     '''
     params = (data['project_id'], data['activity_name'], data['planned_start'], data['planned_finish'], data['budgeted_cost'])
-    return execute_query(query, params, commit=True)
+    with transaction() as conn:
+        activity_id = execute_query(query, params, commit=True)
+        _rollup_delta(conn, data['project_id'], planned_cost=data['budgeted_cost'] or 0.0, activities_total=1)
+        _audit('baseline_schedule', activity_id, 'INSERT', None, data, changed_by)
+    return activity_id
+
+@writes('baseline_schedule', 'project_rollups')
+def add_baseline_activities(project_id, rows, changed_by=None):
+    """
+    Bulk-inserts schedule rows of (activity_name, planned_start, planned_finish,
+    budgeted_cost, status) and returns the new activity_ids in input order.
+    """
+    rows = [(project_id,) + tuple(r) for r in rows]
+    if not rows:
+        return []
+    with transaction() as conn:
+        conn.executemany('''
+        INSERT INTO baseline_schedule (project_id, activity_name, planned_start, planned_finish, budgeted_cost, status)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows)
+        # Ids are allocated sequentially inside the write transaction
+        ids = conn.execute(
+            "SELECT activity_id FROM baseline_schedule WHERE project_id = ? ORDER BY activity_id DESC LIMIT ?",
+            (project_id, len(rows))
+        ).fetchall()
+
+        costs = [r[4] or 0.0 for r in rows]
+        statuses = [r[5] for r in rows]
+        _rollup_delta(
+            conn, project_id,
+            planned_cost=sum(costs),
+            activities_total=len(rows),
+            activities_active=statuses.count('Active'),
+            activities_complete=statuses.count('Complete'),
+            earned_value=sum(c for c, st in zip(costs, statuses) if st == 'Complete'),
+        )
+        _audit_bulk(conn, 'baseline_schedule', 'activity_id', len(rows), changed_by,
+                    project_id=project_id, budgeted_cost=round(sum(costs), 2))
+    return [r['activity_id'] for r in reversed(ids)]
+
+def _add_dependencies(conn, pairs):
+    """Inserts the edges, fills depends_on and checks for cycles; returns the edges added."""
+    import schedule_graph
+
+    pairs = [(int(act), int(dep)) for act, dep in pairs if dep is not None]
+    first = {}
+    for act, dep in pairs:
+        first.setdefault(act, dep)
+    conn.executemany("INSERT OR IGNORE INTO activity_dependencies (activity_id, predecessor_id) VALUES (?, ?)", pairs)
+    conn.executemany("UPDATE baseline_schedule SET depends_on = ? WHERE activity_id = ? AND depends_on IS NULL",
+                     [(dep, act) for act, dep in first.items()])
+    if pairs:
+        schedule_graph.load_graph_for_activities(first).topological_order()
+    return pairs
+
+def _bump_schedule_versions(conn, activity_ids):
+    """Bumps data_version of the projects owning `activity_ids`: the critical path they report changed."""
+    activity_ids = sorted(set(activity_ids))
+    if not activity_ids:
+        return
+    projects = conn.execute(
+        f"SELECT DISTINCT project_id FROM baseline_schedule WHERE activity_id IN ({','.join('?' * len(activity_ids))})",
+        activity_ids
+    ).fetchall()
+    for (project_id,) in projects:
+        _rollup_delta(conn, project_id)
+
+@writes('baseline_schedule', 'activity_dependencies', 'project_rollups')
+def set_activity_dependencies(pairs, changed_by=None):
+    """
+    Bulk-adds (activity_id, predecessor_id) edges; an activity may appear in
+    several pairs. depends_on keeps the first predecessor of each activity.
+    Raises schedule_graph.CycleError (and writes nothing) if the edges form a cycle.
+    """
+    with transaction() as conn:
+        pairs = _add_dependencies(conn, pairs)
+        _bump_schedule_versions(conn, (act for act, _ in pairs))
+        if pairs:
+            _audit('activity_dependencies', min(act for act, _ in pairs), 'BULK_INSERT', None,
+                   {'rows': len(pairs), 'edges': pairs}, changed_by)
+
+@writes('baseline_schedule', 'activity_dependencies', 'project_rollups')
+def set_activity_predecessors(activity_id, predecessor_ids, changed_by=None):
+    """Replaces the predecessors of one activity."""
+    with transaction() as conn:
+        old = [r[0] for r in conn.execute(
+            "SELECT predecessor_id FROM activity_dependencies WHERE activity_id = ? ORDER BY predecessor_id", (activity_id,))]
+        conn.execute("DELETE FROM activity_dependencies WHERE activity_id = ?", (activity_id,))
+        conn.execute("UPDATE baseline_schedule SET depends_on = NULL WHERE activity_id = ?", (activity_id,))
+        pairs = _add_dependencies(conn, [(activity_id, p) for p in predecessor_ids])
+        _bump_schedule_versions(conn, [activity_id])
+        _audit('activity_dependencies', activity_id, 'UPDATE', {'predecessors': old},
+               {'predecessors': sorted(dep for _, dep in pairs)}, changed_by)
+
+@writes('activity_log')
+def add_activity_log_entries(rows, user_id):
+    """Bulk-inserts (activity_id, event_type, event_date) history rows."""
+    rows = [tuple(r) + (user_id,) for r in rows]
+    with transaction() as conn:
+        conn.executemany('''
+        INSERT INTO activity_log (activity_id, event_type, event_date, recorded_by)
+        VALUES (?, ?, ?, ?)
+        ''', rows)
+        _audit_bulk(conn, 'activity_log', 'log_id', len(rows), user_id)
 
 def get_baseline_schedule(project_id):
     return get_df("SELECT * FROM baseline_schedule WHERE project_id = ? ORDER BY planned_start", (project_id,))
@@ -196,6 +1045,7 @@ def get_baseline_schedule(project_id):
 def get_project_risks(project_id):
     return get_df("SELECT * FROM risks WHERE project_id = ? ORDER BY date_identified DESC", (project_id,))
 
+@writes('risks', 'project_rollups')
 def add_risk(data, user_id):
     query = '''
     INSERT INTO risks (project_id, date_identified, description, impact, status, mitigation_action, recorded_by)
@@ -205,8 +1055,41 @@ def add_risk(data, user_id):
         data['project_id'], data.get('date_identified'), data['description'],
         data.get('impact'), data.get('status', 'Open'), data.get('mitigation_action'), user_id
     )
-    return execute_query(query, params, commit=True)
+    with transaction() as conn:
+        risk_id = execute_query(query, params, commit=True)
+        _rollup_delta(conn, data['project_id'], open_high_risks=int(params[3] == 'H' and params[4] == 'Open'))
+        _audit('risks', risk_id, 'INSERT', None, data, user_id)
+    return risk_id
+
+@writes('risks', 'project_rollups')
+def add_risks(rows, user_id):
+    """
+    Bulk version of add_risk for rows of (project_id, date_identified, description,
+    impact, status, mitigation_action).
+    """
+    rows = [tuple(r) + (user_id,) for r in rows]
+    with transaction() as conn:
+        conn.executemany('''
+        INSERT INTO risks (project_id, date_identified, description, impact, status, mitigation_action, recorded_by)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+        open_high = {}
+        for project_id, _, _, impact, status, _, _ in rows:
+            open_high[project_id] = open_high.get(project_id, 0) + int(impact == 'H' and status == 'Open')
+        for project_id, count in open_high.items():
+            _rollup_delta(conn, project_id, open_high_risks=count)
+        _audit_bulk(conn, 'risks', 'risk_id', len(rows), user_id, projects=sorted(open_high))
 
+@writes('risks', 'project_rollups')
 def update_risk_status(risk_id, new_status, user_id):
     query = "UPDATE risks SET status = ?, recorded_by = ? WHERE risk_id = ?"
-    return execute_query(query, (new_status, user_id, risk_id), commit=True)
+    with transaction() as conn:
+        old = conn.execute("SELECT project_id, impact, status FROM risks WHERE risk_id = ?", (risk_id,)).fetchone()
+        res = execute_query(query, (new_status, user_id, risk_id), commit=True)
+        if old is not None:
+            was_open_high = old['impact'] == 'H' and old['status'] == 'Open'
+            is_open_high = old['impact'] == 'H' and new_status == 'Open'
+            _rollup_delta(conn, old['project_id'], open_high_risks=int(is_open_high) - int(was_open_high))
+            _audit('risks', risk_id, 'UPDATE', {'status': old['status']}, {'status': new_status}, user_id)
+    return res
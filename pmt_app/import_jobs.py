@@ -0,0 +1,281 @@
+"""
+Background workbook imports.
+
+submit_import() saves an uploaded workbook to a temporary folder and returns a
+job id straight away; pages poll get_job() for its status. Parsing and
+validation (importer.read_workbook) run in a small process pool, several
+workbooks at a time, and spool the parsed rows to a file next to the upload.
+A single writer thread then streams each spool into importer.write_project,
+so database writes stay serialized and one import's transaction never waits
+on another's. Every workbook is its own job: a bad file fails alone.
+"""
+import itertools
+import logging
+import multiprocessing
+import os
+import pickle
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+IMPORT_WORKERS = max(1, min(4, os.cpu_count() or 1))
+MAX_FINISHED_JOBS = 200
+
+_lock = threading.Lock()
+_executor = None
+_writer = None
+_write_queue = queue.Queue()   # parsed jobs waiting for the writer thread
+_job_ids = itertools.count(1)
+_jobs = OrderedDict()          # job_id -> job dict
+
+_import_jobs = metrics.counter('pmt_import_jobs_total', "Queued workbook imports by outcome", ('outcome',))
+
+
+def _status(job):
+    """The job's status; a queued job counts as parsing once a worker has taken it."""
+    future = job['_future']
+    if job['status'] == 'queued' and future is not None and future.running():
+        return 'parsing'
+    return job['status']
+
+
+@metrics.register_collector
+def _collect_metrics():
+    with _lock:
+        statuses = [_status(job) for job in _jobs.values()]
+    return [
+        ('pmt_import_jobs_pending', 'gauge', "Queued workbook imports not finished yet, by status",
+         [({'status': s}, statuses.count(s)) for s in ('queued', 'parsing', 'parsed', 'writing')]),
+    ]
+
+
+def _parse_workbook(path, spool_path):
+    """
+    Runs in a worker process: reads and validates the whole workbook, pickling
+    each record to `spool_path`. Returns (rows per sheet, seconds).
+    """
+    import importer
+
+    t0 = time.perf_counter()
+    rows = dict.fromkeys(importer.SHEETS, 0)
+    with open(spool_path, 'wb') as f:
+        for kind, value in importer.read_workbook(path):
+            if kind in rows:
+                rows[kind] += len(value)
+            pickle.dump((kind, value), f, pickle.HIGHEST_PROTOCOL)
+    return rows, time.perf_counter() - t0
+
+
+def _read_spool(spool_path):
+    with open(spool_path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # spawn: forking a process that runs Streamlit's threads is unsafe
+            _executor = ProcessPoolExecutor(
+                max_workers=IMPORT_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+
+def _reset_executor(broken):
+    """Drops the pool if it is still the broken one; the next submit starts a fresh pool."""
+    global _executor
+    with _lock:
+        if _executor is not broken:
+            return
+        _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _start_writer():
+    global _writer
+    with _lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_write_loop, name='import-writer', daemon=True)
+            _writer.start()
+
+
+def shutdown(wait=True):
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+def _new_job(file_name, user_id, path):
+    job = {
+        'job_id': next(_job_ids),
+        'file_name': file_name,
+        'status': 'queued',        # queued | parsing | parsed | writing | done | failed
+        'submitted_at': time.time(),
+        'finished_at': None,
+        'project_id': None,
+        'rows_total': None,
+        'rows_done': 0,
+        'parse_s': None,
+        'write_s': None,
+        'error': None,
+        '_user_id': user_id,
+        '_path': path,
+        '_spool': os.path.join(os.path.dirname(path), 'records.pickle'),
+        '_future': None,
+        '_retried': False,
+        '_write_started': None,
+    }
+    _jobs[job['job_id']] = job
+    while len(_jobs) > MAX_FINISHED_JOBS:
+        oldest = next(iter(_jobs.values()))
+        if oldest['status'] not in ('done', 'failed'):
+            break
+        _jobs.popitem(last=False)
+    return job
+
+
+def submit_import(file_name, data, user_id):
+    """
+    Queues the workbook `data` (bytes of an .xlsx upload) for import as
+    `user_id` and returns a job id.
+    """
+    folder = tempfile.mkdtemp(prefix='pmt_import_')
+    path = os.path.join(folder, 'workbook.xlsx')
+    with open(path, 'wb') as f:
+        f.write(data)
+    with _lock:
+        job = _new_job(file_name, user_id, path)
+    _start_writer()
+    _submit_parse(job)
+    return job['job_id']
+
+
+def _submit_parse(job):
+    executor = _get_executor()
+    try:
+        future = executor.submit(_parse_workbook, job['_path'], job['_spool'])
+    except Exception as e:
+        # e.g. a worker died and broke the pool
+        _reset_executor(executor)
+        _retry_or_fail(job, e)
+        return
+    with _lock:
+        job['_future'] = future
+    future.add_done_callback(lambda f: _parsed(job, executor, f))
+
+
+def _retry_or_fail(job, error):
+    """
+    A dead worker (e.g. out of memory) breaks the pool and takes every queued
+    job with it; each of them gets one more go in a fresh pool.
+    """
+    with _lock:
+        retry, job['_retried'] = not job['_retried'], True
+        job['_future'] = None
+    if retry:
+        _submit_parse(job)
+    else:
+        _fail(job, error)
+
+
+def _parsed(job, executor, future):
+    try:
+        rows, seconds = future.result()
+    except BrokenProcessPool as e:
+        _reset_executor(executor)
+        _retry_or_fail(job, e)
+        return
+    except Exception as e:
+        _fail(job, e)
+        return
+    with _lock:
+        job.update(status='parsed', rows_total=sum(rows.values()), parse_s=seconds)
+    _write_queue.put(job)
+
+
+def _write_loop():
+    while True:
+        job = _write_queue.get()
+        try:
+            _write(job)
+        except Exception as e:  # never let one job stop the writer
+            logger.error(f"Import writer failed on job {job['job_id']}: {e}")
+
+
+def _write(job):
+    import importer
+
+    with _lock:
+        job['status'] = 'writing'
+        job['_write_started'] = time.time()
+
+    def progress(n):
+        with _lock:
+            job['rows_done'] += n
+
+    t0 = time.perf_counter()
+    try:
+        project_id, rows = importer.write_project(_read_spool(job['_spool']), job['_user_id'], progress=progress)
+    except Exception as e:
+        _fail(job, e)
+        return
+    write_s = time.perf_counter() - t0
+    importer.record_import(rows, job['parse_s'] + write_s)
+    _import_jobs.inc(outcome='done')
+    with _lock:
+        job.update(status='done', project_id=project_id, write_s=write_s, finished_at=time.time())
+    _cleanup(job)
+    logger.info(f"Import job {job['job_id']} ({job['file_name']}): project {project_id}, {rows}")
+
+
+def _fail(job, error):
+    _import_jobs.inc(outcome='failed')
+    with _lock:
+        job.update(status='failed', error=str(error) or type(error).__name__, finished_at=time.time())
+    _cleanup(job)
+    logger.error(f"Import job {job['job_id']} ({job['file_name']}) failed: {error}")
+
+
+def _cleanup(job):
+    shutil.rmtree(os.path.dirname(job['_path']), ignore_errors=True)
+
+
+def get_job(job_id):
+    """
+    Snapshot of the job's state, or None for an unknown id. 'progress' is the
+    share of rows written (0-1) and 'rows_per_sec' the rows per second of
+    parsing plus writing so far.
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        snapshot = {k: v for k, v in job.items() if not k.startswith('_')}
+        snapshot['status'] = _status(job)
+        write_started = job['_write_started']
+
+    total = snapshot['rows_total']
+    snapshot['progress'] = 1.0 if snapshot['status'] == 'done' else (snapshot['rows_done'] / total if total else 0.0)
+    seconds = None
+    if snapshot['status'] == 'done':
+        seconds = snapshot['parse_s'] + snapshot['write_s']
+    elif snapshot['status'] == 'writing':
+        seconds = snapshot['parse_s'] + (time.time() - write_started)
+    snapshot['rows_per_sec'] = (snapshot['rows_done'] / seconds) if seconds else None
+    return snapshot
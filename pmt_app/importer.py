@@ -1,97 +1,268 @@
-import pandas as pd
+import time
+from contextlib import contextmanager
+from itertools import islice
+
 import database
-from datetime import datetime
+import metrics
 
-def import_project(file, user_id):
+_import_seconds = metrics.histogram('pmt_import_seconds', "Wall time of a project workbook import")
+_import_rows = metrics.counter('pmt_import_rows_total', "Rows imported from workbooks, by sheet", ('sheet',))
+_import_rows_per_second = metrics.gauge('pmt_import_last_rows_per_second', "Throughput of the most recent import")
+
+# Rows handed to each bulk insert; bounds memory whatever the workbook size
+CHUNK_ROWS = 2_000
+
+SHEETS = ('schedule', 'expenditures', 'risks')
+
+# Row (1-based) holding each table's column headers
+SCHEDULE_HEADER_ROW = 11
+EXPENDITURE_HEADER_ROW = 4
+RISK_HEADER_ROW = 3
+
+
+def _cell(value):
+    """Normalizes a cell the way pandas' reader did: whole floats become ints, empty strings None."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if value == '':
+        return None
+    return value
+
+
+def _date(value):
+    """First 10 characters of the cell ('YYYY-MM-DD' for Excel dates), None where empty."""
+    return None if value is None else str(value)[:10]
+
+
+def _id_key(value):
+    """Normalizes workbook ids so 1, 1.0 and '1' match."""
+    try:
+        return str(int(float(value)))
+    except (TypeError, ValueError):
+        return str(value).strip()
+
+
+def _predecessor_ids(cell):
+    """'Depends On' may list several activity ids, e.g. '3, 5' or '3;5'."""
+    if isinstance(cell, str):
+        return [part for part in cell.replace(';', ',').split(',') if part.strip() and part.strip() != '-']
+    return [cell]
+
+
+def _chunks(rows, size=CHUNK_ROWS):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+@contextmanager
+def _open_workbook(file):
+    """
+    Opens the workbook in openpyxl's read-only mode, which streams each sheet's
+    XML instead of loading it. data_only gives cached formula results.
+    """
+    from openpyxl import load_workbook  # only needed when an import runs
+
+    wb = load_workbook(file, read_only=True, data_only=True, keep_links=False)
+    try:
+        yield wb
+    finally:
+        wb.close()
+
+
+def _table(ws, header_row, required, optional=()):
     """
-    Parses the Project Template Excel and inserts data into the DB.
+    Streams the table whose headers are on `header_row`. Yields one tuple per
+    row holding the `required` then `optional` columns, in that order; missing
+    optional columns and short rows read as None.
     """
-    # Load Excel
-    xl = pd.ExcelFile(file)
-    
-    # 1. Parse Project Info (from Project_Schedule sheet headers)
-    # Using openpyxl directly for non-tabular data is better but for speed we'll use pandas read_excel with specific ranges if possible
-    # For now, let's assume a slightly more robust way:
-    df_info = pd.read_excel(xl, "Project_Schedule", header=None)
-    
-    project_data = {
-        'project_name': df_info.iloc[4, 2],    # C5
-        'project_number': str(df_info.iloc[5, 2]),# C6
-        'client': df_info.iloc[6, 2],          # C7
-        'total_budget': float(df_info.iloc[4, 5]) if pd.notna(df_info.iloc[4, 5]) else 0.0, # F5
-        'start_date': str(df_info.iloc[5, 5])[:10] if pd.notna(df_info.iloc[5, 5]) else None, # F6
-        'target_end_date': str(df_info.iloc[6, 5])[:10] if pd.notna(df_info.iloc[6, 5]) else None, # F7
-        'pm_user_id': user_id
+    # Some writers record a wrong sheet size; read to the last real row
+    ws.reset_dimensions()
+    rows = ws.iter_rows(min_row=header_row, values_only=True)
+
+    index = {}
+    for i, name in enumerate(next(rows, ())):
+        if isinstance(name, str):
+            index.setdefault(name.strip(), i)
+    missing = [name for name in required if name not in index]
+    if missing:
+        raise ValueError(f"Sheet '{ws.title}' is missing column(s): {', '.join(missing)}")
+    positions = [index.get(name) for name in (*required, *optional)]
+
+    for row in rows:
+        yield tuple(
+            _cell(row[i]) if i is not None and i < len(row) else None
+            for i in positions
+        )
+
+
+def _project_info(ws):
+    """The project header cells C5:C7 and F5:F7 of Project_Schedule."""
+    cells = [
+        tuple(_cell(v) for v in row) + (None,) * (4 - len(row))
+        for row in ws.iter_rows(min_row=5, max_row=7, min_col=3, max_col=6, values_only=True)
+    ]
+    (name, _, _, budget), (number, _, _, start), (client, _, _, end) = cells + [(None,) * 4] * (3 - len(cells))
+    if name is None or number is None:
+        raise ValueError(f"Sheet '{ws.title}' needs a project name (C5) and project number (C6)")
+    return {
+        'project_name': name,
+        'project_number': str(number),
+        'client': client,
+        'total_budget': float(budget) if budget is not None else 0.0,
+        'start_date': _date(start),
+        'target_end_date': _date(end),
     }
-    
-    # Create Project in DB
-    project_id = database.create_project(project_data, user_id)
-    
-    # 2. Parse Baseline Schedule (Row 11 is Header)
-    df_schedule = pd.read_excel(xl, "Project_Schedule", skiprows=10)
-    df_schedule = df_schedule.dropna(subset=['Activity Name'])
-    
-    for _, row in df_schedule.iterrows():
-        activity_name = row['Activity Name']
-        p_start = str(row['Planned Start'])[:10] if pd.notna(row['Planned Start']) else None
-        p_end = str(row['Planned End'])[:10] if pd.notna(row['Planned End']) else None
-        budget = float(row['Budgeted Cost (R)']) if pd.notna(row['Budgeted Cost (R)']) else 0.0
-        depends = row['Depends On'] if pd.notna(row['Depends On']) and row['Depends On'] != '-' else None
-        
+
+
+def _schedule_rows(ws):
+    """
+    Project_Schedule rows (Row 11 is Header) as (excel_id, activity_name,
+    planned_start, planned_finish, budgeted_cost, status, depends_on,
+    actual_start, actual_end).
+    """
+    for name, p_start, p_end, cost, depends, excel_id, a_start, a_end in _table(
+        ws, SCHEDULE_HEADER_ROW,
+        ('Activity Name', 'Planned Start', 'Planned End', 'Budgeted Cost (R)', 'Depends On'),
+        ('Activity ID', 'Actual Start', 'Actual End'),
+    ):
+        if name is None:
+            continue
         # Derive Status
-        status = 'Not Started'
-        if pd.notna(row.get('Actual End')):
-            status = 'Complete'
-        elif pd.notna(row.get('Actual Start')):
-            status = 'Active'
-            
-        # Insert into baseline_schedule (including status)
-        query = '''
-        INSERT INTO baseline_schedule (project_id, activity_name, planned_start, planned_finish, budgeted_cost, depends_on, status)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        '''
-        activity_id = database.execute_query(query, (project_id, activity_name, p_start, p_end, budget, depends, status), commit=True)
-        
-        # Seed activity log for history
+        status = 'Complete' if a_end is not None else 'Active' if a_start is not None else 'Not Started'
+        yield (
+            excel_id, name, _date(p_start), _date(p_end),
+            float(cost) if cost is not None else 0.0, status,
+            None if depends == '-' else depends,
+            _date(a_start), _date(a_end),
+        )
+
+
+def _expenditure_rows(ws):
+    """Expenditure_Log rows as (category, description, reference_id, amount, spend_date)."""
+    for category, description, reference, amount, spend_date in _table(
+        ws, EXPENDITURE_HEADER_ROW, ('Category', 'Description', 'Reference (Invoice/PO)', 'Amount (R)', 'Date')
+    ):
+        if amount is None:
+            continue
+        if spend_date is None:
+            raise ValueError(f"Sheet '{ws.title}': an expenditure of {amount} has no Date")
+        yield (category, description, reference, float(amount), _date(spend_date))
+
+
+def _risk_rows(ws):
+    """Risk_Register rows as (date_identified, description, impact, status, mitigation_action)."""
+    for identified, description, impact, status, mitigation in _table(
+        ws, RISK_HEADER_ROW,
+        ('Date Identified', 'Risk/Issue Description', 'Impact (H/M/L)', 'Status', 'Mitigation Action')
+    ):
+        # Skip rows without a description
+        if description is None:
+            continue
+        yield (
+            _date(identified), description,
+            str(impact).upper() if impact is not None else 'M',
+            status if status is not None else 'Open',
+            mitigation,
+        )
+
+
+def _history_rows(activities, activity_ids):
+    """Seed activity_log so imported Active/Complete items have a valid timeline."""
+    rows = []
+    for act_id, (_, _, p_start, _, _, status, _, a_start, a_end) in zip(activity_ids, activities):
         if status == 'Active':
-            database.update_activity_log(activity_id, 'STARTED', str(row['Actual Start'])[:10], user_id)
+            rows.append((act_id, 'STARTED', a_start))
         elif status == 'Complete':
-            # Note: We log both START and FINISH for completed items to maintain valid timeline history
-            act_start = str(row['Actual Start'])[:10] if pd.notna(row.get('Actual Start')) else p_start
-            database.update_activity_log(activity_id, 'STARTED', act_start, user_id)
-            database.update_activity_log(activity_id, 'FINISHED', str(row['Actual End'])[:10], user_id)
-
-    # 3. Parse Expenditure Log
-    df_exp = pd.read_excel(xl, "Expenditure_Log", skiprows=3)
-    df_exp = df_exp.dropna(subset=['Amount (R)'])
-    
-    for _, row in df_exp.iterrows():
-        data = {
-            'project_id': project_id,
-            'activity_id': None, # Linking by Activity ID from Excel might need mapping
-            'category': row['Category'],
-            'description': row['Description'],
-            'reference_id': row['Reference (Invoice/PO)'],
-            'amount': float(row['Amount (R)']),
-            'spend_date': str(row['Date'])[:10]
-        }
-        database.add_expenditure(data, user_id)
-        
-    # 4. Parse Risk Register
-    if "Risk_Register" in xl.sheet_names:
-        df_risk = pd.read_excel(xl, "Risk_Register", skiprows=2)
-        # Drop rows where 'Risk/Issue Description' is NaN
-        df_risk = df_risk.dropna(subset=['Risk/Issue Description'])
-        
-        for _, row in df_risk.iterrows():
-            risk_data = {
-                'project_id': project_id,
-                'date_identified': str(row['Date Identified'])[:10] if pd.notna(row['Date Identified']) else None,
-                'description': row['Risk/Issue Description'],
-                'impact': str(row['Impact (H/M/L)']).upper() if pd.notna(row['Impact (H/M/L)']) else 'M',
-                'status': row['Status'] if pd.notna(row['Status']) else 'Open',
-                'mitigation_action': row['Mitigation Action'] if pd.notna(row['Mitigation Action']) else None
-            }
-            database.add_risk(risk_data, user_id)
+            # Note: We log both START and FINISH for completed items; with no
+            # start date at all the item started no later than it finished
+            rows.append((act_id, 'STARTED', a_start or p_start or a_end))
+            rows.append((act_id, 'FINISHED', a_end))
+    return rows
+
+
+def read_workbook(file):
+    """
+    Streams a Project Template workbook as (kind, value) records: first
+    ('project', header fields), then ('schedule' | 'expenditures' | 'risks', rows)
+    with at most CHUNK_ROWS rows each. The workbook is opened once in read-only
+    mode, so memory stays flat however large it is. Raises ValueError on a
+    missing sheet column, header cell or expenditure date.
+    """
+    with _open_workbook(file) as wb:
+        # 1. Project Info (from Project_Schedule sheet headers)
+        yield 'project', _project_info(wb["Project_Schedule"])
+
+        # 2. Tables
+        for chunk in _chunks(_schedule_rows(wb["Project_Schedule"])):
+            yield 'schedule', chunk
+        for chunk in _chunks(_expenditure_rows(wb["Expenditure_Log"])):
+            yield 'expenditures', chunk
+        if "Risk_Register" in wb.sheetnames:
+            for chunk in _chunks(_risk_rows(wb["Risk_Register"])):
+                yield 'risks', chunk
+
 
+def write_project(records, user_id, progress=None):
+    """
+    Writes the records of read_workbook() in one transaction, so a failure
+    anywhere leaves nothing behind. Returns (project_id, rows per sheet).
+    progress(n), if given, is called after each chunk of n rows is written.
+    """
+    records = iter(records)
+    kind, project_data = next(records)
+    if kind != 'project':
+        raise ValueError(f"Expected the project header first, got '{kind}' rows")
+    rows = dict.fromkeys(SHEETS, 0)
+
+    with database.transaction():
+        project_id = database.create_project(dict(project_data, pm_user_id=user_id), user_id)
+
+        id_map, depends = {}, []
+        for kind, chunk in records:
+            if kind == 'schedule':
+                activity_ids = database.add_baseline_activities(project_id, (a[1:6] for a in chunk), user_id)
+                # Keep only the workbook id -> DB id map; dependencies may point forward
+                for (excel_id, *_, depends_on, _, _), act_id in zip(chunk, activity_ids):
+                    if excel_id is not None:
+                        id_map[_id_key(excel_id)] = act_id
+                    if depends_on is not None:
+                        depends.append((act_id, depends_on))
+                database.add_activity_log_entries(_history_rows(chunk, activity_ids), user_id)
+            elif kind == 'expenditures':
+                # Linking by Activity ID from Excel might need mapping
+                database.add_expenditures(((project_id, None) + e for e in chunk), user_id)
+            elif kind == 'risks':
+                database.add_risks(((project_id,) + r for r in chunk), user_id)
+            else:
+                raise ValueError(f"Unknown workbook record '{kind}'")
+            rows[kind] += len(chunk)
+            if progress:
+                progress(len(chunk))
+
+        # 'Depends On' refers to the workbook's Activity ID column; map it to the new DB ids
+        deps = [(act_id, id_map.get(_id_key(dep)))
+                for act_id, cell in depends for dep in _predecessor_ids(cell)]
+        if deps:
+            database.set_activity_dependencies(deps, user_id)
+
+    return project_id, rows
+
+
+def record_import(rows, seconds):
+    """Metrics for one committed import of `rows` (rows per sheet) taking `seconds`."""
+    for sheet, n in rows.items():
+        _import_rows.inc(n, sheet=sheet)
+    _import_seconds.observe(seconds)
+    _import_rows_per_second.set(round(sum(rows.values()) / seconds, 1) if seconds else 0)
+
+
+def import_project(file, user_id):
+    """
+    Parses the Project Template Excel and inserts data into the DB, streaming
+    the workbook's rows into executemany in chunks of CHUNK_ROWS.
+    """
+    t0 = time.perf_counter()
+    project_id, rows = write_project(read_workbook(file), user_id)
+    record_import(rows, time.perf_counter() - t0)
     return project_id
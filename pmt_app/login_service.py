@@ -0,0 +1,280 @@
+"""
+Login throttling and password hashing off the Streamlit script thread.
+
+authenticate() is what auth.login calls. Each attempt first takes a token
+from a per-username and a per-IP token bucket, so a burst of guesses is
+refused before any hashing happens. Password checks run in a bounded thread
+pool: hashlib's scrypt and pbkdf2 release the GIL, so checks use the workers'
+cores. At most MAX_PENDING checks are queued or running; further attempts wait
+up to QUEUE_WAIT_S for a slot and are then turned away instead of piling up.
+
+A successful check is remembered in a small credential cache keyed by an HMAC
+of (username, password, stored hash) under a per-process secret. Reconnects
+and repeated logins then skip the expensive hash until CREDENTIAL_TTL_S passes
+or the stored hash changes. Hashes made with a method other than
+PASSWORD_METHOD are upgraded to it after the next successful login.
+"""
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import database
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Werkzeug method string, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000"
+PASSWORD_METHOD = os.environ.get('PMT_PASSWORD_METHOD', 'scrypt:32768:8:1')
+LOGIN_WORKERS = int(os.environ.get('PMT_LOGIN_WORKERS', min(4, os.cpu_count() or 1)))
+MAX_PENDING = LOGIN_WORKERS * 4
+QUEUE_WAIT_S = 10.0
+
+# (burst capacity, tokens refilled per second)
+USERNAME_BUCKET = (5, 1 / 30)    # 5 attempts, then one every 30 s
+IP_BUCKET = (20, 1 / 3)          # 20 attempts, then one every 3 s
+MAX_TRACKED_KEYS = 10_000
+
+CREDENTIAL_TTL_S = 15 * 60
+MAX_CACHED_CREDENTIALS = 1_000
+
+INVALID_MESSAGE = "Invalid credentials"
+BUSY_MESSAGE = "The server is busy signing other users in. Please try again in a moment."
+
+
+class RateLimiter:
+    """Token buckets keyed by an arbitrary string, least recently used keys dropped past `max_keys`."""
+
+    def __init__(self, capacity, refill_per_s, max_keys=MAX_TRACKED_KEYS):
+        self.capacity = float(capacity)
+        self.refill_per_s = float(refill_per_s)
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()   # key -> (tokens, last refill time)
+        self._lock = threading.Lock()
+
+    def _level(self, key, now):
+        tokens, last = self._buckets.get(key, (self.capacity, now))
+        return min(self.capacity, tokens + (now - last) * self.refill_per_s)
+
+    def acquire(self, key):
+        """Takes one token; returns 0.0 on success or the seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens = self._level(key, now)
+            if tokens < 1.0:
+                return (1.0 - tokens) / self.refill_per_s
+            self._buckets[key] = (tokens - 1.0, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return 0.0
+
+    def refund(self, key):
+        """Gives a token back, e.g. after an attempt that never reached a hash check."""
+        now = time.monotonic()
+        with self._lock:
+            if key in self._buckets:
+                self._buckets[key] = (min(self.capacity, self._level(key, now) + 1.0), now)
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+_username_limiter = RateLimiter(*USERNAME_BUCKET)
+_ip_limiter = RateLimiter(*IP_BUCKET)
+
+_lock = threading.Lock()
+_executor = None
+_slots = threading.BoundedSemaphore(MAX_PENDING)
+_secret = secrets.token_bytes(32)
+_credentials = OrderedDict()   # HMAC digest -> expiry (monotonic)
+_stats_lock = threading.Lock()
+_stats = {'attempts': 0, 'succeeded': 0, 'failed': 0, 'rate_limited': 0, 'busy': 0,
+          'hash_checks': 0, 'cache_hits': 0, 'rehashed': 0}
+
+# A real hash to check against when the username does not exist, so unknown and
+# known usernames take the same time. Made on first use inside the hash pool.
+_DUMMY_HASH = None
+
+
+def _count(key, n=1):
+    with _stats_lock:
+        _stats[key] += n
+
+
+def get_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+@metrics.register_collector
+def _collect_metrics():
+    stats = get_stats()
+    return [
+        ('pmt_login_attempts_total', 'counter', "Finished login attempts by outcome",
+         [({'outcome': k}, stats[k]) for k in ('succeeded', 'failed', 'rate_limited', 'busy')]),
+        ('pmt_login_credential_cache_hits_total', 'counter', "Logins accepted from the credential cache",
+         [({}, stats['cache_hits'])]),
+        ('pmt_login_hash_checks_total', 'counter', "Password hashes verified", [({}, stats['hash_checks'])]),
+    ]
+
+
+def reset():
+    """Clears limiter state, cached credentials and counters (tests, benchmarks)."""
+    _username_limiter.reset()
+    _ip_limiter.reset()
+    with _lock:
+        _credentials.clear()
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=LOGIN_WORKERS, thread_name_prefix='login-hash')
+            # make the dummy hash now, so the first unknown username is not slower than the rest
+            _executor.submit(_dummy_hash)
+        return _executor
+
+
+def shutdown(wait=True):
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+def _run_bounded(fn, *args):
+    """Runs fn in the hash pool; returns (True, result) or (False, None) if the pool is saturated."""
+    if not _slots.acquire(timeout=QUEUE_WAIT_S):
+        _count('busy')
+        return False, None
+    try:
+        return True, _get_executor().submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def needs_rehash(password_hash):
+    return not password_hash.startswith(PASSWORD_METHOD + '$')
+
+
+def hash_password(password):
+    """Hash of `password` with PASSWORD_METHOD, computed in the hash pool."""
+    ok, result = _run_bounded(generate_password_hash, password, PASSWORD_METHOD)
+    return result if ok else generate_password_hash(password, PASSWORD_METHOD)
+
+
+def _credential_key(username, password, password_hash):
+    message = '\0'.join((username, password, password_hash)).encode('utf-8')
+    return hmac.new(_secret, message, hashlib.sha256).digest()
+
+
+def _cached_credential(key):
+    now = time.monotonic()
+    with _lock:
+        expiry = _credentials.get(key)
+        if expiry is None:
+            return False
+        if expiry < now:
+            del _credentials[key]
+            return False
+        _credentials.move_to_end(key)
+        return True
+
+
+def _remember_credential(key):
+    with _lock:
+        _credentials[key] = time.monotonic() + CREDENTIAL_TTL_S
+        _credentials.move_to_end(key)
+        while len(_credentials) > MAX_CACHED_CREDENTIALS:
+            _credentials.popitem(last=False)
+
+
+def _verify(password_hash, password, upgrade):
+    """
+    Runs in the pool: checks the password and, if asked, returns an upgraded hash
+    as well. password_hash None (unknown user) is checked against the dummy hash.
+    """
+    if password_hash is None:
+        password_hash = _dummy_hash()
+    if not check_password_hash(password_hash, password):
+        return False, None
+    return True, generate_password_hash(password, PASSWORD_METHOD) if upgrade else None
+
+
+def _dummy_hash():
+    """Only called in the hash pool, never on the request thread."""
+    global _DUMMY_HASH
+    if _DUMMY_HASH is None:
+        _DUMMY_HASH = generate_password_hash(secrets.token_hex(8), PASSWORD_METHOD)
+    return _DUMMY_HASH
+
+
+def authenticate(username, password, ip=None):
+    """
+    Checks a login attempt. Returns (user row, None) on success or (None, message)
+    where message is safe to show: invalid credentials, rate limited (with the
+    wait) or server busy.
+    """
+    _count('attempts')
+    username = (username or '').strip()
+    user_key = username.lower()
+
+    # 1. Throttle before any lookup or hashing
+    wait = _username_limiter.acquire(user_key)
+    if not wait and ip:
+        wait = _ip_limiter.acquire(ip)
+        if wait:
+            _username_limiter.refund(user_key)
+    if wait:
+        _count('rate_limited')
+        logger.warning(f"Login rate limited for user '{username}' from {ip or 'unknown address'}")
+        return None, f"Too many login attempts. Try again in {max(1, round(wait))} seconds."
+
+    # 2. Look up the user; unknown names still pay for one hash check
+    user = database.get_user_by_username(username) if username else None
+    stored = user['password_hash'] if user else None
+
+    if user is not None and _cached_credential(_credential_key(username, password or '', stored)):
+        _count('cache_hits')
+        _count('succeeded')
+        return user, None
+
+    # 3. Verify (and upgrade) in the bounded pool
+    upgrade = user is not None and needs_rehash(stored)
+    ok, result = _run_bounded(_verify, stored, password or '', upgrade)
+    if not ok:
+        _username_limiter.refund(user_key)
+        if ip:
+            _ip_limiter.refund(ip)
+        return None, BUSY_MESSAGE
+    _count('hash_checks')
+    valid, new_hash = result
+    if user is None or not valid:
+        _count('failed')
+        return None, INVALID_MESSAGE
+
+    if new_hash is not None:
+        database.update_password_hash(user['user_id'], new_hash)
+        _count('rehashed')
+        stored = new_hash
+    _remember_credential(_credential_key(username, password, stored))
+    _count('succeeded')
+    return user, None
+
+
+# Start the pool (and the dummy hash) at import rather than on the first login
+_get_executor()
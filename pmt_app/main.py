@@ -1,7 +1,11 @@
+import startup_profile
+startup_profile.install()  # no-op unless PMT_PROFILE_STARTUP=1; must run before the app imports
 import streamlit as st
 import auth
 import database
+import metrics
 import styles
+import tracing
 
 # Page Config
 st.set_page_config(page_title="PM Tool - Login", page_icon="", layout="centered")
@@ -87,7 +91,9 @@ st.markdown(
 
 
 def main():
+    metrics.start_exporter()  # once per process; no-op unless PMT_METRICS_PORT or PMT_METRICS_FILE is set
     auth.init_session()
+    auth.get_permissions()  # refreshes a stale role/status, logs out deleted accounts
     styles.global_css()
 
     if not auth.is_logged_in():
@@ -106,11 +112,12 @@ def main():
                     l_pass = st.text_input("Password", type="password", key="l_pass")
 
                     if st.button("Login to Dashboard", use_container_width=True, type="primary"):
-                        if auth.login(l_user, l_pass):
+                        ok, error = auth.login(l_user, l_pass)
+                        if ok:
                             st.success("Welcome back!")
                             st.rerun()
                         else:
-                            st.error("Invalid credentials")
+                            st.error(error)
 
             with tab_signup:
                 with st.container(border=True):
@@ -135,7 +142,9 @@ def main():
         # Hide sidebar during login
         login_page = st.Page(show_login, title="Login", icon=":material/login:")
         pg = st.navigation([login_page], position="hidden")
-        pg.run()
+        with startup_profile.page_run(pg.title, st.session_state), metrics.page_render(pg.url_path or pg.title), \
+                tracing.rerun(pg.title, st.session_state):
+            pg.run()
 
     else:
         # --- DYNAMIC NAVIGATION (RBAC) ---
@@ -235,7 +244,16 @@ def main():
             if st.button("Logout", use_container_width=True):
                 auth.logout()
 
-        pg.run()
+        try:
+            with startup_profile.page_run(pg.title, st.session_state), metrics.page_render(pg.url_path or pg.title), \
+                    tracing.rerun(pg.title, st.session_state):
+                pg.run()
+        finally:
+            # 6. Developer trace of this rerun (admins only), drawn after the page so it is
+            # complete, and also when the page ends early with st.stop()
+            if role == "admin":
+                with st.sidebar:
+                    tracing.render_panel(st.session_state)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,289 @@
+"""
+In-process runtime metrics in the Prometheus text format.
+
+Modules record into process-wide counters, gauges and histograms:
+    metrics.counter('pmt_import_rows_total', "Rows imported").inc(n)
+    with metrics.histogram('pmt_page_render_seconds', "...", ('page',)).time(page=title):
+        ...
+Values that already live elsewhere (cache statistics, pool sizes) are read
+at export time by collectors registered with register_collector(), so they
+cost nothing between scrapes.
+
+Export is off unless configured:
+  * PMT_METRICS_PORT=9464 serves GET /metrics on PMT_METRICS_HOST (default
+    127.0.0.1) from a daemon thread, for a Prometheus scrape job;
+  * PMT_METRICS_FILE=/var/lib/node_exporter/pmt.prom rewrites that file
+    every PMT_METRICS_INTERVAL_S seconds (default 15), for node_exporter's
+    textfile collector.
+p95 latency per page is then
+    histogram_quantile(0.95, sum by (page, le) (rate(pmt_page_render_seconds_bucket[5m])))
+"""
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+METRICS_HOST = os.environ.get('PMT_METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.environ.get('PMT_METRICS_PORT', 0) or 0)
+METRICS_FILE = os.environ.get('PMT_METRICS_FILE', '')
+METRICS_INTERVAL_S = float(os.environ.get('PMT_METRICS_INTERVAL_S', 15))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_lock = threading.Lock()
+_metrics = {}        # name -> metric, in registration order
+_collectors = []     # callables returning [(name, type, help, [(labels, value), ...]), ...]
+_exporter_started = False
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}    # label values tuple -> value
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [('', tuple(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the wall time of the block in seconds, also when it raises."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total, n) for key, (counts, total, n) in self._values.items()]
+        out = []
+        for key, counts, total, n in items:
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                out.append(('_bucket', labels + (('le', _format_value(bound)),), cumulative))
+            out.append(('_sum', labels, total))
+            out.append(('_count', labels, n))
+        return out
+
+
+def _get_or_create(cls, name, help, labelnames, **kwargs):
+    with _lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = cls(name, help, labelnames, **kwargs)
+        elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+            raise ValueError(f"Metric {name} is already registered as a different {metric.kind}")
+        return metric
+
+
+def counter(name, help, labelnames=()):
+    return _get_or_create(Counter, name, help, labelnames)
+
+
+def gauge(name, help, labelnames=()):
+    return _get_or_create(Gauge, name, help, labelnames)
+
+
+def histogram(name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+    return _get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+
+def register_collector(fn):
+    """fn() is called at export time and returns [(name, type, help, [(labels dict, value), ...]), ...]."""
+    with _lock:
+        if fn not in _collectors:
+            _collectors.append(fn)
+    return fn
+
+
+def render():
+    """Every metric and collector in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        metrics = list(_metrics.values())
+        collectors = list(_collectors)
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {_escape(metric.help)}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for suffix, labels, value in metric.samples():
+            lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+    for collect in collectors:
+        try:
+            families = collect()
+        except Exception as e:
+            logger.warning(f"Metrics collector {getattr(collect, '__qualname__', collect)} failed: {e}")
+            continue
+        for name, kind, help, samples in families:
+            lines.append(f"# HELP {name} {_escape(help)}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(sorted((labels or {}).items()))} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Forgets every recorded value (tests, benchmarks); collectors stay registered."""
+    with _lock:
+        metrics = list(_metrics.values())
+    for metric in metrics:
+        with metric._lock:
+            metric._values.clear()
+
+
+# =============================================================================
+# APP HOOKS
+# =============================================================================
+page_renders = counter('pmt_page_renders_total', "Streamlit script runs per page", ('page',))
+page_render_seconds = histogram('pmt_page_render_seconds', "Wall time of a page's script run", ('page',))
+
+
+@contextmanager
+def page_render(page):
+    """Counts and times one script run of `page` (a stable name: titles can carry counts)."""
+    page_renders.inc(page=page)
+    with page_render_seconds.time(page=page):
+        yield
+
+
+# =============================================================================
+# EXPORT
+# =============================================================================
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # one line per scrape would drown the app log
+
+
+def write_file(path=None):
+    """Writes render() to `path` atomically, so a reader never sees half a file."""
+    path = path or METRICS_FILE
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(render())
+    os.replace(tmp, path)
+
+
+def _write_loop(path, interval):
+    while True:
+        try:
+            write_file(path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {path}: {e}")
+        time.sleep(interval)
+
+
+def start_exporter(port=None, path=None):
+    """
+    Starts the configured exporters once per process (later calls are no-ops):
+    the HTTP endpoint when a port is set, the file writer when a path is set.
+    Returns the HTTP server, if one was started.
+    """
+    global _exporter_started
+    port = METRICS_PORT if port is None else port
+    path = METRICS_FILE if path is None else path
+    with _lock:
+        if _exporter_started or not (port or path):
+            return None
+        _exporter_started = True
+
+    server = None
+    if port:
+        try:
+            server = ThreadingHTTPServer((METRICS_HOST, port), _Handler)
+        except OSError as e:
+            logger.error(f"Metrics endpoint could not listen on {METRICS_HOST}:{port}: {e}")
+        else:
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+            logger.info(f"Serving metrics on http://{METRICS_HOST}:{server.server_port}/metrics")
+    if path:
+        threading.Thread(target=_write_loop, args=(path, METRICS_INTERVAL_S), name='metrics-file', daemon=True).start()
+    return server
@@ -0,0 +1,354 @@
+"""
+Versioned, non-destructive schema migrations.
+
+Each migration is (version, description, steps) where a step is either an SQL
+string or a callable taking the open connection. Applied versions are recorded
+in the schema_version table, so running migrate() against a live database only
+applies what is missing.
+"""
+import sqlite3
+from datetime import datetime
+
+BASELINE_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        role TEXT NOT NULL,
+        full_name TEXT NOT NULL,
+        status TEXT DEFAULT 'approved'
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS projects (
+        project_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_name TEXT NOT NULL,
+        project_number TEXT UNIQUE NOT NULL,
+        client TEXT,
+        pm_user_id INTEGER,
+        total_budget REAL,
+        start_date DATE,
+        target_end_date DATE,
+        status TEXT DEFAULT 'active',
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        created_by INTEGER,
+        FOREIGN KEY (pm_user_id) REFERENCES users (user_id),
+        FOREIGN KEY (created_by) REFERENCES users (user_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS baseline_schedule (
+        activity_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER NOT NULL,
+        activity_name TEXT NOT NULL,
+        planned_start DATE,
+        planned_finish DATE,
+        budgeted_cost REAL,
+        depends_on INTEGER,
+        status TEXT DEFAULT 'Not Started',
+        sort_order INTEGER,
+        FOREIGN KEY (project_id) REFERENCES projects (project_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS activity_log (
+        log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        activity_id INTEGER NOT NULL,
+        event_type TEXT NOT NULL,
+        event_date DATE NOT NULL,
+        recorded_by INTEGER NOT NULL,
+        recorded_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (activity_id) REFERENCES baseline_schedule (activity_id),
+        FOREIGN KEY (recorded_by) REFERENCES users (user_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS expenditure_log (
+        exp_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER NOT NULL,
+        activity_id INTEGER,
+        category TEXT NOT NULL,
+        description TEXT,
+        reference_id TEXT,
+        amount REAL NOT NULL,
+        spend_date DATE NOT NULL,
+        recorded_by INTEGER NOT NULL,
+        recorded_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        approved_by INTEGER,
+        approved_at DATETIME,
+        FOREIGN KEY (project_id) REFERENCES projects (project_id),
+        FOREIGN KEY (activity_id) REFERENCES baseline_schedule (activity_id),
+        FOREIGN KEY (recorded_by) REFERENCES users (user_id),
+        FOREIGN KEY (approved_by) REFERENCES users (user_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS project_assignments (
+        assignment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        assigned_role TEXT, -- 'pm', 'recorder', etc.
+        assigned_by INTEGER,
+        assigned_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (project_id) REFERENCES projects (project_id),
+        FOREIGN KEY (user_id) REFERENCES users (user_id),
+        FOREIGN KEY (assigned_by) REFERENCES users (user_id),
+        UNIQUE(project_id, user_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS audit_log (
+        audit_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        record_id INTEGER NOT NULL,
+        action TEXT NOT NULL,
+        old_value TEXT,
+        new_value TEXT,
+        changed_by INTEGER NOT NULL,
+        changed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (changed_by) REFERENCES users (user_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS risks (
+        risk_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER NOT NULL,
+        date_identified DATE,
+        description TEXT NOT NULL,
+        impact TEXT, -- H/M/L
+        status TEXT DEFAULT 'Open',
+        mitigation_action TEXT,
+        recorded_by INTEGER,
+        recorded_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (project_id) REFERENCES projects (project_id),
+        FOREIGN KEY (recorded_by) REFERENCES users (user_id)
+    )
+    ''',
+]
+
+# Covering indexes for the dashboard access paths (per-project totals,
+# burndown, category split, overdue/PV scans and the activity-log joins).
+DASHBOARD_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_expenditure_project_date ON expenditure_log (project_id, spend_date, amount)",
+    "CREATE INDEX IF NOT EXISTS idx_expenditure_project_category ON expenditure_log (project_id, category, amount)",
+    "CREATE INDEX IF NOT EXISTS idx_schedule_project_status ON baseline_schedule (project_id, status, planned_finish, budgeted_cost)",
+    "CREATE INDEX IF NOT EXISTS idx_schedule_project_start ON baseline_schedule (project_id, planned_start)",
+    "CREATE INDEX IF NOT EXISTS idx_activity_log_activity ON activity_log (activity_id, log_id)",
+    "CREATE INDEX IF NOT EXISTS idx_risks_project ON risks (project_id, date_identified)",
+    "CREATE INDEX IF NOT EXISTS idx_risks_impact_status ON risks (impact, status)",
+    "CREATE INDEX IF NOT EXISTS idx_projects_pm ON projects (pm_user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_assignments_user ON project_assignments (user_id, project_id)",
+    "ANALYZE",
+]
+
+# Per-project totals maintained incrementally by the write helpers in database.py.
+# data_version is bumped on every change and lets callers key caches on it.
+ROLLUP_COLUMNS = [
+    "total_spent", "expenditure_count", "first_spend_date", "last_spend_date",
+    "planned_cost", "earned_value", "activities_total", "activities_active",
+    "activities_complete", "open_high_risks",
+]
+
+# Recomputes ROLLUP_COLUMNS from the raw tables, one row per project
+ROLLUP_SOURCE_SQL = '''
+SELECT p.project_id,
+       COALESCE(e.total_spent, 0) AS total_spent,
+       COALESCE(e.expenditure_count, 0) AS expenditure_count,
+       e.first_spend_date,
+       e.last_spend_date,
+       COALESCE(b.planned_cost, 0) AS planned_cost,
+       COALESCE(b.earned_value, 0) AS earned_value,
+       COALESCE(b.activities_total, 0) AS activities_total,
+       COALESCE(b.activities_active, 0) AS activities_active,
+       COALESCE(b.activities_complete, 0) AS activities_complete,
+       COALESCE(r.open_high_risks, 0) AS open_high_risks
+FROM projects p
+LEFT JOIN (
+    SELECT project_id, SUM(amount) AS total_spent, COUNT(*) AS expenditure_count,
+           MIN(spend_date) AS first_spend_date, MAX(spend_date) AS last_spend_date
+    FROM expenditure_log GROUP BY project_id
+) e ON e.project_id = p.project_id
+LEFT JOIN (
+    SELECT project_id, SUM(budgeted_cost) AS planned_cost,
+           SUM(CASE WHEN status = 'Complete' THEN budgeted_cost ELSE 0 END) AS earned_value,
+           COUNT(*) AS activities_total,
+           SUM(CASE WHEN status = 'Active' THEN 1 ELSE 0 END) AS activities_active,
+           SUM(CASE WHEN status = 'Complete' THEN 1 ELSE 0 END) AS activities_complete
+    FROM baseline_schedule GROUP BY project_id
+) b ON b.project_id = p.project_id
+LEFT JOIN (
+    SELECT project_id, COUNT(*) AS open_high_risks
+    FROM risks WHERE impact = 'H' AND status = 'Open' GROUP BY project_id
+) r ON r.project_id = p.project_id
+'''
+
+PROJECT_ROLLUPS = [
+    '''
+    CREATE TABLE IF NOT EXISTS project_rollups (
+        project_id INTEGER PRIMARY KEY,
+        total_spent REAL NOT NULL DEFAULT 0,
+        expenditure_count INTEGER NOT NULL DEFAULT 0,
+        first_spend_date DATE,
+        last_spend_date DATE,
+        planned_cost REAL NOT NULL DEFAULT 0,
+        earned_value REAL NOT NULL DEFAULT 0,
+        activities_total INTEGER NOT NULL DEFAULT 0,
+        activities_active INTEGER NOT NULL DEFAULT 0,
+        activities_complete INTEGER NOT NULL DEFAULT 0,
+        open_high_risks INTEGER NOT NULL DEFAULT 0,
+        data_version INTEGER NOT NULL DEFAULT 0,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (project_id) REFERENCES projects (project_id)
+    )
+    ''',
+    f"INSERT OR REPLACE INTO project_rollups (project_id, {', '.join(ROLLUP_COLUMNS)}) {ROLLUP_SOURCE_SQL}",
+]
+
+# Many-to-many predecessor edges; baseline_schedule.depends_on keeps the first
+# predecessor for older readers.
+ACTIVITY_DEPENDENCIES = [
+    '''
+    CREATE TABLE IF NOT EXISTS activity_dependencies (
+        activity_id INTEGER NOT NULL,
+        predecessor_id INTEGER NOT NULL,
+        PRIMARY KEY (activity_id, predecessor_id),
+        FOREIGN KEY (activity_id) REFERENCES baseline_schedule (activity_id),
+        FOREIGN KEY (predecessor_id) REFERENCES baseline_schedule (activity_id)
+    ) WITHOUT ROWID
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_dependencies_predecessor ON activity_dependencies (predecessor_id)",
+    '''
+    INSERT OR IGNORE INTO activity_dependencies (activity_id, predecessor_id)
+    SELECT activity_id, depends_on FROM baseline_schedule WHERE depends_on IS NOT NULL
+    ''',
+]
+
+# Pre-aggregated spend per (project, granularity, bucket_start, category),
+# maintained by the expenditure write helpers in database.py. Buckets start on
+# the day itself, the Monday of the week, or the first of the month.
+SPEND_GRANULARITIES = {
+    'day': "date({col})",
+    'week': "date({col}, '-6 days', 'weekday 1')",
+    'month': "strftime('%Y-%m-01', {col})",
+}
+
+
+def spend_bucket_sql(granularity, col='spend_date'):
+    """SQL expression for the bucket_start of `col`; unparseable dates are kept as-is."""
+    return f"COALESCE({SPEND_GRANULARITIES[granularity].format(col=col)}, {col})"
+
+
+SPEND_BUCKETS_SOURCE_SQL = " UNION ALL ".join(
+    f'''
+    SELECT project_id, '{g}' AS granularity, {spend_bucket_sql(g)} AS bucket_start, category,
+           SUM(amount) AS amount, COUNT(*) AS entries
+    FROM expenditure_log {{where}} GROUP BY project_id, bucket_start, category
+    '''
+    for g in SPEND_GRANULARITIES
+)
+
+SPEND_BUCKETS = [
+    '''
+    CREATE TABLE IF NOT EXISTS spend_buckets (
+        project_id INTEGER NOT NULL,
+        granularity TEXT NOT NULL,
+        bucket_start DATE NOT NULL,
+        category TEXT NOT NULL,
+        amount REAL NOT NULL DEFAULT 0,
+        entries INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (granularity, project_id, bucket_start, category),
+        FOREIGN KEY (project_id) REFERENCES projects (project_id)
+    ) WITHOUT ROWID
+    ''',
+    f"INSERT OR REPLACE INTO spend_buckets (project_id, granularity, bucket_start, category, amount, entries) "
+    f"{SPEND_BUCKETS_SOURCE_SQL.format(where='')}",
+]
+
+# Seek indexes for the paginated log views (database.get_page): each matches
+# one filter prefix followed by the view's sort key.
+LOG_PAGE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_audit_changed ON audit_log (changed_at, audit_id)",
+    "CREATE INDEX IF NOT EXISTS idx_audit_table_changed ON audit_log (table_name, changed_at, audit_id)",
+    "CREATE INDEX IF NOT EXISTS idx_audit_user_changed ON audit_log (changed_by, changed_at, audit_id)",
+    "CREATE INDEX IF NOT EXISTS idx_expenditure_project_id ON expenditure_log (project_id, exp_id)",
+    "CREATE INDEX IF NOT EXISTS idx_expenditure_project_category_id ON expenditure_log (project_id, category, exp_id)",
+]
+
+# Single-row counter bumped by every write that changes who may see what
+# (roles, account status, project ownership and assignments); sessions reload
+# their cached permissions when it moves (auth.get_permissions).
+AUTH_VERSION = [
+    '''
+    CREATE TABLE IF NOT EXISTS auth_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    "INSERT OR IGNORE INTO auth_version (id, version) VALUES (1, 0)",
+]
+
+MIGRATIONS = [
+    (1, "baseline schema", BASELINE_SCHEMA),
+    (2, "dashboard access-path indexes", DASHBOARD_INDEXES),
+    (3, "per-project rollups", PROJECT_ROLLUPS),
+    (4, "multiple activity predecessors", ACTIVITY_DEPENDENCIES),
+    (5, "time-bucketed spend aggregates", SPEND_BUCKETS),
+    (6, "log pagination indexes", LOG_PAGE_INDEXES),
+    (7, "permission version counter", AUTH_VERSION),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _ensure_version_table(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT,
+        applied_at DATETIME
+    )
+    ''')
+    conn.commit()
+
+
+def get_schema_version(conn):
+    _ensure_version_table(conn)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate(conn, target=None):
+    """
+    Applies every pending migration up to `target` (default: latest).
+    Each migration runs in its own transaction; returns the versions applied.
+    """
+    target = LATEST_VERSION if target is None else target
+    current = get_schema_version(conn)
+    applied = []
+
+    for version, description, steps in MIGRATIONS:
+        if version <= current or version > target:
+            continue
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Another process may have migrated while we waited for the lock
+            if conn.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,)).fetchone():
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, datetime.now().isoformat(timespec='seconds'))
+            )
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        applied.append(version)
+
+    return applied
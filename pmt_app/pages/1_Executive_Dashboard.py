@@ -3,11 +3,94 @@ import auth
 import database
 import calculations
 import pandas as pd
+import os
 import styles
+import report_jobs
+import snapshots
+import tracing
 
 # Page Config
 st.set_page_config(page_title="PM Tool - Executive Dashboard", layout="wide")
 
+@st.fragment(run_every=1)
+def portfolio_export_status():
+    """Polls the background portfolio export without rerunning the page."""
+    job_id = st.session_state.get('portfolio_export_job')
+    job = report_jobs.get_job(job_id) if job_id else None
+    if job is None:
+        return
+
+    if job['status'] == 'running':
+        st.progress(job['done'] / max(job['total'], 1), text=f"Generating reports... {job['done']}/{job['total']}")
+    elif job['status'] == 'failed':
+        st.error(f"Portfolio export failed: {job['error']}")
+    else:
+        path = report_jobs.get_export_path(job_id)
+        if path is None:
+            return
+        for project_id, error in job['failed']:
+            st.warning(f"Project {project_id} skipped: {error}")
+        with open(path, 'rb') as f:
+            st.download_button(
+                label=f"📥 Download {job['total'] - len(job['failed'])} Reports",
+                data=f,
+                file_name=os.path.basename(path),
+                mime="application/zip" if path.endswith('.zip') else "application/pdf",
+            )
+
+def historical_portfolio():
+    """Portfolio analytics from the columnar snapshots instead of the live database."""
+    import plotly.express as px
+
+    available = snapshots.list_snapshots()
+    c1, c2 = st.columns([3, 1])
+    with c2:
+        if st.button("📸 Take Snapshot Now", use_container_width=True):
+            with st.spinner("Writing snapshot..."):
+                snapshots.export_snapshot()
+            st.rerun()
+    if not available:
+        st.info("No snapshots yet. Take one now or schedule `python snapshots.py export` nightly.")
+        return
+    with c1:
+        names = [m['name'] for m in available]
+        name = st.selectbox("Snapshot", names, index=len(names) - 1)
+    manifest = next(m for m in available if m['name'] == name)
+    totals = manifest.get('totals', {})
+
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Projects", manifest['tables'].get('projects', 0))
+    m2.metric("Portfolio Value", f"R {totals.get('total_budget', 0)/1e6:.1f}M")
+    m3.metric("Spent to Date", f"R {totals.get('total_spent', 0)/1e6:.1f}M")
+    m4.metric("Critical Risks", totals.get('open_high_risks', 0))
+
+    if len(available) > 1:
+        st.markdown("#### Snapshot History")
+        history = pd.DataFrame([
+            {'snapshot': m['name'], 'spent': m.get('totals', {}).get('total_spent', 0),
+             'budget': m.get('totals', {}).get('total_budget', 0)} for m in available
+        ])
+        tracing.plotly_chart(px.line(history, x='snapshot', y=['budget', 'spent'], markers=True), use_container_width=True)
+
+    h1, h2 = st.columns(2)
+    with h1:
+        st.markdown("#### Spend by Category")
+        cat = snapshots.category_spend(name)
+        tracing.plotly_chart(px.bar(cat, x='category', y='amount'), use_container_width=True)
+    with h2:
+        st.markdown("#### CPI Distribution")
+        cpi = snapshots.cpi_distribution(name).dropna(subset=['cpi'])
+        if cpi.empty:
+            st.info("No project has recorded spend in this snapshot.")
+        else:
+            tracing.plotly_chart(px.histogram(cpi, x='cpi', nbins=20, hover_data=['project_name']), use_container_width=True)
+
+    st.markdown("#### Month-over-Month Spend")
+    monthly = snapshots.monthly_spend(name)
+    if not monthly.empty:
+        fig = px.bar(monthly, x='month', y='amount', hover_data={'mom_change_pct': ':.1f'})
+        tracing.plotly_chart(fig, use_container_width=True)
+
 def exec_dashboard():
     auth.require_role(['executive', 'admin'])
     current_user = auth.get_current_user()
@@ -73,6 +156,11 @@ def exec_dashboard():
         <div class="exec-subtitle">Real-time overview of all active projects and financial performance</div>
     </div>
     """, unsafe_allow_html=True)
+
+    view = st.radio("View", ["Live", "Historical portfolio"], horizontal=True, label_visibility="collapsed")
+    if view == "Historical portfolio":
+        historical_portfolio()
+        return
     
     # 1. Summary Metrics
     summary = calculations.get_all_projects_summary()
@@ -131,6 +219,23 @@ def exec_dashboard():
         </div>
         """, unsafe_allow_html=True)
 
+    # Month-end pack: every (filtered) project's status report in one download
+    with st.expander("📦 Portfolio Report Export"):
+        f1, f2, f3 = st.columns(3)
+        health_filter = f1.multiselect("Budget Health", ["Green", "Yellow", "Red"], default=["Green", "Yellow", "Red"])
+        status_filter = f2.multiselect("Status", sorted(summary['actual_status'].dropna().unique()))
+        export_format = f3.radio("Format", ["ZIP of PDFs", "Single merged PDF"], horizontal=True)
+
+        selected = summary[summary['budget_health'].isin(health_filter)]
+        if status_filter:
+            selected = selected[selected['actual_status'].isin(status_filter)]
+        if st.button(f"Export {len(selected)} Reports", type="primary", disabled=selected.empty):
+            st.session_state['portfolio_export_job'] = report_jobs.submit_portfolio_export(
+                zip(selected['project_id'].astype(int), selected['project_number']),
+                fmt='zip' if export_format == "ZIP of PDFs" else 'pdf',
+            )
+        portfolio_export_status()
+
     st.markdown("### Active Projects")
     
     # 2. Project Cards
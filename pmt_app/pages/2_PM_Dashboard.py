@@ -2,12 +2,15 @@ import streamlit as st
 import auth
 import database
 import calculations
+import pagination
 import pandas as pd
-import plotly.graph_objects as go
 import plotly.express as px
+import plotly.graph_objects as go
 import os
 import styles
-import pdf_generator
+import report_jobs
+import critical_path
+import tracing
 
 # Page Config
 st.set_page_config(
@@ -17,6 +20,51 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Critical activities are hatched in the timelines
+CRITICAL_PATTERNS = {'Critical': '/', 'Has float': ''}
+
+def _with_critical_path(project_id, activities):
+    """Adds total_float (days) and path ('Critical' / 'Has float') from the CPM results."""
+    try:
+        cpm = critical_path.get_critical_path(project_id)
+    except ValueError:  # dependency cycle; show the plain timeline
+        cpm = None
+    if cpm is None or cpm.empty or activities.empty:
+        return activities.assign(total_float=None, path='Has float')
+    activities = activities.merge(cpm[['activity_id', 'total_float', 'is_critical']], on='activity_id', how='left')
+    activities['path'] = activities.pop('is_critical').map({True: 'Critical'}).fillna('Has float')
+    return activities
+
+@st.fragment(run_every=1)
+def report_status(project_id):
+    """Polls the background report job for this project without rerunning the page."""
+    job_id = st.session_state.get('report_job')
+    job = report_jobs.get_job(job_id) if job_id else None
+    if job is None or job['project_id'] != project_id:
+        return
+
+    if job['status'] in ('queued', 'running'):
+        st.info("Generating PDF in the background...")
+    elif job['status'] == 'failed':
+        st.error(f"Failed to generate PDF: {job['error']}")
+    else:
+        pdf_bytes = report_jobs.get_result(job_id)
+        if pdf_bytes is None:
+            st.session_state.pop('report_job', None)
+            return
+        st.download_button(
+            label="📥 Download PDF",
+            data=pdf_bytes,
+            file_name=f"Project_Status_{project_id}.pdf",
+            mime="application/pdf",
+            use_container_width=True
+        )
+        if job['cached']:
+            st.caption("Report is up to date (served from cache).")
+        else:
+            timing = " · ".join(f"{stage} {ms:,.0f} ms" for stage, ms in job['timings'].items())
+            st.caption(f"Report generated: {timing}")
+
 def pm_dashboard():
     auth.require_role(['pm', 'admin', 'executive'])
     
@@ -135,12 +183,8 @@ def pm_dashboard():
     """, unsafe_allow_html=True)
 
     # --- PROJECT SELECTION (RBAC) ---
-    current_user = auth.get_current_user()
-    is_global_role = current_user['role'] in ['admin', 'executive']
-    
-    # Filter projects: PMs only see their own
-    pm_id_filter = None if is_global_role else current_user['id']
-    projects = database.get_projects(pm_id=pm_id_filter)
+    # PMs see the projects they own or are assigned to
+    projects = auth.get_accessible_projects()
     
     if projects.empty:
         st.info("No projects assigned to you found.")
@@ -169,20 +213,8 @@ def pm_dashboard():
         project_id = project_map[selected_project_str]
         st.markdown("### Reports")
         if st.button("Generate PDF Report", use_container_width=True):
-            with st.spinner("Generating PDF..."):
-                try:
-                    pdf_gen = pdf_generator.PDFReportGenerator(project_id)
-                    pdf_bytes = pdf_gen.generate()
-                    st.download_button(
-                        label="📥 Download PDF",
-                        data=pdf_bytes,
-                        file_name=f"Project_Status_{project_id}.pdf",
-                        mime="application/pdf",
-                        use_container_width=True
-                    )
-                    st.success("Report generated!")
-                except Exception as e:
-                    st.error(f"Failed to generate PDF: {e}")
+            st.session_state['report_job'] = report_jobs.submit_report(project_id)
+        report_status(project_id)
     
     # 1. Metrics Calculation
     m = calculations.get_project_metrics(project_id)
@@ -268,7 +300,8 @@ def pm_dashboard():
                               'Active': COLORS['status_active'], 
                               'Complete': COLORS['status_complete']
                           },
-                          hover_data=["planned_start", "planned_finish", "budgeted_cost"])
+                          pattern_shape="path", pattern_shape_map=CRITICAL_PATTERNS,
+                          hover_data=["planned_start", "planned_finish", "budgeted_cost", "total_float"])
         
         fig.update_yaxes(title="") # Default bottom-up will put earliest (last in df) at top
         fig.update_layout(
@@ -282,43 +315,41 @@ def pm_dashboard():
             paper_bgcolor='white',
             xaxis=dict(showgrid=True, gridcolor='#f0f0f0')
         )
-        st.plotly_chart(fig, use_container_width=True)
+        tracing.plotly_chart(fig, use_container_width=True)
 
     @st.dialog("Detailed Financials & Drill-down", width="large")
     def show_full_financials(project_id):
-        # 1. Fetch Granular Data
-        df = database.get_df('''
-            SELECT spend_date, category, amount, reference_id, description 
-            FROM expenditure_log WHERE project_id = ? ORDER BY spend_date DESC
-        ''', (project_id,))
-        
-        if df.empty:
+        # 1. Category totals come from the spend aggregates; transactions are fetched a page at a time
+        cat_totals = calculations.get_category_spending(project_id).rename(columns={'total': 'amount'})
+        if cat_totals.empty:
             st.info("No expenditure recorded for this project yet.")
             return
 
         st.markdown("### Transaction Explorer")
         
         # DRILL-DOWN FILTER
-        categories = ["All"] + sorted(df['category'].unique().tolist())
+        categories = ["All"] + sorted(cat_totals['category'].tolist())
         selected_cat = st.selectbox("Drill-down by Category:", categories)
         
-        filtered_df = df if selected_cat == "All" else df[df['category'] == selected_cat]
+        cat_sum = cat_totals if selected_cat == "All" else cat_totals[cat_totals['category'] == selected_cat]
         
         c1, c2 = st.columns([2, 1])
         with c1:
             st.markdown(f"#### {selected_cat} Transactions")
-            st.dataframe(filtered_df, use_container_width=True, hide_index=True)
+            pagination.paged_dataframe(f'financials_pages_{project_id}', 'expenditure_log', {
+                'project': project_id,
+                'category': None if selected_cat == "All" else selected_cat,
+            })
         
         with c2:
             st.markdown("#### Summary Stats")
-            cat_sum = filtered_df.groupby('category')['amount'].sum().reset_index()
             st.dataframe(cat_sum, use_container_width=True, hide_index=True)
-            st.metric("Total in View", f"R {filtered_df['amount'].sum():,.2f}")
+            st.metric("Total in View", f"R {cat_sum['amount'].sum():,.2f}")
 
         st.divider()
         st.markdown("### Category Distribution")
         
-        overall_cat = df.groupby('category')['amount'].sum().reset_index()
+        overall_cat = cat_totals
         fig_cat = px.bar(overall_cat, x='category', y='amount', 
                         color='category',
                         color_discrete_map={
@@ -335,7 +366,7 @@ def pm_dashboard():
             showlegend=False, height=350, 
             plot_bgcolor='white'
         )
-        st.plotly_chart(fig_cat, use_container_width=True)
+        tracing.plotly_chart(fig_cat, use_container_width=True)
 
     @st.dialog("Milestones Tracker", width="large")
     def show_full_milestones(milestones_df):
@@ -374,7 +405,7 @@ def pm_dashboard():
 
         sched_fig.update_layout(xaxis=dict(range=[-25, 105], visible=False), yaxis=dict(range=[-0.2, 3], visible=False), 
                                 margin=dict(l=0, r=0, t=10, b=10), height=280, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
-        st.plotly_chart(sched_fig, use_container_width=True, config={'displayModeBar': False})
+        tracing.plotly_chart(sched_fig, use_container_width=True, config={'displayModeBar': False})
 
     with r1_col2:
         st.markdown("### Key Metrics")
@@ -426,11 +457,11 @@ def pm_dashboard():
             showlegend=False, 
             bargap=0.3
         )
-        st.plotly_chart(fin_fig, use_container_width=True, config={'displayModeBar': False})
+        tracing.plotly_chart(fin_fig, use_container_width=True, config={'displayModeBar': False})
 
     with r2_col2:
         st.markdown("### Cost Breakdown")
-        exp_df = database.get_df("SELECT category, SUM(amount) as total FROM expenditure_log WHERE project_id = ? GROUP BY category", (project_id,))
+        exp_df = calculations.get_category_spending(project_id)
         if not exp_df.empty:
             # Using Cost Category palette (no-overlap with financials)
             cost_fig = px.pie(exp_df, values='total', names='category', hole=0.7,
@@ -450,7 +481,7 @@ def pm_dashboard():
                 height=240,
                 paper_bgcolor='rgba(0,0,0,0)'
             )
-            st.plotly_chart(cost_fig, use_container_width=True, config={'displayModeBar': False})
+            tracing.plotly_chart(cost_fig, use_container_width=True, config={'displayModeBar': False})
         else:
             st.info("No expenditure recorded.")
 
@@ -466,6 +497,7 @@ def pm_dashboard():
                (CASE WHEN status IN ('Active', 'Complete') THEN 1 ELSE 0 END) as is_started
         FROM baseline_schedule WHERE project_id = ? ORDER BY planned_start
     ''', (project_id,))
+    all_activities = _with_critical_path(project_id, all_activities)
 
     # --- ROW 3: TIMELINE & MILESTONES ---
     r3_col1, r3_col2 = st.columns([1, 1])
@@ -489,6 +521,8 @@ def pm_dashboard():
                                     'Active': COLORS['status_active'],
                                     'Complete': COLORS['status_complete']
                                 },
+                                pattern_shape="path", pattern_shape_map=CRITICAL_PATTERNS,
+                                hover_data=["total_float"],
                                 category_orders={"status_mapped": ["Not Started", "Active", "Complete"]})
             
             tl_fig.update_yaxes(title="") 
@@ -500,7 +534,7 @@ def pm_dashboard():
                 paper_bgcolor='rgba(0,0,0,0)',
                 plot_bgcolor='rgba(0,0,0,0)'
             )
-            st.plotly_chart(tl_fig, use_container_width=True, config={'displayModeBar': False})
+            tracing.plotly_chart(tl_fig, use_container_width=True, config={'displayModeBar': False})
         else:
             st.info("No activities defined.")
 
@@ -531,7 +565,7 @@ def pm_dashboard():
     # --- ROW 4: BUDGET BURNDOWN CHART ---
     st.markdown("### 📉 Budget Burndown")
 
-    bd = calculations.get_burndown_data(project_id)
+    bd = calculations.get_burndown_data(project_id, max_points=calculations.BURNDOWN_MAX_POINTS)
 
     if bd:
         # Status callout
@@ -662,7 +696,7 @@ def pm_dashboard():
             hovermode="x unified",
         )
 
-        st.plotly_chart(bd_fig, use_container_width=True, config={"displayModeBar": False})
+        tracing.plotly_chart(bd_fig, use_container_width=True, config={"displayModeBar": False})
 
         if bd["actual_df"].empty:
             st.info("ℹ️ No expenditure recorded yet — showing the ideal burndown baseline only.")
@@ -5,10 +5,44 @@ import auth
 import database
 import os
 import styles
+import import_jobs
 
 # Page Config
 st.set_page_config(page_title="PM Tool - Project Setup", layout="wide")
 
+IMPORT_STATUS_LABELS = {
+    'queued': "Queued", 'parsing': "Parsing", 'parsed': "Waiting to write",
+    'writing': "Writing", 'done': "Imported", 'failed': "Failed",
+}
+
+@st.fragment(run_every=1)
+def import_status():
+    """Polls the queued workbook imports without rerunning the page."""
+    jobs = [job for job in map(import_jobs.get_job, st.session_state.get('import_jobs', [])) if job]
+    if not jobs:
+        return
+
+    finished = sum(job['status'] in ('done', 'failed') for job in jobs)
+    st.progress(finished / len(jobs), text=f"{finished}/{len(jobs)} workbooks processed")
+    st.dataframe(
+        pd.DataFrame([{
+            'File': job['file_name'],
+            'Status': IMPORT_STATUS_LABELS.get(job['status'], job['status']),
+            'Progress': job['progress'],
+            'Rows': job['rows_total'],
+            'Rows/sec': job['rows_per_sec'],
+            'Project ID': job['project_id'],
+            'Error': job['error'],
+        } for job in jobs]),
+        column_config={
+            'Progress': st.column_config.ProgressColumn("Progress", min_value=0.0, max_value=1.0),
+            'Rows/sec': st.column_config.NumberColumn("Rows/sec", format="%.0f"),
+            'Project ID': st.column_config.NumberColumn("Project ID", format="%d"),
+        },
+        hide_index=True,
+        use_container_width=True,
+    )
+
 def project_setup_page():
     auth.require_role(['pm', 'admin'])
     styles.global_css()
@@ -108,7 +142,7 @@ def project_setup_page():
                                 'planned_start': row['planned_start'].strftime('%Y-%m-%d') if hasattr(row['planned_start'], 'strftime') else row['planned_start'],
                                 'planned_finish': row['planned_finish'].strftime('%Y-%m-%d') if hasattr(row['planned_finish'], 'strftime') else row['planned_finish'],
                                 'budgeted_cost': row['budgeted_cost']
-                            })
+                            }, creator_id)
                         
                         st.success(f"Project and Plan Created Successfully! ID: {project_id}")
                         st.balloons()
@@ -132,17 +166,21 @@ def project_setup_page():
 
         st.info("Fill out the downloaded template before uploading below.")
         
-        uploaded_file = st.file_uploader("Upload Project Excel", type=["xlsx"])
+        uploaded_files = st.file_uploader("Upload Project Excel", type=["xlsx"], accept_multiple_files=True)
         
-        if uploaded_file:
-            import importer
-            if st.button("Start Import"):
-                try:
-                    with st.spinner("Processing Excel..."):
-                        project_id = importer.import_project(uploaded_file, auth.get_current_user()['id'])
-                        st.success(f"Project Imported Successfully! ID: {project_id}")
-                except Exception as e:
-                    st.error(f"Import Failed: {e}")
+        if uploaded_files:
+            if st.button(f"Start Import ({len(uploaded_files)} file{'s' if len(uploaded_files) > 1 else ''})"):
+                # Each workbook is parsed in a worker process and written by one background writer
+                user_id = auth.get_current_user()['id']
+                job_ids = []
+                for uploaded_file in uploaded_files:
+                    try:
+                        job_ids.append(import_jobs.submit_import(uploaded_file.name, uploaded_file.getvalue(), user_id))
+                    except Exception as e:
+                        st.error(f"Import Failed: {uploaded_file.name}: {e}")
+                st.session_state['import_jobs'] = job_ids
+
+        import_status()
 
 if __name__ == "__main__":
     project_setup_page()
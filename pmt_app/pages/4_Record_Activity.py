@@ -1,13 +1,23 @@
 import streamlit as st
 import auth
 import database
+import pagination
 import pandas as pd
 from datetime import datetime
 import styles
+import schedule_graph
 
 # Page Config
 st.set_page_config(page_title="PM Tool - Record Activity", layout="wide")
 
+def _graph_ok(graph):
+    try:
+        graph.topological_order()
+        return True
+    except schedule_graph.CycleError as e:
+        st.error(str(e))
+        return False
+
 def record_activity_page():
     auth.require_role(['recorder', 'pm', 'admin'])
     styles.global_css()
@@ -15,10 +25,7 @@ def record_activity_page():
     st.markdown("Update the current progress of project phases. *Strict dependency rules apply.*")
     
     # 1. Fetch Projects (RBAC)
-    current_user = auth.get_current_user()
-    is_global_role = current_user['role'] in ['admin', 'executive', 'recorder']
-    pm_id_filter = None if is_global_role else current_user['id']
-    projects = database.get_projects(pm_id=pm_id_filter)
+    projects = auth.get_accessible_projects(global_roles=('admin', 'executive', 'recorder'))
     
     if projects.empty:
         st.info("No projects assigned to you found.")
@@ -38,8 +45,24 @@ def record_activity_page():
         st.warning("⚠️ This project has no schedule activities defined.")
         st.stop()
         
+    graph = schedule_graph.load_graph(project_id)
+
     st.divider()
-    
+
+    with st.expander("Bulk Status Update"):
+        names = {a: graph.name(a) for a in graph.topological_order()} if _graph_ok(graph) else {}
+        bulk_ids = st.multiselect("Activities", options=list(names.keys()), format_func=lambda x: names[x])
+        bulk_target = st.selectbox("New Status", ["Complete", "Active", "Not Started"])
+        if st.button("Apply to Selected", disabled=not bulk_ids):
+            success, msg = database.update_activity_statuses(
+                {a: bulk_target for a in bulk_ids}, auth.get_current_user()['id']
+            )
+            if success:
+                st.success(msg)
+                st.rerun()
+            else:
+                st.error(msg)
+
     st.divider()
 
     st.subheader("Current Operational Status")
@@ -54,6 +77,9 @@ def record_activity_page():
             with c1:
                 st.markdown(f"**{row['activity_name']}**")
                 st.caption(f"Planned: {row['planned_start'].strftime('%d %b')} - {row['planned_finish']}")
+                preds = graph.predecessors.get(row['activity_id'], ())
+                if preds:
+                    st.caption("After: " + ", ".join(graph.name(p) for p in preds))
             
             with c2:
                 # Color code status
@@ -86,16 +112,8 @@ def record_activity_page():
 
     # 4. View Audit Log (Optional/Hidden in expander)
     with st.expander("View Activity Audit Log (History)"):
-        logs = database.get_df('''
-            SELECT al.event_type, al.event_date, bs.activity_name, u.full_name as recorded_by
-            FROM activity_log al
-            JOIN baseline_schedule bs ON al.activity_id = bs.activity_id
-            JOIN users u ON al.recorded_by = u.user_id
-            WHERE bs.project_id = ?
-            ORDER BY al.log_id DESC
-        ''', (project_id,))
-        if not logs.empty:
-            st.dataframe(logs, use_container_width=True)
+        pagination.paged_dataframe('activity_log_pages', 'activity_log', {'project': project_id},
+                                   empty_message="No activity updates have been logged for this project.")
 
 if __name__ == "__main__":
     record_activity_page()
@@ -1,6 +1,7 @@
 import streamlit as st
 import auth
 import database
+import pagination
 import pandas as pd
 from datetime import datetime
 import styles
@@ -14,10 +15,7 @@ def record_exp_page():
     st.title("Record Project Expenditure")
     
     # 1. Fetch Projects (RBAC)
-    current_user = auth.get_current_user()
-    is_global_role = current_user['role'] in ['admin', 'executive', 'recorder']
-    pm_id_filter = None if is_global_role else current_user['id']
-    projects = database.get_projects(pm_id=pm_id_filter)
+    projects = auth.get_accessible_projects(global_roles=('admin', 'executive', 'recorder'))
     
     if projects.empty:
         st.info("No projects assigned to you found.")
@@ -84,19 +82,9 @@ def record_exp_page():
     total_val = current_exps['total'].iloc[0] if not current_exps.empty and current_exps['total'].iloc[0] else 0.0
     st.metric(label="Total Recorded Expenditure (Current Project)", value=f"R {total_val:,.2f}")
 
-    st.subheader("Full Transaction History (This Project)")
-    exps = database.get_df('''
-        SELECT el.spend_date, el.category, el.amount, el.reference_id, u.full_name as recorded_by
-        FROM expenditure_log el
-        JOIN users u ON el.recorded_by = u.user_id
-        WHERE el.project_id = ?
-        ORDER BY el.exp_id DESC
-    ''', (project_id,))
-    
-    if not exps.empty:
-        st.dataframe(exps, use_container_width=True)
-    else:
-        st.info("No expenditures have been recorded yet for this project.")
+    st.subheader("Transaction History (This Project)")
+    pagination.paged_dataframe('expenditure_pages', 'expenditure_log', {'project': project_id},
+                               empty_message="No expenditures have been recorded yet for this project.")
 
 if __name__ == "__main__":
     record_exp_page()
@@ -16,9 +16,7 @@ def risk_register_page():
     
     # 1. Fetch Projects (RBAC)
     current_user = auth.get_current_user()
-    is_global_role = current_user['role'] in ['admin', 'executive', 'recorder']
-    pm_id_filter = None if is_global_role else current_user['id']
-    projects = database.get_projects(pm_id=pm_id_filter)
+    projects = auth.get_accessible_projects(global_roles=('admin', 'executive', 'recorder'))
     
     if projects.empty:
         st.info("No projects assigned to you found.")
@@ -1,6 +1,8 @@
 import streamlit as st
 import auth
 import database
+import login_service
+import pagination
 import pandas as pd
 import styles
 
@@ -28,13 +30,11 @@ def admin_panel():
             new_name = st.text_input("Full Name")
             
             if st.form_submit_button("Add User"):
-                from werkzeug.security import generate_password_hash
                 try:
-                    database.execute_query(
-                        "INSERT INTO users (username, password_hash, role, full_name) VALUES (?, ?, ?, ?)",
-                        (new_user, generate_password_hash(new_pass), new_role, new_name),
-                        commit=True
-                    )
+                    database.create_user({
+                        'username': new_user, 'password_hash': login_service.hash_password(new_pass),
+                        'role': new_role, 'full_name': new_name,
+                    }, auth.get_current_user()['id'])
                     st.success(f"User {new_user} created.")
                     st.rerun()
                 except Exception as e:
@@ -42,13 +42,21 @@ def admin_panel():
 
     with t2:
         st.subheader("System Audit Log")
-        logs = database.get_df('''
-            SELECT al.*, u.username 
-            FROM audit_log al 
-            LEFT JOIN users u ON al.changed_by = u.user_id 
-            ORDER BY changed_at DESC
-        ''')
-        st.dataframe(logs, use_container_width=True)
+        users = database.get_df("SELECT user_id, username FROM users ORDER BY username")
+        user_names = dict(zip(users['user_id'], users['username']))
+        tables = database.get_df("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")
+
+        f1, f2, f3 = st.columns(3)
+        table = f1.selectbox("Table", ["All"] + tables['name'].tolist())
+        user_id = f2.selectbox("Changed By", [None] + list(user_names), format_func=lambda u: "All" if u is None else user_names[u])
+        dates = f3.date_input("Date Range", value=(), help="Leave empty for all dates")
+
+        pagination.paged_dataframe('audit_log_pages', 'audit_log', {
+            'table': None if table == "All" else table,
+            'user': user_id,
+            'date_from': dates[0] if len(dates) > 0 else None,
+            'date_to': dates[1] if len(dates) > 1 else None,
+        }, empty_message="No audit entries match these filters.")
 
 if __name__ == "__main__":
     admin_panel()
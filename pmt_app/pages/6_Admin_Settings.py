@@ -1,5 +1,6 @@
 import streamlit as st
 import database
+import query_cache
 import auth
 import styles
 import pandas as pd
@@ -30,10 +31,10 @@ def admin_settings_page():
                     c1, c2, c3 = st.columns([3, 1, 1])
                     c1.markdown(f"**{u['full_name']}** (@{u['username']}) - {u['role'].upper()}")
                     if c2.button("Approve", key=f"app_{u['user_id']}", type="primary", use_container_width=True):
-                        database.update_user_status(u['user_id'], 'approved')
+                        database.update_user_status(u['user_id'], 'approved', auth.get_current_user()['id'])
                         st.success("Approved!"); st.rerun()
                     if c3.button("Reject", key=f"rej_{u['user_id']}", use_container_width=True):
-                        database.delete_user(u['user_id'])
+                        database.delete_user(u['user_id'], auth.get_current_user()['id'])
                         st.rerun()
         else:
             st.success("No pending approvals.")
@@ -71,7 +72,7 @@ def admin_settings_page():
                     if u['username'] == auth.get_current_user()['username'] and new_role != 'admin':
                          st.toast("⚠️ You cannot revoke your own admin rights!", icon="⚠️")
                     else:
-                        database.update_user_role(u['user_id'], new_role)
+                        database.update_user_role(u['user_id'], new_role, auth.get_current_user()['id'])
                         st.toast(f"Updated role for {u['username']}"); st.rerun()
                 
                 c3.markdown(f"`{u['status'].upper()}`")
@@ -81,7 +82,7 @@ def admin_settings_page():
                     if u['username'] == 'admin':
                         st.error("Root Admin protected.")
                     else:
-                        database.delete_user(u['user_id'])
+                        database.delete_user(u['user_id'], auth.get_current_user()['id'])
                         st.warning(f"Deleted {u['username']}")
                         st.rerun()
                 st.divider()
@@ -142,10 +143,8 @@ def admin_settings_page():
                                 default=valid_defaults)
                                 
         if st.button("Update Project Team"):
-            # Update logic: Clear old team, set new team
-            database.execute_query("DELETE FROM project_assignments WHERE project_id = ? AND assigned_role != 'pm'", (p_id,), commit=True)
-            for uid in new_team:
-                database.assign_user_to_project(p_id, uid, 'recorder', auth.get_current_user()['id'])
+            # Update logic: Clear old team, set new team (one unit of work)
+            database.set_project_team(p_id, new_team, auth.get_current_user()['id'])
             st.success("Team assignments updated!")
             st.rerun()
 
@@ -157,5 +156,15 @@ def admin_settings_page():
         else:
             st.info("No system logs recorded yet.")
 
+        st.subheader("Query Cache")
+        stats = query_cache.get_stats()
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Hit Rate", f"{stats['hit_rate']:.0%}")
+        c2.metric("Hits / Misses", f"{stats['hits']} / {stats['misses']}")
+        c3.metric("Entries", stats['entries'])
+        c4.metric("Memory", f"{stats['bytes'] / 1024:.0f} KB")
+        if st.button("Clear Cache"):
+            query_cache.clear(); st.rerun()
+
 if __name__ == "__main__":
     admin_settings_page()
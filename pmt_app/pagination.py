@@ -0,0 +1,49 @@
+"""
+Page-at-a-time tables over database.PAGED_VIEWS.
+
+paged_dataframe() shows one page of a log view with Newer/Older buttons. The
+cursor of every page visited is kept in session_state, so moving back is a
+pop and moving forward is one keyset query; the cursors reset whenever the
+filters change.
+"""
+import math
+
+import streamlit as st
+
+import database
+
+
+def _older(key, cursor):
+    st.session_state[key]['cursors'].append(cursor)
+
+
+def _newer(key):
+    st.session_state[key]['cursors'].pop()
+
+
+def paged_dataframe(key, view, filters=None, page_size=database.PAGE_SIZE, empty_message="No records found."):
+    """Renders the current page of `view` under widget key `key` and returns it as a DataFrame."""
+    filters = {k: v for k, v in (filters or {}).items() if v is not None and v != ''}
+    state = st.session_state.setdefault(key, {'filters': filters, 'cursors': [None]})
+    if state['filters'] != filters:
+        state['filters'], state['cursors'] = filters, [None]
+
+    cursors = state['cursors']
+    df, next_cursor = database.get_page(view, filters, cursors[-1], page_size)
+    if df.empty and len(cursors) == 1:
+        st.info(empty_message)
+        return df
+
+    st.dataframe(df, use_container_width=True, hide_index=True)
+
+    total, exact = database.estimate_count(view, filters)
+    page = len(cursors)
+    pages = max(page, math.ceil(total / page_size))
+    approx = '' if exact else '~'
+    c1, c2, c3 = st.columns([1, 1, 4])
+    c1.button("← Newer", key=f"{key}_newer", disabled=page == 1,
+              on_click=_newer, args=(key,), use_container_width=True)
+    c2.button("Older →", key=f"{key}_older", disabled=next_cursor is None,
+              on_click=_older, args=(key, next_cursor), use_container_width=True)
+    c3.caption(f"Page {page} of {approx}{pages:,} · {approx}{total:,} records")
+    return df
@@ -1,10 +1,9 @@
 import io
 import os
+import time
+from contextlib import contextmanager
 import pandas as pd
 from datetime import datetime
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-import seaborn as sns
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -15,11 +14,13 @@ from reportlab.platypus import (
 from reportlab.lib.units import inch, mm
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT, TA_JUSTIFY
 import calculations
+import charts
+import critical_path
 import database
+import tracing
 
-# Set plotting style for cleaner, flatter look
-plt.style.use('seaborn-v0_8-whitegrid')
-sns.set_palette("deep")
+# 'pdf' embeds charts as vector graphics; 'png' rasterizes them at charts.RASTER_DPI
+CHART_FORMAT = 'pdf'
 
 # --- BRAND COLORS ---
 PRIMARY_HEX = '#2c5aa0'
@@ -41,11 +42,29 @@ LIGHT_BG = colors.HexColor(LIGHT_BG_HEX)
 GRAY_LINE = colors.HexColor(GRAY_LINE_HEX)
 
 class PDFReportGenerator:
+    # Paragraph styles are read-only once built, so every report in the process shares them
+    _stylesheet = None
+
     def __init__(self, project_id):
         self.project_id = project_id
-        self.metrics = calculations.get_project_metrics(project_id)
-        self.styles = getSampleStyleSheet()
-        self._create_custom_styles()
+        self.timings = {}  # stage -> milliseconds, filled as the report is built
+        with self._stage('metrics'):
+            self.metrics = calculations.get_project_metrics(project_id)
+        if PDFReportGenerator._stylesheet is None:
+            self.styles = getSampleStyleSheet()
+            self._create_custom_styles()
+            PDFReportGenerator._stylesheet = self.styles
+        self.styles = PDFReportGenerator._stylesheet
+
+    @contextmanager
+    def _stage(self, name):
+        """Adds the wall time of the block to self.timings[name]."""
+        t0 = time.perf_counter()
+        try:
+            with tracing.span('report', f"pdf {name}", project_id=self.project_id):
+                yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + (time.perf_counter() - t0) * 1000
         
     def _create_custom_styles(self):
         """Create custom paragraph styles for the report"""
@@ -191,93 +210,27 @@ class PDFReportGenerator:
         
         canvas.restoreState()
 
-    def _create_financial_chart(self):
-        """Create a Bar chart for Financial Overview (High Res)"""
-        plt.figure(figsize=(6, 3))
-        
-        categories = ['Budget', 'Forecast', 'Actual']
-        values = [
-            self.metrics['total_budget'], 
-            self.metrics['forecast'], 
-            self.metrics['total_spent']
-        ]
-        
-        # Clean minimalist bars
-        bars = plt.bar(categories, values, color=[PRIMARY_HEX, '#7c3aed', '#0891b2'], 
-                      width=0.5, edgecolor='none')
-        
-        # Remove frames
-        ax = plt.gca()
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
-        ax.spines['left'].set_visible(False)
-        ax.spines['bottom'].set_color('#dddddd')
-        
-        # Grid lines
-        ax.yaxis.grid(True, linestyle='--', color='#eeeeee')
-        ax.xaxis.grid(False)
-        
-        # Add values on top
-        for bar in bars:
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height + (max(values)*0.02),
-                    f'R {height/1000:.0f}k',
-                    ha='center', va='bottom', fontsize=10, fontweight='bold', color='#444')
-            
-        plt.title('Financial Performance', loc='left', fontsize=12, pad=20, color='#444')
-        plt.tick_params(left=False, bottom=False, labelleft=False, labelcolor='#666')
-        
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', dpi=300, bbox_inches='tight', transparent=True)
-        plt.close()
-        return buf
+    def _create_financial_chart(self, width, height):
+        """Bar chart for Financial Overview"""
+        data = charts.financial_chart(
+            float(self.metrics['total_budget']), float(self.metrics['forecast']),
+            float(self.metrics['total_spent']), fmt=CHART_FORMAT
+        )
+        return charts.flowable(data, CHART_FORMAT, width, height)
 
-    def _create_cost_breakdown_chart(self):
-        """Create a Donut chart for Cost Breakdown (High Res)"""
+    def _create_cost_breakdown_chart(self, width, height):
+        """Donut chart for Cost Breakdown"""
         exp_df = calculations.get_category_spending(self.project_id)
-        
-        plt.figure(figsize=(5, 3))
-        
-        if not exp_df.empty:
-            colors_palette = sns.color_palette("mako", n_colors=len(exp_df))
-            wedges, texts, autotexts = plt.pie(exp_df['total'], labels=exp_df['category'], autopct='%1.0f%%', 
-                   startangle=90, pctdistance=0.85, colors=colors_palette,
-                   wedgeprops=dict(width=0.4, edgecolor='white'))
-            
-            plt.setp(autotexts, size=9, weight="bold", color="white")
-            plt.setp(texts, size=9, color="#444")
-            
-            plt.title('Cost Distribution', loc='center', fontsize=12, pad=10, color='#444')
-        else:
-            plt.text(0.5, 0.5, 'No Data', ha='center', va='center')
-            plt.axis('off')
-            
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', dpi=300, bbox_inches='tight', transparent=True)
-        plt.close()
-        return buf
+        exp_df = exp_df[exp_df['total'] > 0]  # a pie can't show net-zero or credit categories
+        data = charts.cost_breakdown_chart(
+            tuple(exp_df['category']), tuple(float(t) for t in exp_df['total']), fmt=CHART_FORMAT
+        )
+        return charts.flowable(data, CHART_FORMAT, width, height)
 
-    def _create_progress_chart(self):
-        """Create a Sleek Progress Bar"""
-        plt.figure(figsize=(7, 1))
-        
-        progress = self.metrics['pct_complete']
-        
-        # Background
-        plt.barh([0], [100], color='#f1f3f5', height=0.6, edgecolor='none', align='center')
-        # Progress
-        plt.barh([0], [progress], color=SUCCESS_HEX, height=0.6, edgecolor='none', align='center')
-        
-        plt.xlim(0, 100)
-        plt.axis('off')
-        
-        # Add text inside
-        plt.text(1, 0, f"{progress:.1f}% Complete", va='center', ha='left', fontsize=11, fontweight='bold', color='white' if progress > 15 else '#444')
-        
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', dpi=300, bbox_inches='tight', transparent=True)
-        plt.close()
-        return buf
+    def _create_progress_chart(self, width, height):
+        """Sleek Progress Bar"""
+        data = charts.progress_chart(round(float(self.metrics['pct_complete']), 1), fmt=CHART_FORMAT)
+        return charts.flowable(data, CHART_FORMAT, width, height)
 
     def generate(self):
         buffer = io.BytesIO()
@@ -337,7 +290,8 @@ class PDFReportGenerator:
             [f"{self.metrics['budget_used_pct']:.0f}%", self.metrics['schedule_health'], "Checking..."]
         ]
         
-        risks_df = database.get_project_risks(self.project_id)
+        with self._stage('queries'):
+            risks_df = database.get_project_risks(self.project_id)
         open_risks = len(risks_df[risks_df['status'] == 'Open']) if not risks_df.empty else 0
         stats_data[1][2] = str(open_risks)
         
@@ -380,7 +334,8 @@ class PDFReportGenerator:
         
         # Progress Bar
         elements_exec.append(Paragraph("Overall Progress", ParagraphStyle('SubHeader', parent=self.styles['Heading3'], fontSize=11, textColor=colors.gray)))
-        elements_exec.append(Image(self._create_progress_chart(), width=7*inch, height=0.5*inch))
+        with self._stage('charts'):
+            elements_exec.append(self._create_progress_chart(7*inch, 0.5*inch))
         elements_exec.append(Spacer(1, 25))
         
         story.append(KeepTogether(elements_exec))
@@ -390,8 +345,9 @@ class PDFReportGenerator:
         elements_fin.append(Paragraph("Financial Performance", self.styles['SectionHeader']))
         
         # Charts Side-by-Side
-        fin_chart = Image(self._create_financial_chart(), width=3.4*inch, height=2.2*inch)
-        cost_chart = Image(self._create_cost_breakdown_chart(), width=3.4*inch, height=2.2*inch)
+        with self._stage('charts'):
+            fin_chart = self._create_financial_chart(3.4*inch, 2.2*inch)
+            cost_chart = self._create_cost_breakdown_chart(3.4*inch, 2.2*inch)
         
         charts_table = Table([[fin_chart, cost_chart]], colWidths=[3.5*inch, 3.5*inch])
         charts_table.setStyle(TableStyle([('ALIGN', (0,0), (-1,-1), 'CENTER'), ('VALIGN', (0,0), (-1,-1), 'TOP')]))
@@ -439,7 +395,7 @@ class PDFReportGenerator:
                     Paragraph(row['description'], self.styles['Normal']),
                     row['impact'],
                     row['status'],
-                    Paragraph(row['mitigation_action'] or '-', self.styles['Normal'])
+                    Paragraph(row['mitigation_action'] if pd.notna(row['mitigation_action']) else '-', self.styles['Normal'])
                 ])
             
             t_risks = Table(risk_data, colWidths=[0.5*inch, 2.2*inch, 0.8*inch, 1*inch, 2.5*inch])
@@ -468,24 +424,39 @@ class PDFReportGenerator:
         elements_ms = []
         elements_ms.append(Paragraph("Key Milestones", self.styles['SectionHeader']))
         
-        baseline = database.get_baseline_schedule(self.project_id)
+        with self._stage('queries'):
+            baseline = database.get_baseline_schedule(self.project_id)
+            try:
+                cpm = critical_path.get_critical_path(self.project_id)
+                float_days = dict(zip(cpm['activity_id'], cpm['total_float']))
+            except ValueError:  # dependency cycle
+                float_days = {}
         if not baseline.empty:
-            ms_data = [['ACTIVITY', 'START DATE', 'END DATE', 'STATUS']]
+            ms_data = [['ACTIVITY', 'START DATE', 'END DATE', 'FLOAT', 'STATUS']]
+            critical_rows = []
             for idx, row in baseline.head(8).iterrows():
                 status = row['status']
                 status_color = colors.black
                 if status == 'Complete': status_color = SUCCESS_COLOR
                 elif status == 'Active': status_color = PRIMARY_COLOR
+
+                slack = float_days.get(row['activity_id'])
+                name = row['activity_name']
+                if slack is not None and slack <= 0:
+                    critical_rows.append(len(ms_data))
+                    name = f"<font color='{DANGER_COLOR.hexval()}'><b>{name}</b></font>"
                 
                 ms_data.append([
-                    Paragraph(row['activity_name'], self.styles['Normal']),
+                    Paragraph(name, self.styles['Normal']),
                     row['planned_start'],
                     row['planned_finish'],
+                    "Critical" if slack is not None and slack <= 0 else (f"{slack}d" if slack is not None else "-"),
                     Paragraph(f"<font color='{status_color.hexval()}'>{status}</font>", self.styles['Normal'])
                 ])
                 
-            t_ms = Table(ms_data, colWidths=[3*inch, 1.2*inch, 1.2*inch, 1.5*inch])
+            t_ms = Table(ms_data, colWidths=[2.6*inch, 1.1*inch, 1.1*inch, 0.8*inch, 1.3*inch])
             t_ms.setStyle(TableStyle([
+                *[('BACKGROUND', (0, r), (-1, r), colors.HexColor('#fdecea')) for r in critical_rows],
                 ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
                 ('FONTSIZE', (0,0), (-1,0), 8),
                 ('TEXTCOLOR', (0,0), (-1,0), colors.gray),
@@ -499,6 +470,7 @@ class PDFReportGenerator:
         
         story.append(KeepTogether(elements_ms))
 
-        doc.build(story)
+        with self._stage('build'):
+            doc.build(story)
         buffer.seek(0)
         return buffer
@@ -0,0 +1,278 @@
+"""
+Portfolio PDF export: one status report per project, rendered across a
+process pool and written into a single ZIP or merged PDF.
+
+Workers render each report to a temporary file and only the file path travels
+back; the parent appends finished reports to the output in project order and
+deletes them. At most WINDOW_PER_WORKER reports per worker are in flight, so
+peak memory does not grow with the number of projects.
+
+Usage (from pmt_app/):
+    python portfolio_export.py --out month_end.zip
+    python portfolio_export.py --out month_end.pdf --format pdf --status active
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import database
+
+logger = logging.getLogger(__name__)
+
+EXPORT_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+WINDOW_PER_WORKER = 2
+FORMATS = ('zip', 'pdf')
+
+
+# =============================================================================
+# WORKER
+# =============================================================================
+def _init_worker(db_path):
+    """Runs once per worker: matplotlib, reportlab and the report styles are set up here and reused."""
+    global pdf_generator
+    import pdf_generator
+
+    database.DB_PATH = db_path
+    database.query_cache.ENABLED = False
+
+
+def _render_to_file(project_id, out_dir):
+    """Builds one report on disk and returns (project_id, path, stage timings)."""
+    with database.get_connection():
+        generator = pdf_generator.PDFReportGenerator(project_id)
+        if not generator.metrics:
+            raise ValueError(f"Project {project_id} not found.")
+        path = os.path.join(out_dir, f"{project_id}.pdf")
+        with open(path, 'wb') as f:
+            shutil.copyfileobj(generator.generate(), f)
+    return project_id, path, generator.timings
+
+
+# =============================================================================
+# MERGED PDF WRITER
+# =============================================================================
+class PdfConcatenator:
+    """
+    Appends the pages of finished PDFs to one output file as they arrive.
+    pdfrw's PdfWriter keeps every page in memory until write(); here each
+    input's objects are serialized immediately and only the byte offsets and
+    page object numbers are kept.
+    """
+    CATALOG, PAGES = 1, 2
+    INHERITABLE = ('/Resources', '/MediaBox', '/CropBox', '/Rotate')
+
+    def __init__(self, f):
+        self.f = f
+        self.pos = 0
+        self.offsets = {}
+        self.kids = []
+        self.next_num = 3
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data):
+        self.f.write(data)
+        self.pos += len(data)
+
+    def _write_obj(self, num, body):
+        self.offsets[num] = self.pos
+        self._write(f"{num} 0 obj\n{body}\nendobj\n".encode('latin-1'))
+
+    def add(self, path):
+        """Appends every page of the PDF at `path`; returns the number of pages added."""
+        from pdfrw import PdfReader, PdfDict, PdfArray, PdfName, PdfObject
+
+        pages_ref = PdfObject(f"{self.PAGES} 0 R")
+        numbers = {}   # id(indirect object) -> object number, per input file
+        deferred = []
+
+        def ref(obj):
+            if isinstance(obj, PdfDict):
+                indirect = obj.indirect or obj.stream is not None
+                if obj.Type in (PdfName.Catalog, PdfName.Pages):
+                    return 'null'  # only the new page tree may be referenced
+            else:
+                indirect = getattr(obj, 'indirect', False)
+            if not indirect:
+                return fmt(obj)
+            num = numbers.get(id(obj))
+            if num is None:
+                num = numbers[id(obj)] = self.next_num
+                self.next_num += 1
+                deferred.append((num, obj))
+            return f"{num} 0 R"
+
+        def fmt(obj):
+            if obj is None:
+                return 'null'
+            if isinstance(obj, PdfDict):
+                items = [f"{key} {ref(value)}" for key, value in obj.iteritems() if key != '/Length']
+                if obj.stream is not None:
+                    stream = obj.stream
+                    items.append(f"/Length {len(stream.encode('latin-1'))}")
+                    return f"<<{' '.join(items)}>>\nstream\n{stream}\nendstream"
+                return f"<<{' '.join(items)}>>"
+            if isinstance(obj, PdfArray):
+                return f"[{' '.join(ref(x) for x in obj)}]"
+            if isinstance(obj, float):
+                return ('%.6f' % obj).rstrip('0').rstrip('.')
+            return str(getattr(obj, 'encoded', None) or obj)
+
+        pages = PdfReader(path).pages
+        for page in pages:
+            inherited = page.inheritable
+            for name in self.INHERITABLE:
+                if page[name] is None and inherited[name] is not None:
+                    page[name] = inherited[name]
+            page.Parent = pages_ref
+            page.indirect = True
+            self.kids.append(ref(page))
+            while deferred:
+                num, obj = deferred.pop()
+                self._write_obj(num, fmt(obj))
+        return len(pages)
+
+    def close(self):
+        self._write_obj(self.CATALOG, f"<</Type /Catalog /Pages {self.PAGES} 0 R>>")
+        self._write_obj(self.PAGES, f"<</Type /Pages /Count {len(self.kids)} /Kids [{' '.join(self.kids)}]>>")
+        xref_at = self.pos
+        size = self.next_num
+        lines = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        lines += [f"{self.offsets.get(num, 0):010d} 00000 n \n" for num in range(1, size)]
+        lines.append(f"trailer\n<</Size {size} /Root {self.CATALOG} 0 R>>\nstartxref\n{xref_at}\n%%EOF\n")
+        self._write(''.join(lines).encode('latin-1'))
+
+
+# =============================================================================
+# EXPORT
+# =============================================================================
+def select_projects(project_ids=None, status=None, pm_user_id=None):
+    """Project ids to export, in project-number order, optionally filtered."""
+    clauses, params = [], []
+    if project_ids is not None:
+        ids = [int(pid) for pid in project_ids]
+        clauses.append(f"project_id IN ({','.join('?' * len(ids)) or 'NULL'})")
+        params += ids
+    if status:
+        clauses.append("status = ?")
+        params.append(status)
+    if pm_user_id:
+        clauses.append("pm_user_id = ?")
+        params.append(pm_user_id)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = database.execute_query(f"SELECT project_id, project_number FROM projects {where} ORDER BY project_number", params)
+    return [(r['project_id'], r['project_number']) for r in rows]
+
+
+def _archive_name(project_number, project_id):
+    safe = "".join(c if c.isalnum() or c in '-_' else '_' for c in str(project_number))
+    return f"Project_Status_{safe or project_id}.pdf"
+
+
+def export_portfolio(output, projects=None, fmt='zip', workers=None, progress=None):
+    """
+    Writes the reports for `projects` (list of (project_id, project_number), default:
+    every project) to `output` (a path or binary file object) as a ZIP of PDFs or one
+    merged PDF. progress(done, total) is called after each project.
+    Returns a summary dict; a failing project is reported and skipped.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {FORMATS}.")
+    projects = select_projects() if projects is None else list(projects)
+    workers = workers or EXPORT_WORKERS
+    numbers = dict(projects)
+    summary = {'projects': len(projects), 'written': 0, 'pages': 0, 'failed': [], 'timings': {}}
+    t0 = time.perf_counter()
+
+    own_file = isinstance(output, (str, os.PathLike))
+    f = open(output, 'wb') if own_file else output
+    work_dir = tempfile.mkdtemp(prefix='pmt_export_')
+    if fmt == 'zip':
+        archive = zipfile.ZipFile(f, 'w', compression=zipfile.ZIP_DEFLATED)
+    else:
+        archive = PdfConcatenator(f)
+
+    def consume(project_id, future):
+        try:
+            _, path, timings = future.result()
+        except Exception as e:
+            logger.error(f"Portfolio export: project {project_id} failed: {e}")
+            summary['failed'].append((project_id, str(e)))
+            return
+        try:
+            if fmt == 'zip':
+                archive.write(path, _archive_name(numbers[project_id], project_id))
+            else:
+                summary['pages'] += archive.add(path)
+        finally:
+            os.remove(path)
+        summary['written'] += 1
+        for stage, ms in timings.items():
+            summary['timings'][stage] = summary['timings'].get(stage, 0.0) + ms
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(database.DB_PATH,),
+        ) as pool:
+            in_flight = deque()
+            done = 0
+            for project_id, _ in projects:
+                in_flight.append((project_id, pool.submit(_render_to_file, project_id, work_dir)))
+                if len(in_flight) >= workers * WINDOW_PER_WORKER:
+                    consume(*in_flight.popleft())
+                    done += 1
+                    if progress:
+                        progress(done, len(projects))
+            while in_flight:
+                consume(*in_flight.popleft())
+                done += 1
+                if progress:
+                    progress(done, len(projects))
+    finally:
+        archive.close()
+        if own_file:
+            f.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    summary['seconds'] = time.perf_counter() - t0
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export PDF status reports for the project portfolio")
+    parser.add_argument('--out', required=True, help="Output file (.zip or .pdf)")
+    parser.add_argument('--format', choices=FORMATS, help="Defaults to the --out extension")
+    parser.add_argument('--projects', type=int, nargs='*', help="Project ids (default: all)")
+    parser.add_argument('--status', help="Only projects with this status, e.g. active")
+    parser.add_argument('--pm', type=int, help="Only projects managed by this user id")
+    parser.add_argument('--workers', type=int, default=EXPORT_WORKERS)
+    parser.add_argument('--db', help="Database file (default: pm_tool.db)")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        database.DB_PATH = os.path.abspath(args.db)
+    fmt = args.format or ('pdf' if args.out.lower().endswith('.pdf') else 'zip')
+    projects = select_projects(args.projects, args.status, args.pm)
+
+    def progress(done, total):
+        print(f"\r{done}/{total} reports", end='', flush=True)
+
+    summary = export_portfolio(args.out, projects, fmt=fmt, workers=args.workers, progress=progress)
+    print(f"\nWrote {summary['written']} of {summary['projects']} reports to {args.out} in {summary['seconds']:.1f}s")
+    for project_id, error in summary['failed']:
+        print(f"  project {project_id} failed: {error}")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""
+Process-wide cache for read queries and derived calculations.
+
+Streamlit re-runs a page script on every widget interaction, so the same
+queries are issued again and again between writes. Entries are tagged with the
+tables they were read from and evicted when database.py reports a write to any
+of those tables. The cache is shared by every session in the process and is
+bounded in both entry count and (approximate) memory.
+"""
+import copy
+import re
+import sys
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+
+import metrics
+
+MAX_ENTRIES = 512
+MAX_BYTES = 64 * 1024 * 1024
+ENABLED = True
+
+_lock = threading.RLock()
+_entries = OrderedDict()          # key -> (value, tables, size)
+_keys_by_table = {}               # table -> set of keys
+_generation = {}                  # table -> write counter
+_epoch = 0                        # bumped by clear()
+_bytes = 0
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'rejected': 0}
+
+_TABLE_RE = re.compile(r'\b(?:FROM|JOIN)\s+([A-Za-z_]\w*)', re.IGNORECASE)
+_WRITE_RE = re.compile(
+    r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+([A-Za-z_]\w*)',
+    re.IGNORECASE
+)
+
+
+def tables_read(sql):
+    """Tables referenced by FROM/JOIN clauses of a SELECT."""
+    return frozenset(t.lower() for t in _TABLE_RE.findall(sql))
+
+
+def table_written(sql):
+    """Target table of an INSERT/UPDATE/DELETE, or None for reads and DDL."""
+    match = _WRITE_RE.match(sql)
+    return match.group(1).lower() if match else None
+
+
+def _is_frame(value):
+    # Checked by name so importing this module does not load pandas
+    return type(value).__name__ == 'DataFrame' and hasattr(value, 'memory_usage')
+
+
+def _sizeof(value):
+    if _is_frame(value):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def _copy(value):
+    # Callers routinely add columns to the frames they get back
+    if _is_frame(value):
+        return value.copy()
+    return copy.deepcopy(value)
+
+
+def snapshot(tables):
+    """Write counters for `tables`; pass to put() so results read before a write are not stored after it."""
+    with _lock:
+        return (_epoch,) + tuple(_generation.get(t, 0) for t in sorted(tables))
+
+
+def get(key):
+    """Returns (True, value) on a hit, (False, None) on a miss."""
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            _stats['misses'] += 1
+            return False, None
+        _entries.move_to_end(key)
+        _stats['hits'] += 1
+        value = entry[0]
+    return True, _copy(value)
+
+
+def put(key, value, tables, generation=None):
+    global _bytes
+    tables = frozenset(tables)
+    value = _copy(value)
+    size = _sizeof(value)
+    if size > MAX_BYTES:
+        return
+    with _lock:
+        if generation is not None and generation != snapshot(tables):
+            _stats['rejected'] += 1
+            return
+        _remove(key)
+        _entries[key] = (value, tables, size)
+        _bytes += size
+        for table in tables:
+            _keys_by_table.setdefault(table, set()).add(key)
+        while len(_entries) > MAX_ENTRIES or _bytes > MAX_BYTES:
+            _remove(next(iter(_entries)))
+            _stats['evictions'] += 1
+
+
+def _remove(key):
+    global _bytes
+    entry = _entries.pop(key, None)
+    if entry is None:
+        return
+    _bytes -= entry[2]
+    for table in entry[1]:
+        keys = _keys_by_table.get(table)
+        if keys is not None:
+            keys.discard(key)
+
+
+def invalidate(tables):
+    """Drops every entry that read from any of `tables`."""
+    with _lock:
+        for table in tables:
+            table = table.lower()
+            _generation[table] = _generation.get(table, 0) + 1
+            for key in list(_keys_by_table.pop(table, ())):
+                _remove(key)
+                _stats['invalidations'] += 1
+
+
+def clear():
+    global _bytes, _epoch
+    with _lock:
+        _epoch += 1
+        _entries.clear()
+        _keys_by_table.clear()
+        _bytes = 0
+
+
+def reset_stats():
+    with _lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def get_stats():
+    with _lock:
+        stats = dict(_stats)
+        stats['entries'] = len(_entries)
+        stats['bytes'] = _bytes
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+
+@metrics.register_collector
+def _collect_metrics():
+    stats = get_stats()
+    return [
+        ('pmt_query_cache_lookups_total', 'counter', "Query cache lookups by result",
+         [({'result': 'hit'}, stats['hits']), ({'result': 'miss'}, stats['misses'])]),
+        ('pmt_query_cache_hit_ratio', 'gauge', "Query cache hits / lookups since start", [({}, stats['hit_rate'])]),
+        ('pmt_query_cache_removals_total', 'counter', "Query cache entries removed by reason",
+         [({'reason': k}, stats[k]) for k in ('evictions', 'invalidations', 'rejected')]),
+        ('pmt_query_cache_entries', 'gauge', "Entries in the query cache", [({}, stats['entries'])]),
+        ('pmt_query_cache_bytes', 'gauge', "Approximate size of the query cache", [({}, stats['bytes'])]),
+    ]
+
+
+def _freeze(value):
+    """Hashable form of list/dict arguments for cache keys."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def cached(*tables):
+    """
+    Memoizes a read-only function of hashable arguments until one of `tables`
+    is written. Keys include today's date because several calculations
+    compare against it.
+    """
+    tables = frozenset(t.lower() for t in tables)
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            import database  # database uses cached() at import time, so not at module top
+
+            if not ENABLED or database.in_transaction():
+                return func(*args, **kwargs)
+            key = (database.DB_PATH, func.__module__, func.__qualname__,
+                   _freeze(args), _freeze(kwargs), date.today())
+            hit, value = get(key)
+            if hit:
+                return value
+            generation = snapshot(tables)
+            value = func(*args, **kwargs)
+            put(key, value, tables, generation)
+            return value
+        wrapper.uncached = func
+        return wrapper
+    return decorator
@@ -0,0 +1,249 @@
+"""
+Background PDF report generation.
+
+submit_report() hands the work to a small process pool and returns a job id
+straight away; pages poll get_job() until it is done. Finished PDFs are kept
+keyed by (database, project id, project data_version, dependency edges, date)
+so an unchanged project serves its cached bytes without starting a job at all.
+Portfolio exports (portfolio_export.py) run as jobs too and report their progress.
+"""
+import itertools
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import database
+import metrics
+
+logger = logging.getLogger(__name__)
+
+REPORT_WORKERS = 2
+MAX_CACHED_REPORTS = 32
+MAX_FINISHED_JOBS = 200
+
+_lock = threading.Lock()
+_executor = None
+_job_ids = itertools.count(1)
+_jobs = OrderedDict()      # job_id -> job dict
+_pending = {}              # report key -> job_id of the queued/running job
+_reports = OrderedDict()   # report key -> (pdf bytes, timings)
+
+_pdf_seconds = metrics.histogram('pmt_pdf_generation_seconds', "Time a worker spent building one project report")
+_pdf_queue_seconds = metrics.histogram('pmt_pdf_queue_seconds', "Time a report job waited for a worker")
+_report_jobs = metrics.counter('pmt_report_jobs_total', "Report requests by outcome", ('outcome',))
+
+
+def _render_report(db_path, project_id):
+    """Runs in a worker process: builds the PDF and returns (bytes, stage timings in ms)."""
+    import database
+    import pdf_generator
+
+    database.DB_PATH = db_path
+    # Writes happen in the app process, so this process can never see invalidations
+    database.query_cache.ENABLED = False
+    t0 = time.perf_counter()
+    with database.get_connection():  # one pooled connection for every stage
+        generator = pdf_generator.PDFReportGenerator(project_id)
+        if not generator.metrics:
+            raise ValueError(f"Project {project_id} not found.")
+        pdf = generator.generate().getvalue()
+    timings = dict(generator.timings)
+    timings['total'] = (time.perf_counter() - t0) * 1000
+    return pdf, timings
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # spawn: forking a process that runs Streamlit's threads is unsafe
+            _executor = ProcessPoolExecutor(
+                max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+
+def shutdown(wait=True):
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+def report_key(project_id):
+    # The FLOAT column comes from the critical path, so edges are part of the key
+    # alongside data_version (which dependency edits bump as well)
+    return (database.DB_PATH, int(project_id), database.get_project_data_version(project_id),
+            database.get_dependency_fingerprint(project_id), date.today())
+
+
+def get_cached_report(project_id):
+    """PDF bytes for the project's current data, or None if it has to be generated."""
+    key = report_key(project_id)
+    with _lock:
+        entry = _reports.get(key)
+        if entry is None:
+            return None
+        _reports.move_to_end(key)
+        return entry[0]
+
+
+def _new_job(key, status, kind='project'):
+    job = {
+        'job_id': next(_job_ids),
+        'kind': kind,               # project | portfolio
+        'project_id': key[1] if key else None,
+        'data_version': key[2] if key else None,
+        'status': status,           # queued | running | done | failed
+        'submitted_at': time.time(),
+        'finished_at': None,
+        'cached': False,
+        'error': None,
+        'timings': {},
+        'queue_ms': None,
+        '_key': key,
+    }
+    _jobs[job['job_id']] = job
+    while len(_jobs) > MAX_FINISHED_JOBS:
+        oldest = next(iter(_jobs.values()))
+        if oldest['status'] in ('queued', 'running'):
+            break
+        _jobs.popitem(last=False)
+        if oldest.get('_path'):
+            shutil.rmtree(os.path.dirname(oldest['_path']), ignore_errors=True)
+    return job
+
+
+def submit_report(project_id):
+    """
+    Queues a report for the project and returns its job id. If the PDF for the
+    project's current data version is cached the job is already done; if the same
+    report is being generated the existing job id is returned.
+    """
+    key = report_key(project_id)
+    with _lock:
+        if key in _reports:
+            _reports.move_to_end(key)
+            job = _new_job(key, 'done')
+            job.update(cached=True, finished_at=job['submitted_at'], timings=dict(_reports[key][1]))
+            _report_jobs.inc(outcome='cached')
+            return job['job_id']
+        if key in _pending:
+            return _pending[key]
+        job = _new_job(key, 'queued')
+        _pending[key] = job['job_id']
+
+    try:
+        future = _get_executor().submit(_render_report, key[0], key[1])
+    except Exception as e:
+        # e.g. a worker died and broke the pool; start a fresh one next time
+        shutdown(wait=False)
+        with _lock:
+            _pending.pop(key, None)
+            job.update(status='failed', error=str(e), finished_at=time.time())
+        return job['job_id']
+    with _lock:
+        if job['status'] == 'queued':
+            job['status'] = 'running'
+    future.add_done_callback(lambda f: _finish(key, job, f))
+    return job['job_id']
+
+
+def _finish(key, job, future):
+    finished = time.time()
+    with _lock:
+        _pending.pop(key, None)
+        job['finished_at'] = finished
+        try:
+            pdf, timings = future.result()
+        except Exception as e:
+            job['status'] = 'failed'
+            job['error'] = str(e)
+            _report_jobs.inc(outcome='failed')
+            logger.error(f"Report job {job['job_id']} for project {job['project_id']} failed: {e}")
+            return
+        _reports[key] = (pdf, timings)
+        while len(_reports) > MAX_CACHED_REPORTS:
+            _reports.popitem(last=False)
+        job['status'] = 'done'
+        job['timings'] = dict(timings)
+        # Time spent waiting for a worker (includes worker start-up on first use)
+        job['queue_ms'] = max(0.0, (finished - job['submitted_at']) * 1000 - timings['total'])
+    _report_jobs.inc(outcome='generated')
+    _pdf_seconds.observe(timings['total'] / 1000)
+    _pdf_queue_seconds.observe(job['queue_ms'] / 1000)
+    logger.info(f"Report job {job['job_id']} for project {job['project_id']}: {timings}")
+
+
+def get_job(job_id):
+    """Snapshot of the job's state, or None for an unknown id."""
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        snapshot = {k: v for k, v in job.items() if not k.startswith('_')}
+        snapshot['timings'] = dict(job['timings'])
+        return snapshot
+
+
+def get_result(job_id):
+    """PDF bytes of a finished job, or None if it is not (or no longer) available."""
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None or job['status'] != 'done':
+            return None
+        entry = _reports.get(job['_key'])
+        return entry[0] if entry else None
+
+
+def submit_portfolio_export(projects, fmt='zip'):
+    """
+    Starts portfolio_export.export_portfolio for `projects` ((project_id, project_number)
+    pairs) on a background thread and returns a job id. The job reports progress as
+    'done'/'total'; get_export_path() gives the finished file.
+    """
+    import portfolio_export
+
+    projects = list(projects)
+    out_dir = tempfile.mkdtemp(prefix='pmt_portfolio_')
+    path = os.path.join(out_dir, f"Portfolio_Reports_{date.today():%Y%m%d}.{fmt}")
+    with _lock:
+        job = _new_job(None, 'running', kind='portfolio')
+        job.update(done=0, total=len(projects), failed=[], _path=path)
+
+    def progress(done, total):
+        with _lock:
+            job['done'] = done
+
+    def run():
+        try:
+            summary = portfolio_export.export_portfolio(path, projects, fmt=fmt, progress=progress)
+        except Exception as e:
+            logger.error(f"Portfolio export job {job['job_id']} failed: {e}")
+            shutil.rmtree(out_dir, ignore_errors=True)
+            with _lock:
+                job.update(status='failed', error=str(e), finished_at=time.time())
+            return
+        with _lock:
+            job.update(status='done', finished_at=time.time(), failed=summary['failed'],
+                       timings=summary['timings'])
+
+    threading.Thread(target=run, name=f"portfolio-export-{job['job_id']}", daemon=True).start()
+    return job['job_id']
+
+
+def get_export_path(job_id):
+    """Output file of a finished portfolio export, or None."""
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None or job['kind'] != 'portfolio' or job['status'] != 'done':
+            return None
+        return job['_path']
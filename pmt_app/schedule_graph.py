@@ -0,0 +1,143 @@
+"""
+In-memory activity dependency graph for a project.
+
+The whole graph (activities, statuses and every predecessor edge from
+activity_dependencies) is loaded with one query and cached until the schedule
+or its dependencies are written. Status changes, single or bulk ("complete
+these 20 activities"), are validated against the graph in one topological
+pass before database.update_activity_statuses applies them in one batch.
+"""
+from collections import deque
+
+import database
+import query_cache
+
+PROGRESS_STATUSES = ('Active', 'Complete')
+
+_GRAPH_SQL = '''
+SELECT a.activity_id, a.project_id, a.activity_name, a.status, a.budgeted_cost,
+       a.planned_start, a.planned_finish, a.sort_order, d.predecessor_id
+FROM baseline_schedule a
+LEFT JOIN activity_dependencies d ON d.activity_id = a.activity_id
+WHERE {where}
+ORDER BY a.project_id, a.activity_id
+'''
+
+
+class CycleError(ValueError):
+    """The dependencies of a project contain a cycle."""
+
+
+class DependencyGraph:
+    """
+    Activities of one or more projects and their predecessor edges.
+    Read-only once built: cached instances are shared rather than copied.
+    """
+
+    def __init__(self, rows):
+        self.activities = {}    # activity_id -> dict of the activity's columns
+        self.predecessors = {}  # activity_id -> tuple of predecessor ids
+        self.successors = {}    # activity_id -> tuple of successor ids
+        preds, succs = {}, {}
+        keys = rows[0].keys()[:-1] if rows else []  # predecessor_id is the last column
+        for row in rows:
+            act_id, pred_id = row[0], row[-1]
+            if act_id not in self.activities:
+                self.activities[act_id] = dict(zip(keys, row))
+                preds[act_id] = []
+            if pred_id is not None:
+                preds[act_id].append(pred_id)
+                succs.setdefault(pred_id, []).append(act_id)
+        self.predecessors = {a: tuple(p) for a, p in preds.items()}
+        self.successors = {a: tuple(succs.get(a, ())) for a in self.activities}
+        self._order = None
+
+    def __deepcopy__(self, memo):
+        # query_cache copies values on every hit; the graph is never mutated
+        return self
+
+    def __sizeof__(self):
+        return 200 * len(self.activities) + 60 * sum(len(p) for p in self.predecessors.values())
+
+    def __len__(self):
+        return len(self.activities)
+
+    def __contains__(self, activity_id):
+        return activity_id in self.activities
+
+    def name(self, activity_id):
+        act = self.activities.get(activity_id)
+        return act['activity_name'] if act else f"#{activity_id}"
+
+    def topological_order(self):
+        """Activity ids with every predecessor before its successors; raises CycleError."""
+        if self._order is None:
+            remaining = {a: sum(1 for p in preds if p in self.activities) for a, preds in self.predecessors.items()}
+            ready = deque(a for a, n in remaining.items() if n == 0)
+            order = []
+            while ready:
+                act_id = ready.popleft()
+                order.append(act_id)
+                for succ in self.successors[act_id]:
+                    remaining[succ] -= 1
+                    if remaining[succ] == 0:
+                        ready.append(succ)
+            if len(order) != len(self.activities):
+                stuck = sorted(a for a, n in remaining.items() if n > 0)
+                raise CycleError(f"Dependency cycle between activities: {', '.join(self.name(a) for a in stuck[:5])}.")
+            self._order = tuple(order)
+        return self._order
+
+    def validate_transitions(self, changes):
+        """
+        Checks {activity_id: new_status} against the whole graph. An activity may
+        only become Active or Complete when every predecessor is Complete after
+        the change, so a predecessor completed in the same batch counts.
+        Returns (changes in topological order as (activity_id, old, new), errors).
+        """
+        errors = [f"Activity {a} not found." for a in changes if a not in self.activities]
+        if errors:
+            return [], errors
+        try:
+            order = self.topological_order()
+        except CycleError as e:
+            return [], [str(e)]
+
+        def final_status(act_id):
+            return changes.get(act_id, self.activities[act_id]['status'])
+
+        ordered = []
+        for act_id in order:
+            new_status = changes.get(act_id)
+            if new_status is None:
+                continue
+            old_status = self.activities[act_id]['status']
+            if new_status in PROGRESS_STATUSES:
+                blocked = [p for p in self.predecessors[act_id]
+                           if p in self.activities and final_status(p) != 'Complete']
+                if blocked:
+                    names = "', '".join(self.name(p) for p in blocked)
+                    errors.append(f"Cannot progress '{self.name(act_id)}'. Predecessor '{names}' must be 'Complete' first.")
+                    continue
+            if new_status != old_status:
+                ordered.append((act_id, old_status, new_status))
+        return ordered, errors
+
+
+def _load(where, params):
+    with database.get_connection() as conn:
+        rows = conn.execute(_GRAPH_SQL.format(where=where), params).fetchall()
+    return DependencyGraph(rows)
+
+
+@query_cache.cached('baseline_schedule', 'activity_dependencies')
+def load_graph(project_id):
+    """The project's dependency graph (one query, cached until the schedule changes)."""
+    return _load("a.project_id = ?", (int(project_id),))
+
+
+def load_graph_for_activities(activity_ids):
+    """Graph of every project the activities belong to, in one query (uncached; used inside writes)."""
+    ids = [int(a) for a in activity_ids]
+    marks = ','.join('?' * len(ids)) or 'NULL'
+    return _load(f"a.project_id IN (SELECT project_id FROM baseline_schedule WHERE activity_id IN ({marks}))", ids)
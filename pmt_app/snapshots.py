@@ -0,0 +1,225 @@
+"""
+Columnar portfolio snapshots.
+
+export_snapshot() copies projects, baseline_schedule, expenditure_log and risks
+from one consistent read of the database into Arrow IPC files, one directory
+per snapshot date. The files are memory-mapped when read, so load() only
+touches the columns a question needs and numeric columns reach pandas without
+a copy. The Executive Dashboard's historical mode and the analytics helpers at
+the bottom of this module read from snapshots, never from SQLite.
+
+Run nightly (e.g. from cron) or on demand, from pmt_app/:
+    python snapshots.py export
+    python snapshots.py list
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+from functools import lru_cache
+
+import database
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.environ.get(
+    'PMT_SNAPSHOT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshots')
+)
+TABLES = ('projects', 'baseline_schedule', 'expenditure_log', 'risks')
+BATCH_ROWS = 64 * 1024
+MANIFEST = 'manifest.json'
+
+
+def _arrow_schema(conn, table):
+    """Arrow schema from the SQLite declared column types; DATE columns become date32."""
+    import pyarrow as pa
+
+    types = {'INTEGER': pa.int64(), 'REAL': pa.float64(), 'DATE': pa.date32()}
+    fields = []
+    for col in conn.execute(f"PRAGMA table_info({table})"):
+        fields.append(pa.field(col['name'], types.get((col['type'] or '').upper(), pa.string())))
+    return pa.schema(fields)
+
+
+def _record_batch(rows, schema):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    arrays = []
+    for i, field in enumerate(schema):
+        values = [r[i] for r in rows]
+        if pa.types.is_date32(field.type):
+            # 'YYYY-MM-DD' prefix; anything that does not parse becomes null
+            text = pc.utf8_slice_codeunits(pa.array([None if v is None else str(v) for v in values], pa.string()), 0, 10)
+            stamps = pc.strptime(text, format='%Y-%m-%d', unit='s', error_is_null=True)
+            arrays.append(pc.cast(stamps, pa.date32()))
+        elif pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            try:
+                arrays.append(pa.array(values, field.type))
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # SQLite does not enforce column types; keep the column, drop odd values
+                arrays.append(pa.array([v if isinstance(v, (int, float)) else None for v in values], field.type))
+        else:
+            arrays.append(pa.array([None if v is None else str(v) for v in values], pa.string()))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def export_snapshot(name=None, snapshot_dir=None):
+    """
+    Writes the four tables as <snapshot_dir>/<name>/<table>.arrow (name defaults to
+    today's date; an existing snapshot of that name is replaced) and returns the
+    snapshot's manifest. All tables are read inside one read transaction.
+    """
+    import pyarrow as pa
+
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    name = name or datetime.now().strftime('%Y-%m-%d')
+    os.makedirs(snapshot_dir, exist_ok=True)
+    work = tempfile.mkdtemp(prefix=f'.{name}.', dir=snapshot_dir)
+    manifest = {'name': name, 'created_at': datetime.now().isoformat(timespec='seconds'), 'tables': {}}
+    try:
+        with database.get_connection() as conn:
+            conn.execute("BEGIN")  # deferred: a stable read snapshot without taking the write lock
+            try:
+                for table in TABLES:
+                    schema = _arrow_schema(conn, table)
+                    cursor = conn.execute(f"SELECT {', '.join(schema.names)} FROM {table}")
+                    rows = 0
+                    with pa.OSFile(os.path.join(work, f'{table}.arrow'), 'wb') as sink:
+                        with pa.ipc.new_file(sink, schema) as writer:
+                            while True:
+                                batch = cursor.fetchmany(BATCH_ROWS)
+                                if not batch:
+                                    break
+                                writer.write_batch(_record_batch(batch, schema))
+                                rows += len(batch)
+                    manifest['tables'][table] = rows
+                totals = conn.execute('''
+                    SELECT (SELECT COALESCE(SUM(total_budget), 0) FROM projects) AS total_budget,
+                           (SELECT COALESCE(SUM(amount), 0) FROM expenditure_log) AS total_spent,
+                           (SELECT COUNT(*) FROM risks WHERE impact = 'H' AND status = 'Open') AS open_high_risks
+                ''').fetchone()
+                manifest['totals'] = dict(totals)
+            finally:
+                conn.rollback()
+
+        with open(os.path.join(work, MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1)
+        target = os.path.join(snapshot_dir, name)
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        os.replace(work, target)
+    except BaseException:
+        shutil.rmtree(work, ignore_errors=True)
+        raise
+    _open_table.cache_clear()
+    logger.info(f"Snapshot {name}: {manifest['tables']}")
+    return manifest
+
+
+def list_snapshots(snapshot_dir=None):
+    """Manifests of the available snapshots, oldest first."""
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    if not os.path.isdir(snapshot_dir):
+        return []
+    manifests = []
+    for name in sorted(os.listdir(snapshot_dir)):
+        path = os.path.join(snapshot_dir, name, MANIFEST)
+        if name.startswith('.') or not os.path.isfile(path):
+            continue
+        with open(path, encoding='utf-8') as f:
+            manifests.append(json.load(f))
+    return manifests
+
+
+@lru_cache(maxsize=32)
+def _open_table(path, mtime):
+    import pyarrow as pa
+
+    # The mapping stays open for as long as the table (or frames built from it) is alive
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def load_table(table, columns=None, snapshot=None, snapshot_dir=None):
+    """Arrow table of a snapshot (default: the latest) restricted to `columns`."""
+    if table not in TABLES:
+        raise ValueError(f"Unknown snapshot table '{table}', expected one of {TABLES}.")
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    if snapshot is None:
+        available = list_snapshots(snapshot_dir)
+        if not available:
+            raise FileNotFoundError(f"No snapshots in {snapshot_dir}; run `python snapshots.py export`.")
+        snapshot = available[-1]['name']
+    path = os.path.join(snapshot_dir, snapshot, f'{table}.arrow')
+    data = _open_table(path, os.path.getmtime(path))
+    return data.select(list(columns)) if columns else data
+
+
+def load(table, columns=None, snapshot=None, snapshot_dir=None):
+    """
+    DataFrame of `columns` from a snapshot table. Numeric columns without nulls
+    are zero-copy views of the mapped file; dates arrive as datetime64.
+    """
+    data = load_table(table, columns, snapshot, snapshot_dir)
+    return data.to_pandas(split_blocks=True, date_as_object=False)
+
+
+# =============================================================================
+# PORTFOLIO ANALYTICS (snapshot-backed)
+# =============================================================================
+def category_spend(snapshot=None):
+    """Spend per category across all projects."""
+    spend = load('expenditure_log', ['category', 'amount'], snapshot)
+    return spend.groupby('category', as_index=False)['amount'].sum().sort_values('amount', ascending=False)
+
+
+def monthly_spend(snapshot=None):
+    """Portfolio spend per month with the month-over-month change in percent."""
+    spend = load('expenditure_log', ['spend_date', 'amount'], snapshot).dropna(subset=['spend_date'])
+    monthly = spend.groupby(spend['spend_date'].dt.to_period('M'))['amount'].sum()
+    result = monthly.rename('amount').reset_index().rename(columns={'spend_date': 'month'})
+    result['month'] = result['month'].dt.to_timestamp()
+    result['mom_change_pct'] = result['amount'].pct_change() * 100
+    return result
+
+
+def cpi_distribution(snapshot=None):
+    """Per-project cost performance index (earned value / actual cost) as of the snapshot."""
+    import pandas as pd
+
+    projects = load('projects', ['project_id', 'project_name', 'total_budget'], snapshot)
+    schedule = load('baseline_schedule', ['project_id', 'budgeted_cost', 'status'], snapshot)
+    spend = load('expenditure_log', ['project_id', 'amount'], snapshot)
+
+    earned = schedule[schedule['status'] == 'Complete'].groupby('project_id')['budgeted_cost'].sum().rename('earned_value')
+    actual = spend.groupby('project_id')['amount'].sum().rename('actual_cost')
+    df = projects.set_index('project_id').join([earned, actual]).fillna({'earned_value': 0.0, 'actual_cost': 0.0})
+    df['cpi'] = (df['earned_value'] / df['actual_cost']).where(df['actual_cost'] > 0)
+    return df.reset_index()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar portfolio snapshots")
+    parser.add_argument('command', choices=['export', 'list'])
+    parser.add_argument('--name', help="Snapshot name (default: today's date)")
+    parser.add_argument('--dir', help=f"Snapshot directory (default: {SNAPSHOT_DIR})")
+    parser.add_argument('--db', help="Database file (default: pm_tool.db)")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        database.DB_PATH = os.path.abspath(args.db)
+    if args.command == 'export':
+        manifest = export_snapshot(args.name, args.dir)
+        print(f"Snapshot {manifest['name']}: " + ", ".join(f"{t} {n} rows" for t, n in manifest['tables'].items()))
+    else:
+        for m in list_snapshots(args.dir):
+            print(f"{m['name']:<20}{m['created_at']:<22}" + " ".join(f"{t}={n}" for t, n in m['tables'].items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
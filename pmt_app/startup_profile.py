@@ -0,0 +1,154 @@
+"""
+Startup / first-render profiling.
+
+Enabled with PMT_PROFILE_STARTUP=1. While enabled, every top-level import is
+timed and the first render of each page in a session is recorded: script time
+until the page finished its first run (time-to-first-paint as far as the
+server can see it) plus the modules that page had to import. One JSON line per
+render is appended to PMT_PROFILE_FILE (default: startup_profile.jsonl next to
+this file), tagged with PMT_DEPLOY_ID or the git revision, so cold-start
+numbers can be compared deploy to deploy:
+
+    PMT_PROFILE_STARTUP=1 streamlit run main.py
+    python startup_profile.py            # per-deploy, per-page summary
+"""
+import builtins
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+ENABLED = os.environ.get('PMT_PROFILE_STARTUP', '') not in ('', '0')
+PROFILE_FILE = os.environ.get(
+    'PMT_PROFILE_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup_profile.jsonl')
+)
+
+_original_import = builtins.__import__
+_local = threading.local()
+_write_lock = threading.Lock()
+_process_start = time.perf_counter()
+_installed = False
+_deploy_id = None
+_pages_seen = set()      # pages rendered at least once in this process
+_startup_imports = []    # imports made before the first page ran
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    # Only the outermost import of a module not loaded yet is timed, so the
+    # figure for e.g. plotly.express includes everything it pulls in.
+    if level != 0 or name in sys.modules or getattr(_local, 'depth', 0):
+        return _original_import(name, globals, locals, fromlist, level)
+    _local.depth = 1
+    t0 = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _local.depth = 0
+        record = getattr(_local, 'imports', None)
+        if record is None:
+            record = _startup_imports
+        record.append((name, (time.perf_counter() - t0) * 1000))
+
+
+def install():
+    """Starts timing imports when profiling is enabled; call before other app imports."""
+    global _installed, _deploy_id
+    if not ENABLED or _installed:
+        return
+    _installed = True
+    _deploy_id = os.environ.get('PMT_DEPLOY_ID') or _git_revision()
+    builtins.__import__ = _timed_import
+
+
+def _git_revision():
+    try:
+        out = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, timeout=5
+        )
+        return out.stdout.strip() or 'unknown'
+    except (OSError, subprocess.SubprocessError):
+        return 'unknown'
+
+
+def _append(entry):
+    line = json.dumps(entry)
+    with _write_lock:
+        with open(PROFILE_FILE, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+@contextmanager
+def page_run(page, session_state):
+    """
+    Wraps a page's script run. The first run of each page per session is
+    written to the profile; later reruns are not.
+    """
+    seen = session_state.setdefault('_profiled_pages', set()) if ENABLED else None
+    if not ENABLED or page in seen:
+        yield
+        return
+
+    _local.imports = []
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - t0) * 1000
+        imports, _local.imports = _local.imports, None
+        seen.add(page)
+
+        cold = page not in _pages_seen
+        _pages_seen.add(page)
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'deploy': _deploy_id,
+            'pid': os.getpid(),
+            'page': page,
+            'cold': cold,  # first render of this page in the process
+            'first_render_ms': round(elapsed, 1),
+            'import_ms': round(sum(ms for _, ms in imports), 1),
+            'imports': sorted(((n, round(ms, 1)) for n, ms in imports), key=lambda x: -x[1])[:15],
+        }
+        if _startup_imports:
+            # Process start-up (main.py and its imports) is reported once, with the first page
+            entry['startup_import_ms'] = round(sum(ms for _, ms in _startup_imports), 1)
+            entry['startup_imports'] = sorted(
+                ((n, round(ms, 1)) for n, ms in _startup_imports), key=lambda x: -x[1]
+            )[:15]
+            entry['since_process_start_ms'] = round((time.perf_counter() - _process_start) * 1000, 1)
+            _startup_imports.clear()
+        try:
+            _append(entry)
+        except OSError:
+            pass
+
+
+def summarize(path=PROFILE_FILE):
+    """Median first-render and import time per (deploy, page, cold) from the profile file."""
+    groups = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            e = json.loads(line)
+            key = (e['deploy'], e['page'], e['cold'])
+            groups.setdefault(key, []).append((e['first_render_ms'], e['import_ms']))
+
+    def median(values):
+        values = sorted(values)
+        return values[len(values) // 2]
+
+    rows = []
+    for (deploy, page, cold), samples in sorted(groups.items()):
+        rows.append((deploy, page, 'cold' if cold else 'warm', len(samples),
+                     median([s[0] for s in samples]), median([s[1] for s in samples])))
+    return rows
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else PROFILE_FILE
+    print(f"{'deploy':<12}{'page':<28}{'run':<6}{'n':>4}{'render ms':>12}{'import ms':>12}")
+    for deploy, page, run, n, render_ms, import_ms in summarize(path):
+        print(f"{deploy:<12}{page:<28}{run:<6}{n:>4}{render_ms:>12.1f}{import_ms:>12.1f}")
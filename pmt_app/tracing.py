@@ -0,0 +1,319 @@
+"""
+Per-rerun tracing.
+
+A trace covers one Streamlit script run. While it is open, every SQL statement
+issued through database.py (normalized text, parameter shape, rows, wall time),
+every traced calculations function, every chart render and every PDF report
+stage is recorded as a span, nested under whatever span was open when it
+started. Outside a trace the hooks cost one attribute lookup.
+
+A rerun is traced when either:
+  * an admin has switched on "Trace reruns" in the sidebar panel
+    (render_panel); the finished trace is kept in their session and shown as
+    a span tree with the query count and the slowest operations, or
+  * sampling is on (PMT_TRACE_SAMPLE=0.01 traces 1% of all reruns); sampled
+    traces are appended as JSON lines to PMT_TRACE_FILE, rotated at
+    PMT_TRACE_MAX_BYTES with PMT_TRACE_BACKUPS old files kept.
+
+Summarize sampled traces (slowest statements and calls across all reruns):
+    python tracing.py [traces.jsonl]
+"""
+import json
+import logging
+import logging.handlers
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache, wraps
+
+SAMPLE_RATE = float(os.environ.get('PMT_TRACE_SAMPLE', 0) or 0)
+TRACE_FILE = os.environ.get(
+    'PMT_TRACE_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'traces.jsonl')
+)
+MAX_BYTES = int(os.environ.get('PMT_TRACE_MAX_BYTES', 10 * 1024 * 1024))
+BACKUPS = int(os.environ.get('PMT_TRACE_BACKUPS', 5))
+MAX_SPANS = 5000            # per trace; later spans are counted but not kept
+PANEL_KEY = 'trace_reruns'  # session_state flag set by the admin toggle
+LAST_TRACE_KEY = '_last_trace'
+_TOGGLE_KEY = '_trace_toggle'
+LEAF_KINDS = ('sql', 'calc', 'chart', 'write', 'report')
+
+_local = threading.local()
+_file_logger = None
+_file_lock = threading.Lock()
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+# =============================================================================
+# SPANS
+# =============================================================================
+def active():
+    return getattr(_local, 'trace', None) is not None
+
+
+@contextmanager
+def _open_span(trace, kind, name, attrs):
+    node = {'kind': kind, 'name': name, 'start_ms': round((time.perf_counter() - trace['t0']) * 1000, 3),
+            'ms': 0.0, 'attrs': attrs, 'children': []}
+    if trace['spans'] >= MAX_SPANS:
+        trace['dropped'] += 1
+        yield node
+        return
+    trace['spans'] += 1
+    _local.stack[-1]['children'].append(node)
+    _local.stack.append(node)
+    t0 = time.perf_counter()
+    try:
+        yield node
+    except Exception as e:
+        attrs['error'] = type(e).__name__
+        raise
+    finally:
+        node['ms'] = round((time.perf_counter() - t0) * 1000, 3)
+        _local.stack.pop()
+
+
+def span(kind, name, **attrs):
+    """
+    Context manager recording a span of `kind` under the current one. Yields the
+    span dict (add to its 'attrs' after the work is done) or None when no trace
+    is open.
+    """
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        return nullcontext()
+    return _open_span(trace, kind, name, attrs)
+
+
+def traced(kind):
+    """Decorator: every call of the function is a span named module.function."""
+    def decorator(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            trace = getattr(_local, 'trace', None)
+            if trace is None:
+                return func(*args, **kwargs)
+            with _open_span(trace, kind, name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """SQL with literals replaced by ? and IN lists collapsed, so the same statement groups together."""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('(?...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def params_shape(params):
+    """Types of the bound parameters, e.g. '(int, str)'; long lists are counted by type."""
+    if params is None:
+        return '()'
+    if isinstance(params, dict):
+        return '{' + ', '.join(sorted(params)) + '}'
+    types = [type(p).__name__ for p in params]
+    if len(types) > 6:
+        return f"{len(types)} params: " + ', '.join(f"{n} {t}" for t, n in Counter(types).most_common())
+    return '(' + ', '.join(types) + ')'
+
+
+def sql(query, params=(), many=False):
+    """Span for one statement; the caller adds 'rows' to the yielded span's attrs."""
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        return nullcontext()
+    attrs = {'params': 'executemany' if many else params_shape(params)}
+    return _open_span(trace, 'sql', normalize_sql(query), attrs)
+
+
+def plotly_chart(fig, **kwargs):
+    """st.plotly_chart with the figure's serialization and send recorded as a chart span."""
+    import streamlit as st
+
+    kinds = sorted({getattr(t, 'type', None) or 'trace' for t in getattr(fig, 'data', ())})
+    with span('chart', f"plotly {'/'.join(kinds) or 'figure'}", traces=len(getattr(fig, 'data', ()))):
+        return st.plotly_chart(fig, **kwargs)
+
+
+# =============================================================================
+# RERUNS
+# =============================================================================
+@contextmanager
+def rerun(page, session_state):
+    """
+    Wraps one script run of `page`. Traces it when the session has the panel
+    switched on or the run is sampled; yields the trace dict or None.
+    """
+    show = bool(session_state.get(PANEL_KEY))
+    sampled = SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+    if not (show or sampled) or active():
+        yield None
+        return
+
+    root = {'kind': 'page', 'name': page, 'start_ms': 0.0, 'ms': 0.0, 'attrs': {}, 'children': []}
+    trace = {'id': uuid.uuid4().hex[:12], 'ts': time.strftime('%Y-%m-%dT%H:%M:%S'), 'pid': os.getpid(),
+             'page': page, 'root': root, 'spans': 0, 'dropped': 0, 't0': time.perf_counter()}
+    _local.trace, _local.stack = trace, [root]
+    try:
+        yield trace
+    finally:
+        root['ms'] = round((time.perf_counter() - trace.pop('t0')) * 1000, 3)
+        _local.trace = _local.stack = None
+        if show:
+            session_state[LAST_TRACE_KEY] = trace
+        if sampled:
+            _write(trace)
+
+
+def _iter_spans(node, depth=0):
+    yield depth, node
+    for child in node['children']:
+        yield from _iter_spans(child, depth + 1)
+
+
+def summarize(trace, top=10):
+    """Totals per span kind, the slowest operations and statements run more than once."""
+    by_kind = {}
+    ops, statements = [], Counter()
+    for depth, node in _iter_spans(trace['root']):
+        if depth == 0:
+            continue
+        count, ms = by_kind.get(node['kind'], (0, 0.0))
+        by_kind[node['kind']] = (count + 1, ms + node['ms'])
+        if node['kind'] in LEAF_KINDS:
+            ops.append(node)
+        if node['kind'] == 'sql':
+            statements[node['name']] += 1
+    ops.sort(key=lambda n: -n['ms'])
+    return {
+        'ms': trace['root']['ms'],
+        'by_kind': by_kind,
+        'slowest': ops[:top],
+        'repeated': [(name, n) for name, n in statements.most_common() if n > 1][:top],
+        'dropped': trace['dropped'],
+    }
+
+
+def _write(trace):
+    global _file_logger
+    if _file_logger is None:
+        with _file_lock:
+            if _file_logger is None:
+                handler = logging.handlers.RotatingFileHandler(
+                    TRACE_FILE, maxBytes=MAX_BYTES, backupCount=BACKUPS, encoding='utf-8', delay=True
+                )
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                file_logger = logging.getLogger('pmt.traces')
+                file_logger.propagate = False
+                file_logger.setLevel(logging.INFO)
+                file_logger.addHandler(handler)
+                _file_logger = file_logger
+    try:
+        _file_logger.info(json.dumps(trace, separators=(',', ':'), default=str))
+    except (OSError, TypeError, ValueError):
+        pass
+
+
+# =============================================================================
+# ADMIN PANEL
+# =============================================================================
+def _label(node):
+    attrs = ', '.join(f"{k}={v}" for k, v in node['attrs'].items())
+    name = node['name'] if len(node['name']) <= 90 else node['name'][:87] + '...'
+    return f"[{node['kind']}] {name}" + (f"  ({attrs})" if attrs else '')
+
+
+def _switch(session_state):
+    # Kept outside the widget's own key, which Streamlit drops on runs that stop before the panel
+    session_state[PANEL_KEY] = session_state[_TOGGLE_KEY]
+
+
+def render_panel(session_state, max_lines=300):
+    """Sidebar panel for admins: the toggle, and the last traced rerun of this session."""
+    import streamlit as st
+
+    with st.expander("Performance trace", expanded=bool(session_state.get(PANEL_KEY))):
+        st.toggle("Trace reruns", value=bool(session_state.get(PANEL_KEY)), key=_TOGGLE_KEY,
+                  on_change=_switch, args=(session_state,),
+                  help="Records the queries, calculations and charts of each rerun in this session.")
+        trace = session_state.get(LAST_TRACE_KEY)
+        if not session_state.get(PANEL_KEY) or trace is None:
+            st.caption("Switch on and interact with a page to see its trace.")
+            return
+
+        summary = summarize(trace)
+        sql_count, sql_ms = summary['by_kind'].get('sql', (0, 0.0))
+        st.caption(f"**{trace['page']}** at {trace['ts'][11:]} · {summary['ms']:,.0f} ms")
+        c1, c2 = st.columns(2)
+        c1.metric("Queries", sql_count)
+        c2.metric("SQL ms", f"{sql_ms:,.0f}")
+        st.caption(" · ".join(f"{kind}: {n} / {ms:,.0f} ms" for kind, (n, ms) in sorted(summary['by_kind'].items())))
+        if summary['dropped']:
+            st.caption(f"{summary['dropped']} spans over the {MAX_SPANS} limit were not kept.")
+
+        st.markdown("**Slowest operations**")
+        st.dataframe(
+            [{'ms': n['ms'], 'kind': n['kind'], 'operation': n['name'], **n['attrs']} for n in summary['slowest']],
+            hide_index=True, use_container_width=True,
+        )
+        if summary['repeated']:
+            st.markdown("**Repeated statements**")
+            st.dataframe([{'runs': n, 'statement': name} for name, n in summary['repeated']],
+                         hide_index=True, use_container_width=True)
+
+        lines = [f"{node['ms']:9.1f} ms  {'  ' * depth}{_label(node)}" for depth, node in _iter_spans(trace['root'])]
+        if len(lines) > max_lines:
+            lines = lines[:max_lines] + [f"... {len(lines) - max_lines} more spans"]
+        st.markdown("**Span tree**")
+        st.code('\n'.join(lines), language=None)
+
+
+# =============================================================================
+# SAMPLED TRACE FILES
+# =============================================================================
+def summarize_file(path=TRACE_FILE, top=20):
+    """Per-operation count, total and p95 ms across a trace file and its rotated backups."""
+    samples = {}
+    paths = [f"{path}.{i}" for i in range(BACKUPS, 0, -1)] + [path]
+    for p in paths:
+        if not os.path.exists(p):
+            continue
+        with open(p, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    trace = json.loads(line)
+                except ValueError:
+                    continue
+                samples.setdefault(('page', trace['page']), []).append(trace['root']['ms'])
+                for depth, node in _iter_spans(trace['root']):
+                    if depth and node['kind'] in LEAF_KINDS:
+                        samples.setdefault((node['kind'], node['name']), []).append(node['ms'])
+
+    rows = []
+    for (kind, name), values in samples.items():
+        values.sort()
+        rows.append((kind, name, len(values), sum(values), values[min(len(values) - 1, int(len(values) * 0.95))]))
+    rows.sort(key=lambda r: -r[3])
+    return rows[:top]
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else TRACE_FILE
+    print(f"{'kind':<8}{'n':>7}{'total ms':>12}{'p95 ms':>10}  operation")
+    for kind, name, n, total_ms, p95_ms in summarize_file(path):
+        print(f"{kind:<8}{n:>7}{total_ms:>12.1f}{p95_ms:>10.1f}  {name[:100]}")
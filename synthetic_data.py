@@ -0,0 +1,312 @@
+"""
+Synthetic Data Generator
+Fills a database, or writes Excel workbooks in the importer's layout, with
+made-up but plausible projects for benchmarks and load tests.
+
+Everything is derived from a seed: project N gets its own random stream
+(seed, N), so the same seed always gives the same rows and the first 10
+projects of a 1,000-project database have the same schedules, spend and risks
+as the 10 projects of a 10-project one.
+Dates are laid out around a fixed ANCHOR date rather than today, so results
+do not drift from one day to the next.
+
+Usage (from the repository root):
+    python synthetic_data.py db /tmp/synthetic.db --projects 1000
+    python synthetic_data.py workbook /tmp/synthetic.xlsx --activities 500 --expenditures 5000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+from datetime import date, datetime, timedelta
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pmt_app')
+sys.path.insert(0, APP_DIR)  # app modules import each other by bare name
+
+import migrations
+
+ANCHOR = date(2025, 1, 1)
+SEED = 42
+CATEGORIES = ['Labour', 'Material', 'Vehicle', 'Diesel', 'Other']
+CATEGORY_WEIGHTS = [40, 30, 12, 10, 8]
+CLIENTS = ['Liberty Properties', 'Metro Council', 'Coastal Telecom', 'Highveld Mining', 'Union Estates']
+WORKS = ['Site Survey', 'Trenching', 'Ducting', 'Cable Laying', 'Splicing', 'Testing',
+         'Commissioning', 'Restoration', 'Wayleave Approval', 'Pole Installation']
+RISKS = ['Trenching delayed by rock', 'Material delivery late', 'Wayleave not granted',
+         'Cable theft on site', 'Rain delay', 'Contractor shortage']
+
+
+def _rng(seed, project_number):
+    return random.Random(f"{seed}:{project_number}")
+
+
+def project_plan(project_number, activities=40, expenditures=400, risks=10, seed=SEED):
+    """
+    One project's rows as plain Python values: the project header, activities
+    (with workbook ids, 'Depends On' chains and actual dates), expenditures and
+    risks. Deterministic in (seed, project_number).
+    """
+    rng = _rng(seed, project_number)
+    start = ANCHOR + timedelta(days=rng.randint(-720, 180))
+    duration = rng.randint(120, 720)
+    end = start + timedelta(days=duration)
+    budget = round(rng.uniform(200_000, 5_000_000), 2)
+
+    # 1. Activities: staggered over the project, each depending on up to two recent ones
+    plan_activities = []
+    for i in range(activities):
+        offset = int(duration * i / max(activities, 1))
+        p_start = start + timedelta(days=offset)
+        p_finish = p_start + timedelta(days=rng.randint(5, 60))
+        window = list(range(max(1, i - 4), i + 1)) if i else []
+        preds = sorted(rng.sample(window, min(len(window), rng.choice([0, 1, 1, 1, 2])))) if window else []
+
+        a_start = a_end = None
+        if p_start <= ANCHOR:
+            a_start = p_start + timedelta(days=rng.randint(0, 5))
+            if p_finish <= ANCHOR and rng.random() < 0.9:
+                a_end = min(ANCHOR, p_finish + timedelta(days=rng.randint(-3, 10)))
+        status = 'Complete' if a_end else ('Active' if a_start else 'Not Started')
+        plan_activities.append({
+            'excel_id': i + 1,
+            'activity_name': f"{rng.choice(WORKS)} {i + 1}",
+            'planned_start': p_start,
+            'planned_finish': p_finish,
+            'budgeted_cost': round(budget * rng.uniform(0.5, 1.5) / max(activities, 1), 2),
+            'predecessors': preds,
+            'status': status,
+            'actual_start': a_start,
+            'actual_end': a_end,
+        })
+
+    # 2. Expenditures between the start and the anchor (or the end, if earlier)
+    spend_days = max(1, (min(end, ANCHOR) - start).days)
+    plan_expenditures = []
+    for j in range(expenditures if start < ANCHOR else 0):
+        category = rng.choices(CATEGORIES, CATEGORY_WEIGHTS)[0]
+        plan_expenditures.append({
+            'spend_date': start + timedelta(days=rng.randint(0, spend_days)),
+            'excel_activity': rng.randint(1, activities) if activities else None,
+            'category': category,
+            'description': f"{category} - batch {j + 1}",
+            'reference_id': f"INV-{project_number}-{j + 1:05d}",
+            'amount': round(rng.uniform(0.2, 1.6) * budget * 0.8 / max(expenditures, 1), 2),
+        })
+
+    # 3. Risks
+    plan_risks = []
+    for _ in range(risks):
+        identified = start + timedelta(days=rng.randint(0, duration))
+        plan_risks.append({
+            'date_identified': identified,
+            'description': rng.choice(RISKS),
+            'impact': rng.choice('HHMMML'),
+            'status': 'Resolved' if identified < ANCHOR and rng.random() < 0.6 else 'Open',
+            'mitigation_action': rng.choice(['Escalated', 'Rescheduled', 'Alternate supplier', None]),
+        })
+
+    return {
+        'project_name': f"Synthetic Project {project_number}",
+        'project_number': f"SYN-{project_number:05d}",
+        'client': rng.choice(CLIENTS),
+        'total_budget': budget,
+        'start_date': start,
+        'target_end_date': end,
+        'activities': plan_activities,
+        'expenditures': plan_expenditures,
+        'risks': plan_risks,
+    }
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+# =============================================================================
+# DATABASE
+# =============================================================================
+def generate_database(path, projects=100, activities=40, expenditures=400, risks=10, seed=SEED):
+    """
+    Creates (or appends to) the database at `path` with `projects` synthetic
+    projects plus their users, assignments, activity log and derived tables.
+    Returns row counts per table.
+    """
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    migrations.migrate(conn, target=2)  # derived tables are built from the data below
+
+    # 1. Users: one admin and executive, a PM per ten projects, two recorders per PM
+    pms = max(1, projects // 10)
+    users = [('admin', 'admin', 'Synthetic Admin'), ('executive', 'executive', 'Synthetic Executive')]
+    users += [(f"pm{i}", 'pm', f"Project Manager {i}") for i in range(1, pms + 1)]
+    users += [(f"recorder{i}", 'recorder', f"Recorder {i}") for i in range(1, 2 * pms + 1)]
+    conn.executemany(
+        "INSERT OR IGNORE INTO users (username, password_hash, role, full_name, status) VALUES (?, '-', ?, ?, 'approved')",
+        users
+    )
+    user_ids = {r['username']: r['user_id'] for r in conn.execute("SELECT user_id, username FROM users")}
+    admin_id = user_ids['admin']
+
+    # 2. Projects and everything under them, with explicit ids so the rows are reproducible
+    next_project = (conn.execute("SELECT MAX(project_id) FROM projects").fetchone()[0] or 0) + 1
+    next_activity = (conn.execute("SELECT MAX(activity_id) FROM baseline_schedule").fetchone()[0] or 0) + 1
+    rows = {'projects': [], 'baseline_schedule': [], 'dependencies': [], 'activity_log': [],
+            'expenditure_log': [], 'risks': [], 'project_assignments': []}
+    for n in range(1, projects + 1):
+        project_id = next_project + n - 1
+        plan = project_plan(project_id, activities, expenditures, risks, seed)
+        pm = (n - 1) % pms + 1
+        pm_id = user_ids[f"pm{pm}"]
+        recorder_id = user_ids[f"recorder{2 * pm - (n % 2)}"]
+        rows['projects'].append((project_id, plan['project_name'], plan['project_number'], plan['client'], pm_id,
+                                 plan['total_budget'], _iso(plan['start_date']), _iso(plan['target_end_date']), admin_id))
+        rows['project_assignments'] += [(project_id, pm_id, 'pm', admin_id), (project_id, recorder_id, 'recorder', admin_id)]
+
+        ids = {}
+        for a in plan['activities']:
+            ids[a['excel_id']] = act_id = next_activity
+            next_activity += 1
+            preds = [ids[p] for p in a['predecessors']]
+            rows['baseline_schedule'].append((act_id, project_id, a['activity_name'], _iso(a['planned_start']),
+                                              _iso(a['planned_finish']), a['budgeted_cost'],
+                                              preds[0] if preds else None, a['status'], a['excel_id']))
+            rows['dependencies'] += [(act_id, p) for p in preds]
+            if a['actual_start']:
+                rows['activity_log'].append((act_id, 'STARTED', _iso(a['actual_start']), recorder_id))
+            if a['actual_end']:
+                rows['activity_log'].append((act_id, 'FINISHED', _iso(a['actual_end']), recorder_id))
+        rows['expenditure_log'] += [
+            (project_id, ids.get(e['excel_activity']), e['category'], e['description'], e['reference_id'],
+             e['amount'], _iso(e['spend_date']), recorder_id)
+            for e in plan['expenditures']
+        ]
+        rows['risks'] += [
+            (project_id, _iso(r['date_identified']), r['description'], r['impact'], r['status'],
+             r['mitigation_action'], pm_id)
+            for r in plan['risks']
+        ]
+
+    with conn:
+        conn.executemany(
+            "INSERT INTO projects (project_id, project_name, project_number, client, pm_user_id, total_budget, "
+            "start_date, target_end_date, created_by) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows['projects'])
+        conn.executemany(
+            "INSERT INTO project_assignments (project_id, user_id, assigned_role, assigned_by) VALUES (?, ?, ?, ?)",
+            rows['project_assignments'])
+        conn.executemany(
+            "INSERT INTO baseline_schedule (activity_id, project_id, activity_name, planned_start, planned_finish, "
+            "budgeted_cost, depends_on, status, sort_order) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows['baseline_schedule'])
+        conn.executemany(
+            "INSERT INTO activity_log (activity_id, event_type, event_date, recorded_by) VALUES (?, ?, ?, ?)",
+            rows['activity_log'])
+        conn.executemany(
+            "INSERT INTO expenditure_log (project_id, activity_id, category, description, reference_id, amount, "
+            "spend_date, recorded_by) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows['expenditure_log'])
+        conn.executemany(
+            "INSERT INTO risks (project_id, date_identified, description, impact, status, mitigation_action, "
+            "recorded_by) VALUES (?, ?, ?, ?, ?, ?, ?)", rows['risks'])
+
+    # 3. Derived tables: the remaining migrations build them from the rows above
+    migrations.migrate(conn, target=4)
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO activity_dependencies (activity_id, predecessor_id) VALUES (?, ?)",
+                         rows['dependencies'])
+    migrations.migrate(conn)
+    conn.close()
+
+    counts = {table: len(values) for table, values in rows.items()}
+    counts['users'] = len(users)
+    return counts
+
+
+# =============================================================================
+# WORKBOOKS
+# =============================================================================
+def generate_workbook(path, activities=40, expenditures=400, risks=10, project_number=1, seed=SEED):
+    """
+    Writes one project in the layout importer.import_project reads: header
+    cells C5:C7 / F5:F7 and the tables under rows 11, 4 and 3 of the three
+    sheets. Uses openpyxl's write-only mode, so large workbooks stay cheap.
+    """
+    from openpyxl import Workbook
+
+    plan = project_plan(project_number, activities, expenditures, risks, seed)
+
+    def dt(value):
+        return datetime.combine(value, datetime.min.time()) if value is not None else None
+
+    wb = Workbook(write_only=True)
+
+    ws = wb.create_sheet("Project_Schedule")
+    ws.append(["PROJECT STATUS DASHBOARD - DATA ENTRY FORM"])
+    ws.append([])
+    ws.append(["REPORTING PERIOD:", ANCHOR.strftime("%Y/%m")])
+    ws.append([])
+    ws.append(["PROJECT NAME:", None, plan['project_name'], None, "TOTAL BUDGET:", plan['total_budget']])
+    ws.append(["PROJECT NUMBER:", None, plan['project_number'], None, "START DATE:", dt(plan['start_date'])])
+    ws.append(["CLIENT:", None, plan['client'], None, "TARGET END DATE:", dt(plan['target_end_date'])])
+    ws.append(["PROJECT MANAGER:", None, "Synthetic PM", None, "STATUS:", "In Progress"])
+    ws.append([])
+    ws.append(["PROJECT SCHEDULE (BASELINE PLAN)"])
+    ws.append(['Activity ID', 'Activity Name', 'Planned Start', 'Planned End', 'Budgeted Cost (R)',
+               'Depends On', 'Actual Start', 'Actual End'])
+    for a in plan['activities']:
+        preds = a['predecessors']
+        depends = '-' if not preds else (preds[0] if len(preds) == 1 else ', '.join(map(str, preds)))
+        ws.append([a['excel_id'], a['activity_name'], dt(a['planned_start']), dt(a['planned_finish']),
+                   a['budgeted_cost'], depends, dt(a['actual_start']), dt(a['actual_end'])])
+
+    ws = wb.create_sheet("Expenditure_Log")
+    ws.append(["EXPENDITURE LOG"])
+    ws.append(["Record every payment made. Attach invoice/PO reference."])
+    ws.append([])
+    ws.append(['Date', 'Activity ID', 'Category', 'Description', 'Reference (Invoice/PO)', 'Amount (R)'])
+    for e in plan['expenditures']:
+        ws.append([dt(e['spend_date']), e['excel_activity'], e['category'], e['description'],
+                   e['reference_id'], e['amount']])
+
+    ws = wb.create_sheet("Risk_Register")
+    ws.append(["RISK & ISSUES REGISTER"])
+    ws.append([])
+    ws.append(['Date Identified', 'Risk/Issue Description', 'Impact (H/M/L)', 'Status', 'Mitigation Action'])
+    for r in plan['risks']:
+        ws.append([dt(r['date_identified']), r['description'], r['impact'], r['status'], r['mitigation_action']])
+
+    wb.save(path)
+    return path
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic PM Tool data")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_db = sub.add_parser('db', help="Fill a database with synthetic projects")
+    p_db.add_argument('path')
+    p_db.add_argument('--projects', type=int, default=100)
+
+    p_wb = sub.add_parser('workbook', help="Write one synthetic project as an import workbook")
+    p_wb.add_argument('path')
+    p_wb.add_argument('--project-number', type=int, default=1)
+
+    for p in (p_db, p_wb):
+        p.add_argument('--activities', type=int, default=40, help="per project")
+        p.add_argument('--expenditures', type=int, default=400, help="per project")
+        p.add_argument('--risks', type=int, default=10, help="per project")
+        p.add_argument('--seed', type=int, default=SEED)
+
+    args = parser.parse_args(argv)
+    if args.command == 'db':
+        counts = generate_database(args.path, args.projects, args.activities, args.expenditures, args.risks, args.seed)
+        print(f"✅ {args.path}: " + ", ".join(f"{n:,} {table}" for table, n in counts.items()))
+    else:
+        generate_workbook(args.path, args.activities, args.expenditures, args.risks, args.project_number, args.seed)
+        print(f"✅ Created: {args.path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())